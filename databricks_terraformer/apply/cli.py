@@ -1,14 +1,70 @@
+import os
+
 import click
 from databricks_cli.configure.config import debug_option, profile_option
 from databricks_cli.utils import eat_exceptions
 
 from databricks_terraformer import CONTEXT_SETTINGS
 from databricks_terraformer.config import git_url_option, ssh_key_option, inject_profile_as_env, absolute_path_callback
-from databricks_terraformer.utils.terraform import GitTFStage_V2
+from databricks_terraformer.utils.stage_cache import StageCache, get_default_cache_dir, get_plugin_cache_dir
+from databricks_terraformer.utils.terraform import GitTFStage_V2, PartitionedGitTFStage, AdaptiveParallelism
 
 
 SUPPORT_IMPORTS = ['cluster_policies', 'dbfs', 'notebooks', 'instance_pools']
 
+
+def parallelism_callback(ctx, param, value):  # NOQA
+    if value is None or value == "auto":
+        return value
+    try:
+        parallelism = int(value)
+    except ValueError:
+        raise click.BadParameter("parallelism must be a positive number or auto")
+    if parallelism < 1:
+        raise click.BadParameter("parallelism must be a positive number or auto")
+    return parallelism
+
+
+def _get_cache_kwargs(cache_dir, no_stage_cache):
+    """
+    The stage cache (cached clones and initialized stages) is only created when it is enabled, the provider plugin
+    cache is always used.
+    """
+    if no_stage_cache is not True:
+        stage_cache = StageCache(cache_dir)
+        return dict(stage_cache=stage_cache, plugin_cache_dir=stage_cache.plugin_cache_dir)
+    plugin_cache_dir = get_plugin_cache_dir(cache_dir if cache_dir is not None else get_default_cache_dir())
+    os.makedirs(plugin_cache_dir, exist_ok=True)
+    return dict(stage_cache=None, plugin_cache_dir=plugin_cache_dir)
+
+
+def _get_parallelism(parallelism, cache_dir):
+    if parallelism == "auto":
+        cache_dir = cache_dir if cache_dir is not None else get_default_cache_dir()
+        os.makedirs(cache_dir, exist_ok=True)
+        return AdaptiveParallelism(os.environ["DATABRICKS_HOST"], os.path.join(cache_dir, "parallelism.json"))
+    return parallelism
+
+
+def _plan_and_apply(tf, plan, apply, custom_plan_path, parallelism=None, batch_size=None):
+    if batch_size is not None and custom_plan_path is not None:
+        raise ValueError("A custom plan path cannot be applied in batches.")
+    if apply is True and plan is not True and custom_plan_path is None and batch_size is None:
+        raise ValueError("plan option is not selected but apply is selected without providing plan path.")
+    try:
+        if plan is True and tf.plan() != 0:
+            raise ValueError("terraform plan failed, please check the logs for details.")
+        if apply is True and batch_size is not None:
+            if tf.apply_batched(batch_size) != 0:
+                raise ValueError("terraform batched apply failed, please check the logs for details. Run the apply "
+                                 "again to resume from the failed batch.")
+        elif apply is True and tf.apply(custom_plan_path) != 0:
+            raise ValueError("terraform apply failed, please check the logs for details.")
+    finally:
+        if isinstance(parallelism, AdaptiveParallelism):
+            parallelism.save()
+
+
 # TODO: Custom state back ends using aws environment variables
 @click.command(context_settings=CONTEXT_SETTINGS, help="Import selected resources.")
 @click.option("--plan", is_flag=True, help='This will generate the terraform plan to your infrastructure.')
@@ -20,27 +76,55 @@ SUPPORT_IMPORTS = ['cluster_policies', 'dbfs', 'notebooks', 'instance_pools']
 @click.option("--artifact-dir", required=True, type=click.Path(exists=True), callback=absolute_path_callback,
               help='Will be where the plan/state file be saved, required unless backend state is specified.')
 @click.option("--revision", type=str, help='This is the git repo revision which can be a branch, commit, tag.')
+@click.option("--prev-revision", type=str, default=None,
+              help='When provided only the resources changed between this revision and --revision are planned.')
+@click.option("--max-targets", type=int, default=500, show_default=True,
+              help='Maximum number of changed resources to target, larger change sets fall back to a full plan.')
 @click.option('--databricks-object-type', type=click.Choice(SUPPORT_IMPORTS),
               multiple=True, default=SUPPORT_IMPORTS,
               help="This is the databricks object you wish to create a plan for. By default we will plan for all objects.")
 @click.option("--backend-file", type=click.Path(exists=True), callback=absolute_path_callback,
               help='Please provide this as this is where your backend configuration at which your terraform file will be saved.')
+@click.option("--cache-dir", type=click.Path(), default=None, callback=absolute_path_callback,
+              help='Directory for cached clones, initialized terraform stages and the provider plugin cache. '
+                   'Defaults to $DATABRICKS_TERRAFORMER_CACHE_DIR or ~/.databricks-terraformer/cache.')
+@click.option("--no-stage-cache", is_flag=True,
+              help='Always clone and run terraform init in a fresh temporary stage directory.')
+@click.option("--partition-by-type", is_flag=True,
+              help='Give every databricks object type its own stage and state and run their plans and applies '
+                   'concurrently.')
+@click.option("--parallelism", type=str, default=None, callback=parallelism_callback,
+              help='Number of concurrent terraform operations, or auto to lower it when the API throttles and '
+                   'remember the value per workspace host. Defaults to the terraform default of 10.')
+@click.option("--force-plan", is_flag=True,
+              help='Always run terraform plan, even when plan.out in the artifact dir was created from the same '
+                   'staged files, targets and state.')
+@click.option("--batch-size", type=click.IntRange(min=1), default=None,
+              help='Plan and apply the resources in batches of this many targets. Completed batches are recorded '
+                   'in the artifact dir so an interrupted apply resumes at the first unfinished batch.')
 @debug_option
 @profile_option
 @eat_exceptions
 @git_url_option
 @ssh_key_option
 @inject_profile_as_env
-def import_cli(git_ssh_url, databricks_object_type, plan, apply, backend_file, custom_plan_path, revision, artifact_dir):
-    with GitTFStage_V2(git_url=git_ssh_url, directories=databricks_object_type,
-                       cur_ref=revision,
-                       artifact_dir=artifact_dir, backend_file=backend_file) as tf:
-        if plan is True:
-            tf.plan()
-        if apply is True and plan is not True and custom_plan_path is None:
-            raise ValueError("plan option is not selected but apply is selected without providing plan path.")
-        if apply is True:
-            tf.apply(custom_plan_path)
+def import_cli(git_ssh_url, databricks_object_type, plan, apply, backend_file, custom_plan_path, revision, prev_revision,
+               max_targets, artifact_dir, cache_dir, no_stage_cache, partition_by_type, parallelism, force_plan,
+               batch_size):
+    parallelism = _get_parallelism(parallelism, cache_dir)
+    stage_kwargs = dict(prev_ref=prev_revision, max_targets=max_targets, parallelism=parallelism,
+                        reuse_plan=not force_plan, **_get_cache_kwargs(cache_dir, no_stage_cache))
+    if partition_by_type is True:
+        tf = PartitionedGitTFStage(git_url=git_ssh_url,
+                                   partitions={object_type: [object_type] for object_type in databricks_object_type},
+                                   cur_ref=revision, artifact_dir=artifact_dir, backend_file=backend_file,
+                                   **stage_kwargs)
+    else:
+        tf = GitTFStage_V2(git_url=git_ssh_url, directories=databricks_object_type,
+                           cur_ref=revision,
+                           artifact_dir=artifact_dir, backend_file=backend_file, **stage_kwargs)
+    with tf:
+        _plan_and_apply(tf, plan, apply, custom_plan_path, parallelism, batch_size)
 
 
 @click.command(context_settings=CONTEXT_SETTINGS, help="Delete all or selected resources.")
@@ -58,20 +142,44 @@ def import_cli(git_ssh_url, databricks_object_type, plan, apply, backend_file, c
               help="This is the databricks object you wish to create a delete plan for. By default we will plan deletes for all objects.")
 @click.option("--backend-file", type=click.Path(exists=True), callback=absolute_path_callback,
               help='Please provide this as this is where your backend configuration at which your terraform file will be saved.')
+@click.option("--cache-dir", type=click.Path(), default=None, callback=absolute_path_callback,
+              help='Directory for cached clones, initialized terraform stages and the provider plugin cache. '
+                   'Defaults to $DATABRICKS_TERRAFORMER_CACHE_DIR or ~/.databricks-terraformer/cache.')
+@click.option("--no-stage-cache", is_flag=True,
+              help='Always clone and run terraform init in a fresh temporary stage directory.')
+@click.option("--partition-by-type", is_flag=True,
+              help='Give every databricks object type its own stage and state and run their plans and applies '
+                   'concurrently.')
+@click.option("--parallelism", type=str, default=None, callback=parallelism_callback,
+              help='Number of concurrent terraform operations, or auto to lower it when the API throttles and '
+                   'remember the value per workspace host. Defaults to the terraform default of 10.')
+@click.option("--force-plan", is_flag=True,
+              help='Always run terraform plan, even when plan.out in the artifact dir was created from the same '
+                   'staged files, targets and state.')
+@click.option("--batch-size", type=click.IntRange(min=1), default=None,
+              help='Plan and apply the resources in batches of this many targets. Completed batches are recorded '
+                   'in the artifact dir so an interrupted apply resumes at the first unfinished batch.')
 @debug_option
 @profile_option
 @eat_exceptions
 @git_url_option
 @ssh_key_option
 @inject_profile_as_env
-def destroy_cli(git_ssh_url, databricks_object_type, plan, apply, backend_file, custom_plan_path, revision, artifact_dir):
-    databricks_objects_for_delete = list(set(SUPPORT_IMPORTS) - set(databricks_object_type))
-    with GitTFStage_V2(git_url=git_ssh_url, directories=databricks_objects_for_delete,
-                       cur_ref=revision,
-                       artifact_dir=artifact_dir, backend_file=backend_file) as tf:
-        if plan is True:
-            tf.plan()
-        if apply is True and plan is not True and custom_plan_path is None:
-            raise ValueError("plan option is not selected but apply is selected without providing plan path.")
-        if apply is True:
-            tf.apply(custom_plan_path)
+def destroy_cli(git_ssh_url, databricks_object_type, plan, apply, backend_file, custom_plan_path, revision, artifact_dir,
+                cache_dir, no_stage_cache, partition_by_type, parallelism, force_plan, batch_size):
+    parallelism = _get_parallelism(parallelism, cache_dir)
+    stage_kwargs = dict(parallelism=parallelism, reuse_plan=not force_plan,
+                        **_get_cache_kwargs(cache_dir, no_stage_cache))
+    if partition_by_type is True:
+        # every selected object type is planned against its own state with an empty configuration
+        tf = PartitionedGitTFStage(git_url=git_ssh_url,
+                                   partitions={object_type: [] for object_type in databricks_object_type},
+                                   cur_ref=revision, artifact_dir=artifact_dir, backend_file=backend_file,
+                                   **stage_kwargs)
+    else:
+        databricks_objects_for_delete = list(set(SUPPORT_IMPORTS) - set(databricks_object_type))
+        tf = GitTFStage_V2(git_url=git_ssh_url, directories=databricks_objects_for_delete,
+                           cur_ref=revision,
+                           artifact_dir=artifact_dir, backend_file=backend_file, **stage_kwargs)
+    with tf:
+        _plan_and_apply(tf, plan, apply, custom_plan_path, parallelism, batch_size)
@@ -4,6 +4,8 @@ from databricks_terraformer.jobs.cli import jobs_group
 
 from databricks_terraformer import CONTEXT_SETTINGS, log
 from databricks_terraformer.apply.cli import destroy_cli, import_cli
+from databricks_terraformer.config import metrics_out_option, api_stats_option, profile_out_option, \
+    trace_out_option
 from databricks_terraformer.dbfs.cli import dbfs_group
 from databricks_terraformer.cluster_policies.cli import cluster_policies_group
 from databricks_terraformer.instance_pools.cli import instance_pools_group
@@ -12,6 +14,9 @@ from databricks_terraformer.notebooks.cli import notebook_group
 from databricks_terraformer.secret_scopes.cli import secret_scopes_group
 from databricks_terraformer.secrets.cli import secrets_group
 from databricks_terraformer.secret_acls.cli import secret_acls_group
+from databricks_terraformer.utils.metrics import get_metrics
+from databricks_terraformer.utils.profiler import start_profiler
+from databricks_terraformer.workspaces.cli import workspaces_group
 from databricks_terraformer.version import print_version_callback, version
 
 
@@ -19,8 +24,14 @@ from databricks_terraformer.version import print_version_callback, version
 @click.option('--version', is_flag=True, callback=print_version_callback,
               expose_value=False, is_eager=True, help=version)
 @click_log.simple_verbosity_option(log, '--verbosity', '-v')
-def cli():
-    pass
+@metrics_out_option
+@trace_out_option
+@api_stats_option
+@profile_out_option
+@click.pass_context
+def cli(ctx, profile_out, profile_mode):
+    if profile_out is not None:
+        start_profiler(ctx, profile_out, profile_mode, get_metrics(ctx))
 
 cli.add_command(cluster_policies_group, name="cluster-policies")
 cli.add_command(dbfs_group, name="dbfs")
@@ -31,6 +42,7 @@ cli.add_command(notebook_group, name="notebooks")
 cli.add_command(secret_scopes_group, name="secret-scopes")
 cli.add_command(secrets_group, name="secrets")
 cli.add_command(secret_acls_group, name="secret-acls")
+cli.add_command(workspaces_group, name="workspaces")
 cli.add_command(import_cli, name="import")
 cli.add_command(destroy_cli, name="destroy")
 
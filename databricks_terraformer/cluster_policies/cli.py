@@ -1,19 +1,48 @@
 import click
-from databricks_cli.configure.config import debug_option, profile_option, provide_api_client
+from databricks_cli.configure.config import debug_option, profile_option
 from databricks_cli.sdk import ApiClient
 from databricks_cli.utils import eat_exceptions
 
-from databricks_terraformer import CONTEXT_SETTINGS, log
+from databricks_terraformer import CONTEXT_SETTINGS
 from databricks_terraformer.cluster_policies.policies_service import PolicyService
-from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option
-from databricks_terraformer.hcl import create_hcl_file
-from databricks_terraformer.hcl.json_to_hcl import validate_hcl, create_resource_from_dict
+from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option, \
+    provide_api_client, workers_option
 from databricks_terraformer.utils import normalize_identifier
+from databricks_terraformer.utils.export_engine import ExportEngine, ExportSpec
 from databricks_terraformer.utils.git_handler import GitExportHandler
+from databricks_terraformer.utils.metrics import get_metrics
 from databricks_terraformer.utils.patterns import provide_pattern_func
 from databricks_terraformer.version import print_version_callback, version
 
 
+def export_cluster_policies(gh: GitExportHandler, api_client: ApiClient, pattern_matches, workers=1):
+    def get_resource_data(policy):
+        assert "definition" in policy
+        assert "name" in policy
+        assert "policy_id" in policy
+        return {
+            "@raw:definition": policy["definition"],
+            "name": policy["name"]
+        }
+
+    service = PolicyService(api_client)
+    with get_metrics().timer("list"):
+        policies = service.list_policies()["policies"]
+    get_metrics().count("list", objects=len(policies))
+
+    spec = ExportSpec(
+        "databricks_cluster_policy",
+        get_name=lambda policy: policy["name"],
+        get_identifier=lambda policy:
+        normalize_identifier(f"databricks_cluster_policy-{policy['name']}-{policy['policy_id']}"),
+        get_resource_data=get_resource_data,
+        get_hcl_file_identity=lambda policy: policy['policy_id'],
+        validate=True,
+    )
+    return ExportEngine(gh, spec, workspace_url=api_client.url, pattern_matches=pattern_matches,
+                        workers=workers).run(policies)
+
+
 @click.command(context_settings=CONTEXT_SETTINGS, help="Export cluster policies.")
 @click.option("--hcl", is_flag=True, help='Will export the data as HCL.')
 @provide_pattern_func("pattern_matches")
@@ -26,37 +55,11 @@ from databricks_terraformer.version import print_version_callback, version
 @delete_option
 @dry_run_option
 @tag_option
-def export_cli(tag, dry_run, delete, git_ssh_url, api_client: ApiClient, hcl, pattern_matches):
+@workers_option
+def export_cli(tag, dry_run, delete, git_ssh_url, api_client: ApiClient, hcl, workers, pattern_matches):
     if hcl is True:
-        service = PolicyService(api_client)
-        created_policy_list = []
         with GitExportHandler(git_ssh_url, "cluster_policies", delete_not_found=delete, dry_run=dry_run, tag=tag) as gh:
-            for policy in service.list_policies()["policies"]:
-                assert "definition" in policy
-                assert "name" in policy
-                assert "policy_id" in policy
-                if not pattern_matches(policy["name"]):
-                    log.debug(f"{policy['name']} did not match pattern function {pattern_matches}")
-                    continue
-                log.debug(f"{policy['name']} matched the pattern function {pattern_matches}")
-                cluster_policy_tf_dict = {
-                    "@raw:definition": policy["definition"],
-                    "name": policy["name"]
-                }
-                name = "databricks_cluster_policy"
-                identifier = normalize_identifier(f"databricks_cluster_policy-{policy['name']}-{policy['policy_id']}")
-                created_policy_list.append(identifier)
-                policy_hcl = create_resource_from_dict(name, identifier, cluster_policy_tf_dict, False)
-                file_name_identifier = f"{identifier}.tf"
-
-                processed_hcl_file = create_hcl_file(policy['policy_id'], api_client.url, cluster_policy_tf_dict,
-                                                     policy_hcl)
-
-                gh.add_file(file_name_identifier, processed_hcl_file)
-                hcl_errors = validate_hcl(policy_hcl)
-                if len(hcl_errors) > 0:
-                    log.error(f"Identified error in the following HCL Config: {policy_hcl}")
-                    log.error(hcl_errors)
+            export_cluster_policies(gh, api_client, pattern_matches, workers)
 
 
 @click.group(context_settings=CONTEXT_SETTINGS,
@@ -5,10 +5,14 @@ import uuid
 import click
 from databricks_cli.click_types import ContextObject
 from databricks_cli.configure.config import get_profile_from_context
-from databricks_cli.configure.provider import ProfileConfigProvider
+from databricks_cli.configure.provider import ProfileConfigProvider, get_config
 from databricks_cli.utils import InvalidConfigurationError
 
 from databricks_terraformer import log
+from databricks_terraformer.utils.api_client import InstrumentedApiClient, get_api_stats
+from databricks_terraformer.utils.metrics import get_metrics
+from databricks_terraformer.utils.profiler import PROFILE_MODES
+from databricks_terraformer.utils.trace import TraceRecorder
 
 
 def absolute_path_callback(ctx, param, value):  # NOQA
@@ -48,6 +52,75 @@ def tag_option(f):
                         help="This will only log to console the actions but not commit to git remote state.")(f)
 
 
+def metrics_out_option(f):
+    def callback(ctx, param, value):  # NOQA
+        if value is not None:
+            metrics = get_metrics(ctx)
+            ctx.call_on_close(lambda: metrics.save(value))
+
+    return click.option('--metrics-out', type=click.Path(dir_okay=False), callback=callback, expose_value=False,
+                        help="Write a JSON report with the duration, object counts, bytes and throughput of every "
+                             "phase of the command to this file.")(f)
+
+
+def trace_out_option(f):
+    def callback(ctx, param, value):  # NOQA
+        if value is not None:
+            recorder = TraceRecorder(value, get_metrics(ctx))
+            recorder.start()
+            ctx.call_on_close(recorder.stop)
+
+    return click.option('--trace-out', type=click.Path(dir_okay=False), callback=callback, expose_value=False,
+                        help="Write a timeline of every phase and resource (listing, fetch, rendering, validation, "
+                             "writes, api calls, git and terraform steps) per thread to this file in the Chrome "
+                             "trace event format.")(f)
+
+
+def api_stats_option(f):
+    def callback(ctx, param, value):  # NOQA
+        if value is True:
+            api_stats = get_api_stats(ctx)
+            ctx.call_on_close(lambda: log.info(f"===API CALLS===\n{api_stats.format_table()}"))
+
+    def out_callback(ctx, param, value):  # NOQA
+        if value is not None:
+            api_stats = get_api_stats(ctx)
+            ctx.call_on_close(lambda: api_stats.save(value))
+
+    f = click.option('--api-stats', is_flag=True, callback=callback, expose_value=False,
+                     help="Log a table of the REST api calls per endpoint with their count, errors, throttling, "
+                          "retries, response bytes and latency percentiles when the command finishes.")(f)
+    return click.option('--api-stats-out', type=click.Path(dir_okay=False), callback=out_callback,
+                        expose_value=False, help="Write the REST api call statistics as JSON to this file.")(f)
+
+
+def profile_out_option(f):
+    f = click.option('--profile-mode', type=click.Choice(PROFILE_MODES), default="cprofile", show_default=True,
+                     help="cprofile writes a pstats file, sampling writes folded stacks of all threads for flame "
+                          "graphs and tracemalloc writes the top allocation sites at the end of every major phase "
+                          "as JSON.")(f)
+    return click.option('--profile-out', type=click.Path(dir_okay=False), default=None,
+                        help="Profile the command and write the profile to this file.")(f)
+
+
+def workers_option(f):
+    return click.option('--workers', type=click.IntRange(min=1), default=1, show_default=True,
+                        help="Number of threads fetching content and rendering and validating hcl concurrently, the "
+                             "files are still written in order.")(f)
+
+
+def lfs_threshold_option(f):
+    return click.option('--lfs-threshold', type=click.IntRange(min=0), default=None,
+                        help="Store exported payloads larger than this many bytes as Git LFS objects, the repository "
+                             "keeps a pointer file. Pushing and applying them requires git-lfs.")(f)
+
+
+def content_addressed_option(f):
+    return click.option('--content-addressed', is_flag=True,
+                        help="Write exported payloads to files/by-hash/<sha256> and reference them by hash, identical "
+                             "payloads are written and stored once.")(f)
+
+
 def ssh_key_option(f):
     def callback(ctx, param, value):  # NOQA
         git_ssh_cmd = f"ssh -i {value}"
@@ -58,6 +131,45 @@ def ssh_key_option(f):
                         help='CLI connection profile to use. The default value is "~/.ssh/id_rsa".')(f)
 
 
+def get_api_client(profile, command_name, **kwargs) -> InstrumentedApiClient:
+    """
+    Creates an api client for the profile, or the default configuration when profile is None. The keyword arguments
+    are passed to InstrumentedApiClient.
+    """
+    if profile:
+        # If we request a specific profile, only get credentials from tere.
+        config = ProfileConfigProvider(profile).get_config()
+    else:
+        config = get_config()
+    if not config or not config.is_valid:
+        raise InvalidConfigurationError.for_profile(profile)
+    verify = config.insecure is None
+    if config.is_valid_with_token:
+        return InstrumentedApiClient(host=config.host, token=config.token, verify=verify, command_name=command_name,
+                                     **kwargs)
+    return InstrumentedApiClient(user=config.username, password=config.password, host=config.host, verify=verify,
+                                 command_name=command_name, **kwargs)
+
+
+def provide_api_client(function):
+    """
+    Injects the api_client keyword argument to the wrapped function like the databricks cli provide_api_client,
+    the client records its calls in the api statistics of the command.
+    All callbacks wrapped by provide_api_client expect the argument ``profile`` to be passed in.
+    """
+
+    @functools.wraps(function)
+    def decorator(*args, **kwargs):
+        ctx = click.get_current_context()
+        command_name = "-".join(ctx.command_path.split(" ")[1:])
+        command_name += "-" + str(uuid.uuid1())
+        kwargs['api_client'] = get_api_client(get_profile_from_context(), command_name)
+        return function(*args, **kwargs)
+
+    decorator.__doc__ = function.__doc__
+    return decorator
+
+
 def inject_profile_as_env(function):
     """
     Injects the api_client keyword argument to the wrapped function.
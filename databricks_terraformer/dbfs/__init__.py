@@ -1,31 +1,47 @@
 import io
 from base64 import b64decode
-from typing import Text, List
+from typing import Text, BinaryIO, Iterator, Dict, Any
 
 from databricks_cli.dbfs.api import FileInfo, BUFFER_SIZE_BYTES
 from databricks_cli.sdk import DbfsService
 from databricks_cli.utils import error_and_quit
 
+from databricks_terraformer import log
+from databricks_terraformer.utils.metrics import get_metrics, timed
+from databricks_terraformer.utils.patterns import PatternMatcher
 
-def _get_dbfs_file_data_recrusive(service: DbfsService, path):
-    resp = service.list(path)
-    if "files" not in resp:
-        return []
-    files = resp["files"]
-    output = []
-    for file in files:
+
+def _iter_dbfs_files(service: DbfsService, path, matcher: PatternMatcher = None) -> Iterator[Dict[Text, Any]]:
+    if matcher is not None and not matcher.could_match_under(path):
+        log.debug(f"Skipping {path}, no pattern of {matcher} can match below it")
+        return
+    metrics = get_metrics()
+    with metrics.timer("list", path):
+        resp = service.list(path)
+    for file in resp.get("files", []):
         if file["is_dir"] is True:
-            output += _get_dbfs_file_data_recrusive(service, file["path"])
+            yield from _iter_dbfs_files(service, file["path"], matcher)
         else:
-            output.append(file)
-    return output
+            metrics.count("list", objects=1)
+            yield file
 
 
-def get_dbfs_files_recursive(service: DbfsService, path) -> List[DbfsService]:
-    return _get_dbfs_file_data_recrusive(service, path)
+def get_dbfs_files_recursive(service: DbfsService, path, matcher: PatternMatcher = None) -> Iterator[Dict[Text, Any]]:
+    """
+    Yields the files below path while the directories are listed, only the listing of the current directory of every
+    level is kept in memory. Directories below which matcher can not match a file path are not listed.
+    """
+    return _iter_dbfs_files(service, path, matcher)
 
 
-def get_file_contents(dbfs_service: DbfsService, dbfs_path: Text, headers=None):
+@timed("fetch_content", resource_arg="dbfs_path")
+def download_file_contents(dbfs_service: DbfsService, dbfs_path: Text, f: BinaryIO, headers=None) -> bool:
+    """
+    Streams the file into the binary file f one read of BUFFER_SIZE_BYTES at a time, so large payloads (i.e. jars)
+    are never held in memory.
+
+    :return: always True, the file has content even when it is empty
+    """
     abs_path = f"dbfs:{dbfs_path}"
     json = dbfs_service.get_status(abs_path, headers=headers)
     file_info = FileInfo.from_json(json)
@@ -33,12 +49,19 @@ def get_file_contents(dbfs_service: DbfsService, dbfs_path: Text, headers=None):
         error_and_quit('The dbfs file {} is a directory.'.format(repr(abs_path)))
     length = file_info.file_size
     offset = 0
-    output = io.StringIO()
     while offset < length:
         response = dbfs_service.read(abs_path, offset, BUFFER_SIZE_BYTES,
                                      headers=headers)
         bytes_read = response['bytes_read']
         data = response['data']
         offset += bytes_read
-        output.write(b64decode(data).decode("utf-8"))
-    return output.getvalue()
+        get_metrics().count("fetch_content", bytes=bytes_read)
+        f.write(b64decode(data))
+    get_metrics().count("fetch_content", objects=1)
+    return True
+
+
+def get_file_contents(dbfs_service: DbfsService, dbfs_path: Text, headers=None):
+    output = io.BytesIO()
+    download_file_contents(dbfs_service, dbfs_path, output, headers=headers)
+    return output.getvalue().decode("utf-8")
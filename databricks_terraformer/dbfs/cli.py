@@ -1,19 +1,56 @@
 import click
-from databricks_cli.configure.config import debug_option, profile_option, provide_api_client
+from databricks_cli.configure.config import debug_option, profile_option
 from databricks_cli.sdk import ApiClient, DbfsService
 from databricks_cli.utils import eat_exceptions
 
-from databricks_terraformer import CONTEXT_SETTINGS, log
-from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option
-from databricks_terraformer.dbfs import get_file_contents, get_dbfs_files_recursive
-from databricks_terraformer.hcl import create_hcl_file
-from databricks_terraformer.hcl.json_to_hcl import validate_hcl, create_resource_from_dict
+from databricks_terraformer import CONTEXT_SETTINGS
+from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option, \
+    provide_api_client, workers_option, lfs_threshold_option, content_addressed_option
+from databricks_terraformer.dbfs import download_file_contents, get_dbfs_files_recursive
 from databricks_terraformer.utils import normalize_identifier
+from databricks_terraformer.utils.export_engine import ExportEngine, ExportSpec
 from databricks_terraformer.utils.git_handler import GitExportHandler
 from databricks_terraformer.utils.patterns import provide_pattern_func
 from databricks_terraformer.version import print_version_callback, version
 
 
+def export_dbfs(gh: GitExportHandler, api_client: ApiClient, pattern_matches, workers=1, dbfs_path="/"):
+    def get_resource_data(file, content_name):
+        return {
+            "@expr:source": f'pathexpand("{content_name}")',
+            "@expr:content_b64_md5": f'md5(filebase64(pathexpand("{content_name}")))',
+            "path": file["path"],
+            "overwrite": True,
+            "mkdirs": True,
+            "validate_remote_file": True,
+        }
+
+    def iter_files(files):
+        for file in files:
+            assert "path" in file
+            assert "is_dir" in file
+            assert "file_size" in file
+            if not file["is_dir"]:
+                yield file
+
+    service = DbfsService(api_client)
+
+    files = get_dbfs_files_recursive(service, dbfs_path, pattern_matches)
+
+    spec = ExportSpec(
+        "databricks_dbfs_file",
+        get_name=lambda file: file['path'],
+        get_identifier=lambda file: normalize_identifier(f"databricks_dbfs_file-{file['path']}"),
+        get_resource_data=get_resource_data,
+        # payloads are streamed to disk and hashed from there when content addressed
+        write_content=lambda file, f: download_file_contents(service, file["path"], f),
+        get_hcl_file_identity=lambda file: file['path'],
+        validate=True,
+    )
+    return ExportEngine(gh, spec, workspace_url=api_client.url, pattern_matches=pattern_matches,
+                        workers=workers).run(iter_files(files))
+
+
 @click.command(context_settings=CONTEXT_SETTINGS, help="Export DBFS files.")
 @click.option("--hcl", is_flag=True, help='Will export the data as HCL.')
 @click.option("--dbfs-path", required=True)
@@ -27,46 +64,15 @@ from databricks_terraformer.version import print_version_callback, version
 @delete_option
 @dry_run_option
 @tag_option
-def export_cli(tag, dry_run, dbfs_path, delete, git_ssh_url, api_client: ApiClient, hcl, pattern_matches):
+@workers_option
+@lfs_threshold_option
+@content_addressed_option
+def export_cli(tag, dry_run, dbfs_path, delete, git_ssh_url, api_client: ApiClient, hcl, workers, lfs_threshold,
+               content_addressed, pattern_matches):
     if hcl:
-        log.debug("this if debug")
-        service = DbfsService(api_client)
-
-        files = get_dbfs_files_recursive(service, dbfs_path)
-        log.info(files)
-
-        with GitExportHandler(git_ssh_url, "dbfs", delete_not_found=delete, dry_run=dry_run, tag=tag) as gh:
-            for file in files:
-                assert "path" in file
-                assert "is_dir" in file
-                assert "file_size" in file
-                if file["is_dir"]:
-                    continue
-                base_name = file["path"]
-
-                identifier = normalize_identifier(f"databricks_dbfs_file-{base_name}")
-                dbfs_resource_data = {
-                    "@expr:source": f'pathexpand("{identifier}")',
-                    "@expr:content_b64_md5": f'md5(filebase64(pathexpand("{identifier}")))',
-                    "path": file["path"],
-                    "overwrite": True,
-                    "mkdirs": True,
-                    "validate_remote_file": True,
-                }
-
-                name = "databricks_dbfs_file"
-
-                dbfs_file_hcl = create_resource_from_dict(name, identifier, dbfs_resource_data, False)
-
-                processed_hcl_file = create_hcl_file(file['path'], api_client.url, dbfs_resource_data,
-                                                     dbfs_file_hcl)
-
-                gh.add_file(f"{identifier}.tf", processed_hcl_file)
-                gh.add_file(f"files/{identifier}", get_file_contents(service, file["path"]))
-                hcl_errors = validate_hcl(dbfs_file_hcl)
-                if len(hcl_errors) > 0:
-                    log.error(f"Identified error in the following HCL Config: {dbfs_file_hcl}")
-                    log.error(hcl_errors)
+        with GitExportHandler(git_ssh_url, "dbfs", delete_not_found=delete, dry_run=dry_run, tag=tag,
+                              lfs_threshold=lfs_threshold, content_addressed=content_addressed) as gh:
+            export_dbfs(gh, api_client, pattern_matches, workers, dbfs_path=dbfs_path)
 
 
 @click.group(context_settings=CONTEXT_SETTINGS,
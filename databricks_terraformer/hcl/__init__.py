@@ -5,6 +5,8 @@ from typing import Text, Dict, Any
 
 from jinja2 import Environment, FileSystemLoader
 
+from databricks_terraformer.utils.metrics import timed
+
 
 def _comment(data):
     arr = []
@@ -13,6 +15,7 @@ def _comment(data):
     return "\n".join(arr)
 
 
+@timed("render_hcl_file", resource_arg="identity")
 def create_hcl_file(identity: Text,
                     workspace_url: Text,
                     raw_dict: Dict[Text, Any],
@@ -3,6 +3,8 @@ import os
 from ctypes import *
 from typing import Text, Any, Dict
 
+from databricks_terraformer.utils.metrics import timed
+
 so_path = os.path.join(os.path.dirname(__file__), 'json2hcl.so')
 lib = cdll.LoadLibrary(so_path)
 
@@ -51,6 +53,7 @@ def _create_hcl_from_json(object_type: Text, object_name: Text, object_identifie
         return output.hcl.decode("UTF-8")
 
 
+@timed("render_hcl", resource_arg="resource_identifier")
 def create_resource_from_dict(resource_name: Text, resource_identifier: Text,
                               resource_dict: Dict[Text, Any], debug: bool):
     return _create_hcl_from_json("resource", resource_name, resource_identifier, resource_dict, debug)
@@ -69,6 +72,7 @@ lib.ValidateHCL.argtypes = [GoString, c_ubyte]
 lib.ValidateHCL.restype = ValidateHCLResponse
 
 
+@timed("validate_hcl")
 def validate_hcl(hcl_string: Text, debug: bool = False) -> Text:
     b_hcl_string = hcl_string.encode("utf-8")
     go_hcl_string = GoString(b_hcl_string, len(b_hcl_string))
@@ -1,31 +1,21 @@
 import click
-from databricks_cli.configure.config import debug_option, profile_option, provide_api_client
+from databricks_cli.configure.config import debug_option, profile_option
 from databricks_cli.instance_pools.api import InstancePoolsApi
 from databricks_cli.sdk import ApiClient
 from databricks_cli.utils import eat_exceptions
 
 from databricks_terraformer import CONTEXT_SETTINGS, log
-from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option
-from databricks_terraformer.hcl.json_to_hcl import create_resource_from_dict
+from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option, \
+    provide_api_client, workers_option
 from databricks_terraformer.utils import handle_block, handle_map, normalize_identifier, prep_json
+from databricks_terraformer.utils.export_engine import ExportEngine, ExportSpec
 from databricks_terraformer.utils.git_handler import GitExportHandler
+from databricks_terraformer.utils.metrics import get_metrics
 from databricks_terraformer.utils.patterns import provide_pattern_func
 from databricks_terraformer.version import print_version_callback, version
 
 
-@click.command(context_settings=CONTEXT_SETTINGS, help="Export Instance Pools.")
-@click.option("--hcl", is_flag=True, help='Will export the data as HCL.')
-@provide_pattern_func("pattern_matches")
-@debug_option
-@profile_option
-@eat_exceptions
-@provide_api_client
-@git_url_option
-@ssh_key_option
-@delete_option
-@dry_run_option
-@tag_option
-def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, pattern_matches):
+def export_instance_pools(gh: GitExportHandler, api_client: ApiClient, pattern_matches, workers=1):
     block_key_map = {
         "aws_attributes": handle_block,
         "disk_spec": handle_block,
@@ -38,29 +28,40 @@ def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, pa
         "instance_pool_name", "min_idle_instances", "idle_instance_autotermination_minutes", "node_type_id"
     }
 
-    if hcl:
-        pool_api = InstancePoolsApi(api_client)
+    pool_api = InstancePoolsApi(api_client)
 
+    with get_metrics().timer("list"):
         pools = pool_api.list_instance_pools()["instance_pools"]
-        log.info(pools)
-
-        with GitExportHandler(git_ssh_url, "instance_pools", delete_not_found=delete, dry_run=dry_run, tag=tag) as gh:
-            for pool in pools:
-                if not pattern_matches(pool["instance_pool_name"]):
-                    log.debug(f"{pool['instance_pool_name']} did not match pattern function {pattern_matches}")
-                    continue
-                log.debug(f"{pool['instance_pool_name']} matched the pattern function {pattern_matches}")
-                pool_resource_data = prep_json(block_key_map, ignore_attribute_key, pool, required_attributes_key)
+    get_metrics().count("list", objects=len(pools))
+    log.info(f"Listed {len(pools)} instance pools")
 
-                base_name = normalize_identifier(pool["instance_pool_name"])
-                name = "databricks_instance_pool"
-                identifier = f"databricks_instance_pool-{base_name}"
+    spec = ExportSpec(
+        "databricks_instance_pool",
+        get_name=lambda pool: pool["instance_pool_name"],
+        get_identifier=lambda pool: f"databricks_instance_pool-{normalize_identifier(pool['instance_pool_name'])}",
+        get_resource_data=lambda pool: prep_json(block_key_map, ignore_attribute_key, pool,
+                                                 required_attributes_key),
+    )
+    return ExportEngine(gh, spec, pattern_matches=pattern_matches, workers=workers).run(pools)
 
-                instance_pool_hcl = create_resource_from_dict(name, identifier, pool_resource_data, False)
 
-                file_name_identifier = f"{identifier}.tf"
-                gh.add_file(file_name_identifier, instance_pool_hcl)
-                log.debug(instance_pool_hcl)
+@click.command(context_settings=CONTEXT_SETTINGS, help="Export Instance Pools.")
+@click.option("--hcl", is_flag=True, help='Will export the data as HCL.')
+@provide_pattern_func("pattern_matches")
+@debug_option
+@profile_option
+@eat_exceptions
+@provide_api_client
+@git_url_option
+@ssh_key_option
+@delete_option
+@dry_run_option
+@tag_option
+@workers_option
+def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, workers, pattern_matches):
+    if hcl:
+        with GitExportHandler(git_ssh_url, "instance_pools", delete_not_found=delete, dry_run=dry_run, tag=tag) as gh:
+            export_instance_pools(gh, api_client, pattern_matches, workers)
 
 
 @click.group(context_settings=CONTEXT_SETTINGS,
@@ -1,17 +1,51 @@
 import click
-from databricks_cli.configure.config import debug_option, profile_option, provide_api_client
+from databricks_cli.configure.config import debug_option, profile_option
 from databricks_cli.sdk import ApiClient
 from databricks_cli.utils import eat_exceptions
 
 from databricks_terraformer import CONTEXT_SETTINGS, log
-from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option
-from databricks_terraformer.hcl.json_to_hcl import create_resource_from_dict
+from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option, \
+    provide_api_client, workers_option
 from databricks_terraformer.utils import normalize_identifier, prep_json
+from databricks_terraformer.utils.export_engine import ExportEngine, ExportSpec
 from databricks_terraformer.utils.git_handler import GitExportHandler
+from databricks_terraformer.utils.metrics import get_metrics
 from databricks_terraformer.utils.patterns import provide_pattern_func
 from databricks_terraformer.version import print_version_callback, version
 
 
+def export_instance_profiles(gh: GitExportHandler, api_client: ApiClient, pattern_matches, workers=1):
+    block_key_map = {
+    }
+    ignore_attribute_key = {
+    }
+    required_attributes_key = {
+        "instance_profile_arn"
+    }
+
+    def get_resource_data(profile):
+        profile_resource_data = prep_json(block_key_map, ignore_attribute_key, profile, required_attributes_key)
+        #Force validation. If we import it, we might as well be able to use it
+        profile_resource_data["skip_validation"] = False
+        return profile_resource_data
+
+    _data = {}
+    headers = None
+    with get_metrics().timer("list"):
+        profiles = api_client.perform_query('GET', '/instance-profiles/list', data=_data, headers=headers)["instance_profiles"]
+    get_metrics().count("list", objects=len(profiles))
+    log.info(f"Listed {len(profiles)} instance profiles")
+
+    spec = ExportSpec(
+        "databricks_instance_profile",
+        get_name=lambda profile: profile["instance_profile_arn"],
+        get_identifier=lambda profile:
+        f"databricks_instance_profile-{normalize_identifier(profile['instance_profile_arn'])}",
+        get_resource_data=get_resource_data,
+    )
+    return ExportEngine(gh, spec, pattern_matches=pattern_matches, workers=workers).run(profiles)
+
+
 @click.command(context_settings=CONTEXT_SETTINGS, help="Export Instance Profiles.")
 @click.option("--hcl", is_flag=True, help='Will export the data as HCL.')
 @provide_pattern_func("pattern_matches")
@@ -24,40 +58,11 @@ from databricks_terraformer.version import print_version_callback, version
 @delete_option
 @dry_run_option
 @tag_option
-def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, pattern_matches):
-    block_key_map = {
-    }
-    ignore_attribute_key = {
-    }
-    required_attributes_key = {
-        "instance_profile_arn"
-    }
-
+@workers_option
+def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, workers, pattern_matches):
     if hcl:
-        _data = {}
-        headers = None
-        profiles = api_client.perform_query('GET', '/instance-profiles/list', data=_data, headers=headers)["instance_profiles"]
-        log.info(profiles)
-
         with GitExportHandler(git_ssh_url, "instance_profiles", delete_not_found=delete, dry_run=dry_run, tag=tag) as gh:
-            for profile in profiles:
-                if not pattern_matches(profile["instance_profile_arn"]):
-                    log.debug(f"{profile['instance_profile_arn']} did not match pattern function {pattern_matches}")
-                    continue
-                log.debug(f"{profile['instance_profile_arn']} matched the pattern function {pattern_matches}")
-                profile_resource_data = prep_json(block_key_map, ignore_attribute_key, profile, required_attributes_key)
-
-                base_name = normalize_identifier(profile["instance_profile_arn"])
-                name = "databricks_instance_profile"
-                identifier = f"databricks_instance_profile-{base_name}"
-
-                #Force validation. If we import it, we might as well be able to use it
-                profile_resource_data["skip_validation"] = False
-                instance_profile_hcl = create_resource_from_dict(name, identifier, profile_resource_data, False)
-
-                file_name_identifier = f"{identifier}.tf"
-                gh.add_file(file_name_identifier, instance_profile_hcl)
-                log.debug(instance_profile_hcl)
+            export_instance_profiles(gh, api_client, pattern_matches, workers)
 
 
 @click.group(context_settings=CONTEXT_SETTINGS,
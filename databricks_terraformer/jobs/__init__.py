@@ -0,0 +1,27 @@
+from typing import Dict, Any, Iterator
+
+from databricks_cli.sdk import ApiClient
+
+from databricks_terraformer import log
+from databricks_terraformer.utils.metrics import get_metrics
+
+
+def iter_jobs(api_client: ApiClient, page_size=25) -> Iterator[Dict[str, Any]]:
+    """
+    Lists the jobs one page at a time with offset/limit, only the current page is kept in memory.
+    Workspaces which do not paginate jobs/list return every job in the first response without has_more.
+    """
+    metrics = get_metrics()
+    offset = 0
+    pages = 0
+    while True:
+        with metrics.timer("list"):
+            resp = api_client.perform_query("GET", "/jobs/list", data={"offset": offset, "limit": page_size})
+        jobs = resp.get("jobs", [])
+        metrics.count("list", objects=len(jobs))
+        pages += 1
+        offset += len(jobs)
+        yield from jobs
+        if not resp.get("has_more", False) or len(jobs) == 0:
+            break
+    log.info(f"Listed {offset} jobs in {pages} pages")
@@ -1,13 +1,14 @@
 import click
-from databricks_cli.configure.config import debug_option, profile_option, provide_api_client
-from databricks_cli.jobs.api import JobsApi
+from databricks_cli.configure.config import debug_option, profile_option
 from databricks_cli.sdk import ApiClient
 from databricks_cli.utils import eat_exceptions
 
 from databricks_terraformer import CONTEXT_SETTINGS, log
-from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option
-from databricks_terraformer.hcl.json_to_hcl import create_resource_from_dict
+from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option, \
+    provide_api_client, workers_option
+from databricks_terraformer.jobs import iter_jobs
 from databricks_terraformer.utils import handle_block, handle_map, normalize_identifier, prep_json
+from databricks_terraformer.utils.export_engine import ExportEngine, ExportSpec
 from databricks_terraformer.utils.git_handler import GitExportHandler
 from databricks_terraformer.utils.patterns import provide_pattern_func
 from databricks_terraformer.version import print_version_callback, version
@@ -23,19 +24,7 @@ def handle_libraries(resource_data, object, map):
 
 
 
-@click.command(context_settings=CONTEXT_SETTINGS, help="Export Jobs.")
-@click.option("--hcl", is_flag=True, help='Will export the data as HCL.')
-@provide_pattern_func("pattern_matches")
-@debug_option
-@profile_option
-@eat_exceptions
-@provide_api_client
-@git_url_option
-@ssh_key_option
-@delete_option
-@dry_run_option
-@tag_option
-def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, pattern_matches):
+def export_jobs(gh: GitExportHandler, api_client: ApiClient, pattern_matches, workers=1, page_size=25):
     block_key_map = {
         "new_cluster": handle_block,
         "notebook_task": handle_block,
@@ -54,31 +43,41 @@ def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, pa
         "max_concurrent_runs", "name"
     }
 
-    if hcl:
-        job_api = JobsApi(api_client)
+    def get_resource_data(job):
+        job_resource_data = prep_json(block_key_map, ignore_attribute_key, job['settings'], required_attributes_key)
+        #need to escape quotes in the name.
+        job_resource_data['name'] = job_resource_data['name'].replace('"','\\"')
+        return job_resource_data
+
+    spec = ExportSpec(
+        "databricks_job",
+        get_name=lambda job: job["settings"]["name"],
+        get_identifier=lambda job: f"databricks_job-{normalize_identifier(job['settings']['name'])}",
+        get_resource_data=get_resource_data,
+    )
+    return ExportEngine(gh, spec, pattern_matches=pattern_matches, workers=workers).run(
+        iter_jobs(api_client, page_size))
 
-        jobs = job_api.list_jobs()["jobs"]
-        log.info(jobs)
 
+@click.command(context_settings=CONTEXT_SETTINGS, help="Export Jobs.")
+@click.option("--hcl", is_flag=True, help='Will export the data as HCL.')
+@click.option("--page-size", type=click.IntRange(min=1), default=25, show_default=True,
+              help="Number of jobs listed per request, only one page of jobs is kept in memory.")
+@provide_pattern_func("pattern_matches")
+@debug_option
+@profile_option
+@eat_exceptions
+@provide_api_client
+@git_url_option
+@ssh_key_option
+@delete_option
+@dry_run_option
+@tag_option
+@workers_option
+def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, page_size, workers, pattern_matches):
+    if hcl:
         with GitExportHandler(git_ssh_url, "jobs", delete_not_found=delete, dry_run=dry_run, tag=tag) as gh:
-            for job in jobs:
-                if not pattern_matches(job["settings"]["name"]):
-                    log.debug(f"{job['settings']['name']} did not match pattern function {pattern_matches}")
-                    continue
-                log.debug(f"{job['settings']['name']} matched the pattern function {pattern_matches}")
-                job_resource_data = prep_json(block_key_map, ignore_attribute_key, job['settings'], required_attributes_key)
-
-                base_name = normalize_identifier(job['settings']['name'])
-                name = "databricks_job"
-                identifier = f"databricks_job-{base_name}"
-
-                #need to escape quotes in the name.
-                job_resource_data['name'] = job_resource_data['name'].replace('"','\\"')
-
-                instance_job_hcl = create_resource_from_dict(name, identifier, job_resource_data, False)
-                file_name_identifier = f"{identifier}.tf"
-                gh.add_file(file_name_identifier, instance_job_hcl)
-                log.debug(instance_job_hcl)
+            export_jobs(gh, api_client, pattern_matches, workers, page_size)
 
 
 @click.group(context_settings=CONTEXT_SETTINGS,
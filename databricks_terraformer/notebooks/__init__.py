@@ -1,34 +1,84 @@
 from base64 import b64decode
-from typing import List
+from typing import Optional, BinaryIO, Iterator
 
-from databricks_cli.sdk import ApiClient, WorkspaceService
+import requests
+
+from databricks_cli.sdk import WorkspaceService
 from databricks_cli.workspace.api import WorkspaceFileInfo
 
 from databricks_terraformer import log
+from databricks_terraformer.utils.api_client import InstrumentedApiClient
+from databricks_terraformer.utils.metrics import get_metrics, timed
+from databricks_terraformer.utils.patterns import PatternMatcher
 
 
-def _get_notebooks_recrusive(service: WorkspaceService, path):
-    resp = service.list(path)
-    if "objects" not in resp:
-        return []
-    objects = resp["objects"]
-    output = []
-    for obj in objects:
+def _iter_notebooks(service: WorkspaceService, path, matcher: PatternMatcher = None) -> Iterator[WorkspaceFileInfo]:
+    if matcher is not None and not matcher.could_match_under(path):
+        log.debug(f"Skipping {path}, no pattern of {matcher} can match below it")
+        return
+    metrics = get_metrics()
+    with metrics.timer("list", path):
+        resp = service.list(path)
+    for obj in resp.get("objects", []):
         workspace_obj = WorkspaceFileInfo.from_json(obj)
         if workspace_obj.is_notebook is True:
-            output.append(workspace_obj)
+            metrics.count("list", objects=1)
+            yield workspace_obj
         if workspace_obj.is_dir is True:
-            output += _get_notebooks_recrusive(service, workspace_obj.path)
-    return output
+            yield from _iter_notebooks(service, workspace_obj.path, matcher)
 
 
-def get_content(service: WorkspaceService, path):
-    data = service.export_workspace(path, format="SOURCE")
+def _decode_content(path, data) -> Optional[bytes]:
     if "content" not in data:
         log.error(f"Unable to find content for file {path}")
         return None
-    return b64decode(data["content"].encode("utf-8")).decode("utf-8")
+    return b64decode(data["content"].encode("utf-8"))
+
+
+@timed("fetch_content", resource_arg="path")
+def get_content(service: WorkspaceService, path):
+    content = _decode_content(path, service.export_workspace(path, format="SOURCE"))
+    if content is None:
+        return None
+    get_metrics().count("fetch_content", objects=1, bytes=len(content))
+    return content.decode("utf-8")
+
+
+@timed("fetch_content", resource_arg="path")
+def download_content(service: WorkspaceService, path, f: BinaryIO) -> bool:
+    """
+    Streams the SOURCE of the notebook into the binary file f with a direct download export, falls back to the
+    base64 JSON export when the api client can not stream or the workspace does not answer with the raw file.
+
+    :return: False when the notebook has no content
+    """
+    data = None
+    if isinstance(service.client, InstrumentedApiClient):
+        try:
+            data = service.client.perform_download(
+                "/workspace/export", {"path": path, "format": "SOURCE", "direct_download": True}, f)
+        except requests.exceptions.HTTPError as e:
+            log.debug(f"Direct download of {path} failed, falling back to the JSON export: {e}")
+        else:
+            if data is None:
+                get_metrics().count("fetch_content", objects=1, bytes=f.tell())
+                return True
+    if data is None:
+        data = service.export_workspace(path, format="SOURCE")
+    content = _decode_content(path, data)
+    if content is None:
+        return False
+    f.seek(0)
+    f.truncate()
+    f.write(content)
+    get_metrics().count("fetch_content", objects=1, bytes=len(content))
+    return True
 
 
-def get_workspace_notebooks_recursive(service: WorkspaceService, path) -> List[WorkspaceFileInfo]:
-    return _get_notebooks_recrusive(service, path)
+def get_workspace_notebooks_recursive(service: WorkspaceService, path,
+                                      matcher: PatternMatcher = None) -> Iterator[WorkspaceFileInfo]:
+    """
+    Yields the notebooks below path while the folders are listed, only the listing of the current folder of every
+    level is kept in memory. Folders below which matcher can not match a notebook path are not listed.
+    """
+    return _iter_notebooks(service, path, matcher)
@@ -0,0 +1,126 @@
+import json
+import posixpath
+import re
+import zipfile
+from base64 import b64decode
+from io import BytesIO
+from typing import Iterator, Text, Optional
+
+import requests
+from databricks_cli.sdk import WorkspaceService
+from databricks_cli.workspace.api import WorkspaceFileInfo
+
+from databricks_terraformer import log
+from databricks_terraformer.notebooks import get_content
+from databricks_terraformer.utils.metrics import get_metrics, timed
+from databricks_terraformer.utils.patterns import PatternMatcher
+
+DBC_LANGUAGES = {".python": "PYTHON", ".scala": "SCALA", ".sql": "SQL", ".r": "R"}
+_COMMENTS = {"PYTHON": "#", "SCALA": "//", "SQL": "--", "R": "#"}
+# error codes and messages of exports refused because of their size
+_TOO_LARGE_ERROR_CODES = ["MAX_NOTEBOOK_SIZE_EXCEEDED", "MAX_READ_SIZE_EXCEEDED"]
+_TOO_LARGE_MESSAGE = re.compile(r"too large|exceeds? the maximum", re.IGNORECASE)
+
+
+class ArchivedNotebook:
+    """
+    A notebook of a DBC archive, or of a folder which was too large to be archived when content is None.
+    """
+
+    def __init__(self, path: Text, language: Text, content: Optional[Text] = None):
+        self.path = path
+        self.language = language
+        self.content = content
+
+    def get_content(self, service: WorkspaceService):
+        return self.content if self.content is not None else get_content(service, self.path)
+
+
+def dbc_notebook_to_source(notebook: dict, language: Text) -> Text:
+    """
+    Converts a notebook of a DBC archive to the SOURCE export format: the commands in order separated by COMMAND
+    lines, commands in another language (magic commands) are commented with MAGIC.
+    """
+    comment = _COMMENTS.get(language, "#")
+    cells = []
+    for command in sorted(notebook.get("commands", []), key=lambda c: c.get("position", 0)):
+        text = command.get("command", "")
+        if text.startswith("%"):
+            text = "\n".join(f"{comment} MAGIC {line}".rstrip() for line in text.split("\n"))
+        cells.append(text)
+    return f"{comment} Databricks notebook source\n" + f"\n\n{comment} COMMAND ----------\n\n".join(cells)
+
+
+@timed("fetch_archive", resource_arg="path")
+def _export_archive(service: WorkspaceService, path) -> bytes:
+    data = service.export_workspace(path, format="DBC")
+    archive = b64decode(data["content"].encode("utf-8"))
+    get_metrics().count("fetch_archive", objects=1, bytes=len(archive))
+    return archive
+
+
+def _unpack_archive(archive: bytes, path) -> Iterator[ArchivedNotebook]:
+    # entries are relative to the parent of the archived folder, i.e. <folder>/<sub folder>/<notebook>.python
+    parent = posixpath.dirname(path.rstrip("/"))
+    with zipfile.ZipFile(BytesIO(archive)) as zf:
+        for info in zf.infolist():
+            name, extension = posixpath.splitext(info.filename)
+            if info.is_dir() or extension not in DBC_LANGUAGES:
+                continue
+            language = DBC_LANGUAGES[extension]
+            # one entry is read and converted at a time
+            with zf.open(info) as f:
+                notebook = json.load(f)
+            yield ArchivedNotebook(posixpath.join(parent, name), language, dbc_notebook_to_source(notebook, language))
+
+
+def _is_too_large(error: requests.exceptions.HTTPError):
+    """
+    :return: whether the workspace refused the export because of its size, other bad requests are real errors
+    """
+    response = error.response
+    if response is None or response.status_code not in [400, 413]:
+        return False
+    if response.status_code == 413:
+        return True
+    try:
+        body = response.json()
+    except ValueError:
+        return False
+    if not isinstance(body, dict):
+        return False
+    return body.get("error_code") in _TOO_LARGE_ERROR_CODES or \
+        _TOO_LARGE_MESSAGE.search(body.get("message") or "") is not None
+
+
+def iter_archived_notebooks(service: WorkspaceService, path, matcher: PatternMatcher = None) \
+        -> Iterator[ArchivedNotebook]:
+    """
+    Exports every folder below path as one DBC archive and yields its notebooks. Folders the workspace refuses to
+    archive because they are too large are split into their sub folders, their own notebooks are fetched one by one.
+    """
+    if matcher is not None and not matcher.could_match_under(path):
+        log.debug(f"Skipping {path}, no pattern of {matcher} can match below it")
+        return
+    resp = service.list(path)
+    for obj in resp.get("objects", []):
+        workspace_obj = WorkspaceFileInfo.from_json(obj)
+        if workspace_obj.is_notebook is True:
+            yield ArchivedNotebook(workspace_obj.path, workspace_obj.language)
+        if workspace_obj.is_dir is True:
+            yield from _iter_folder(service, workspace_obj.path, matcher)
+
+
+def _iter_folder(service: WorkspaceService, path, matcher: PatternMatcher = None) -> Iterator[ArchivedNotebook]:
+    if matcher is not None and not matcher.could_match_under(path):
+        log.debug(f"Skipping {path}, no pattern of {matcher} can match below it")
+        return
+    try:
+        archive = _export_archive(service, path)
+    except requests.exceptions.HTTPError as e:
+        if not _is_too_large(e):
+            raise
+        log.info(f"Unable to export {path} as one archive, splitting it: {e}")
+        yield from iter_archived_notebooks(service, path, matcher)
+        return
+    yield from _unpack_archive(archive, path)
@@ -1,18 +1,52 @@
 import click
-from databricks_cli.configure.config import debug_option, profile_option, provide_api_client
+from databricks_cli.configure.config import debug_option, profile_option
 from databricks_cli.sdk import ApiClient
 from databricks_cli.secrets.api import SecretApi
 from databricks_cli.utils import eat_exceptions
 
 from databricks_terraformer import CONTEXT_SETTINGS, log
-from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option
-from databricks_terraformer.hcl.json_to_hcl import create_resource_from_dict
+from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option, \
+    provide_api_client, workers_option
 from databricks_terraformer.utils import normalize_identifier, prep_json
+from databricks_terraformer.utils.export_engine import ExportEngine, ExportSpec
 from databricks_terraformer.utils.git_handler import GitExportHandler
+from databricks_terraformer.utils.metrics import get_metrics
 from databricks_terraformer.utils.patterns import provide_pattern_func
 from databricks_terraformer.version import print_version_callback, version
 
 
+def iter_secret_acls(secret_api: SecretApi):
+    with get_metrics().timer("list"):
+        scopes = secret_api.list_scopes()["scopes"]
+    for scope in scopes:
+        with get_metrics().timer("list"):
+            acls = secret_api.list_acls(scope["name"])["items"]
+        get_metrics().count("list", objects=len(acls))
+        log.info(f"Listed {len(acls)} acls in scope {scope['name']}")
+        for acl in acls:
+            yield {**acl, "scope": scope["name"]}
+
+
+def export_secret_acls(gh: GitExportHandler, api_client: ApiClient, pattern_matches, workers=1):
+    block_key_map = {
+    }
+    ignore_attribute_key = {
+    }
+    required_attributes_key = {
+        "principal", "permission", "scope"
+    }
+
+    secret_api = SecretApi(api_client)
+
+    # acls are not filtered by the pattern
+    spec = ExportSpec(
+        "databricks_secret_acl",
+        get_identifier=lambda acl: f"databricks_secret_acl-{normalize_identifier(acl['principal'])}",
+        get_resource_data=lambda acl: prep_json(block_key_map, ignore_attribute_key, acl, required_attributes_key),
+    )
+    return ExportEngine(gh, spec, workers=workers).run(iter_secret_acls(secret_api))
+
+
 @click.command(context_settings=CONTEXT_SETTINGS, help="Export Secrets for all Scopes.")
 @click.option("--hcl", is_flag=True, help='Will export the data as HCL.')
 @provide_pattern_func("pattern_matches")
@@ -25,40 +59,11 @@ from databricks_terraformer.version import print_version_callback, version
 @delete_option
 @dry_run_option
 @tag_option
-def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, pattern_matches):
-    block_key_map = {
-    }
-    ignore_attribute_key = {
-    }
-    required_attributes_key = {
-        "principal", "permission"
-    }
-
+@workers_option
+def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, workers, pattern_matches):
     if hcl:
-        secret_api = SecretApi(api_client)
-
-        scopes = secret_api.list_scopes()["scopes"]
-        log.info(scopes)
-
         with GitExportHandler(git_ssh_url, "secret_acls", delete_not_found=delete, dry_run=dry_run, tag=tag) as gh:
-            for scope in scopes:
-                acls = secret_api.list_acls(scope["name"])["items"]
-                log.info(acls)
-
-                for acl in acls:
-                    acl_resource_data = prep_json(block_key_map, ignore_attribute_key, acl, required_attributes_key)
-
-                    base_name = normalize_identifier(acl["principal"])
-                    name = "databricks_secret_acl"
-                    identifier = f"databricks_secret_acl-{base_name}"
-
-                    acl_resource_data["scope"] = scope["name"]
-
-                    acl_hcl = create_resource_from_dict(name, identifier, acl_resource_data, False)
-
-                    file_name_identifier = f"{identifier}.tf"
-                    gh.add_file(file_name_identifier, acl_hcl)
-                    log.debug(acl_hcl)
+            export_secret_acls(gh, api_client, pattern_matches, workers)
 
 
 @click.group(context_settings=CONTEXT_SETTINGS,
@@ -1,18 +1,46 @@
 import click
-from databricks_cli.configure.config import debug_option, profile_option, provide_api_client
+from databricks_cli.configure.config import debug_option, profile_option
 from databricks_cli.sdk import ApiClient
 from databricks_cli.secrets.api import SecretApi
 from databricks_cli.utils import eat_exceptions
 
 from databricks_terraformer import CONTEXT_SETTINGS, log
-from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option
-from databricks_terraformer.hcl.json_to_hcl import create_resource_from_dict
+from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option, \
+    provide_api_client, workers_option
 from databricks_terraformer.utils import normalize_identifier, prep_json
+from databricks_terraformer.utils.export_engine import ExportEngine, ExportSpec
 from databricks_terraformer.utils.git_handler import GitExportHandler
+from databricks_terraformer.utils.metrics import get_metrics
 from databricks_terraformer.utils.patterns import provide_pattern_func
 from databricks_terraformer.version import print_version_callback, version
 
 
+def export_secret_scopes(gh: GitExportHandler, api_client: ApiClient, pattern_matches, workers=1):
+    block_key_map = {
+    }
+    ignore_attribute_key = {
+    }
+    required_attributes_key = {
+        "name", "backend_type", "is_databricks_managed"
+    }
+
+    secret_api = SecretApi(api_client)
+
+    with get_metrics().timer("list"):
+        scopes = secret_api.list_scopes()["scopes"]
+    get_metrics().count("list", objects=len(scopes))
+    log.info(f"Listed {len(scopes)} secret scopes")
+
+    spec = ExportSpec(
+        "databricks_secret_scope",
+        get_name=lambda scope: scope["name"],
+        get_identifier=lambda scope: f"databricks_secret_scope-{normalize_identifier(scope['name'])}",
+        get_resource_data=lambda scope: prep_json(block_key_map, ignore_attribute_key, scope,
+                                                  required_attributes_key),
+    )
+    return ExportEngine(gh, spec, pattern_matches=pattern_matches, workers=workers).run(scopes)
+
+
 @click.command(context_settings=CONTEXT_SETTINGS, help="Export Secret Scopes.")
 @click.option("--hcl", is_flag=True, help='Will export the data as HCL.')
 @provide_pattern_func("pattern_matches")
@@ -25,38 +53,11 @@ from databricks_terraformer.version import print_version_callback, version
 @delete_option
 @dry_run_option
 @tag_option
-def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, pattern_matches):
-    block_key_map = {
-    }
-    ignore_attribute_key = {
-    }
-    required_attributes_key = {
-        "name", "backend_type", "is_databricks_managed"
-    }
-
+@workers_option
+def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, workers, pattern_matches):
     if hcl:
-        secret_api = SecretApi(api_client)
-
-        scopes = secret_api.list_scopes()["scopes"]
-        log.info(scopes)
-
         with GitExportHandler(git_ssh_url, "secret_scopes", delete_not_found=delete, dry_run=dry_run, tag=tag) as gh:
-            for scope in scopes:
-                if not pattern_matches(scope["name"]):
-                    log.debug(f"{scope['name']} did not match pattern function {pattern_matches}")
-                    continue
-                log.debug(f"{scope['name']} matched the pattern function {pattern_matches}")
-                scope_resource_data = prep_json(block_key_map, ignore_attribute_key, scope, required_attributes_key)
-
-                base_name = normalize_identifier(scope["name"])
-                name = "databricks_secret_scope"
-                identifier = f"databricks_secret_scope-{base_name}"
-
-                secret_scope_hcl = create_resource_from_dict(name, identifier, scope_resource_data, False)
-
-                file_name_identifier = f"{identifier}.tf"
-                gh.add_file(file_name_identifier, secret_scope_hcl)
-                log.debug(secret_scope_hcl)
+            export_secret_scopes(gh, api_client, pattern_matches, workers)
 
 
 @click.group(context_settings=CONTEXT_SETTINGS,
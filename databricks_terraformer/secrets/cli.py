@@ -1,18 +1,54 @@
 import click
-from databricks_cli.configure.config import debug_option, profile_option, provide_api_client
+from databricks_cli.configure.config import debug_option, profile_option
 from databricks_cli.sdk import ApiClient
 from databricks_cli.secrets.api import SecretApi
 from databricks_cli.utils import eat_exceptions
 
 from databricks_terraformer import CONTEXT_SETTINGS, log
-from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option
-from databricks_terraformer.hcl.json_to_hcl import create_resource_from_dict
+from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option, \
+    provide_api_client, workers_option
 from databricks_terraformer.utils import normalize_identifier, prep_json
+from databricks_terraformer.utils.export_engine import ExportEngine, ExportSpec
 from databricks_terraformer.utils.git_handler import GitExportHandler
+from databricks_terraformer.utils.metrics import get_metrics
 from databricks_terraformer.utils.patterns import provide_pattern_func
 from databricks_terraformer.version import print_version_callback, version
 
 
+def iter_secrets(secret_api: SecretApi):
+    with get_metrics().timer("list"):
+        scopes = secret_api.list_scopes()["scopes"]
+    for scope in scopes:
+        with get_metrics().timer("list"):
+            secrets = secret_api.list_secrets(scope["name"])["secrets"]
+        get_metrics().count("list", objects=len(secrets))
+        log.info(f"Listed {len(secrets)} secrets in scope {scope['name']}")
+        for secret in secrets:
+            yield {**secret, "scope": scope["name"]}
+
+
+def export_secrets(gh: GitExportHandler, api_client: ApiClient, pattern_matches, workers=1):
+    block_key_map = {
+    }
+    ignore_attribute_key = {
+        "last_updated_timestamp"
+    }
+    required_attributes_key = {
+        "key", "scope"
+    }
+
+    secret_api = SecretApi(api_client)
+
+    spec = ExportSpec(
+        "databricks_secret",
+        get_name=lambda secret: secret["key"],
+        get_identifier=lambda secret: f"databricks_secret-{normalize_identifier(secret['key'])}",
+        get_resource_data=lambda secret: prep_json(block_key_map, ignore_attribute_key, secret,
+                                                   required_attributes_key),
+    )
+    return ExportEngine(gh, spec, pattern_matches=pattern_matches, workers=workers).run(iter_secrets(secret_api))
+
+
 @click.command(context_settings=CONTEXT_SETTINGS, help="Export Secrets for all Scopes.")
 @click.option("--hcl", is_flag=True, help='Will export the data as HCL.')
 @provide_pattern_func("pattern_matches")
@@ -25,45 +61,11 @@ from databricks_terraformer.version import print_version_callback, version
 @delete_option
 @dry_run_option
 @tag_option
-def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, pattern_matches):
-    block_key_map = {
-    }
-    ignore_attribute_key = {
-        "last_updated_timestamp"
-    }
-    required_attributes_key = {
-        "key"
-    }
-
+@workers_option
+def export_cli(dry_run, tag, delete, git_ssh_url, api_client: ApiClient, hcl, workers, pattern_matches):
     if hcl:
-        secret_api = SecretApi(api_client)
-
-        scopes = secret_api.list_scopes()["scopes"]
-        log.info(scopes)
-
         with GitExportHandler(git_ssh_url, "secrets", delete_not_found=delete, dry_run=dry_run, tag=tag) as gh:
-            for scope in scopes:
-                secrets = secret_api.list_secrets(scope["name"])["secrets"]
-                log.info(secrets)
-
-                for secret in secrets:
-                    if not pattern_matches(secret["key"]):
-                        log.debug(f"{secret['key']} did not match pattern function {pattern_matches}")
-                        continue
-                    log.debug(f"{secret['key']} matched the pattern function {pattern_matches}")
-                    secret_resource_data = prep_json(block_key_map, ignore_attribute_key, secret, required_attributes_key)
-
-                    base_name = normalize_identifier(secret["key"])
-                    name = "databricks_secret"
-                    identifier = f"databricks_secret-{base_name}"
-
-                    secret_resource_data["scope"] = scope["name"]
-
-                    secret_hcl = create_resource_from_dict(name, identifier, secret_resource_data, False)
-
-                    file_name_identifier = f"{identifier}.tf"
-                    gh.add_file(file_name_identifier, secret_hcl)
-                    log.debug(secret_hcl)
+            export_secrets(gh, api_client, pattern_matches, workers)
 
 
 @click.group(context_settings=CONTEXT_SETTINGS,
@@ -1,8 +1,6 @@
 import re
 from typing import List
 
-from pygrok import Grok
-
 from databricks_terraformer import log
 
 valid_resources = [
@@ -17,6 +15,10 @@ valid_resources = [
     "jobs",
 ]
 
+# longest resource names first so the alternation matches the longest prefix
+_VALID_RESOURCE_PATTERN = re.compile("^(" + "|".join(sorted(valid_resources, key=len, reverse=True)) + ")")
+_RESOURCE_HEADER_PATTERN = re.compile(r'^resource "(?P<resource_type>\w+)" "(?P<resource_name>.*?)" {')
+
 def normalize_identifier(identifier):
     return_name=remove_emoji(identifier)
     if identifier[0].isdigit():
@@ -88,11 +90,10 @@ class TFGitResource:
         import ntpath
         file_name = ntpath.basename(path)
         # multiple resources may match because of prefix so we want to find the longest matching prefix
-        filtered_resources = list(filter(lambda resource: file_name.startswith(resource), valid_resources))
-        if len(filtered_resources) is 0:
+        match = _VALID_RESOURCE_PATTERN.match(file_name)
+        if match is None:
             return None
-        single_resource = max(filtered_resources, key=lambda resource_name: len(resource_name))
-        return cls(single_resource, file_name.split(".")[0])
+        return cls(match.group(1), file_name.split(".")[0])
 
     def __init__(self, resource_type, resource_name):
         self.resource_name = resource_name
@@ -114,29 +115,37 @@ class TFResource:
     def __repr__(self):
         return f"resource: {self.resource_type} name: {self.resource_name}"
 
+    @property
+    def address(self):
+        return f"{self.resource_type}.{self.resource_name}"
+
 
 class TFGitResourceFile:
 
     @classmethod
     def from_file_path(cls, path):
-        pattern = '^resource "%{WORD:resource_type}" "%{DATA:resource_name}" {'
-        grok = Grok(pattern)
+        # the file is scanned line by line instead of being read into memory
         with open(path, "r") as f:
-            lines = f.readlines()
+            return cls.from_lines(f)
 
+    @classmethod
+    def from_lines(cls, lines):
         tf_resources = []
 
         for line in lines:
-            res = grok.match(line)
-            if res is not None and "resource_type" in res and "resource_name" in res:
-                tf_resources.append(TFResource(**res))
-        if len(tf_resources) > 0:
-            return cls(tf_resources)
+            if not line.startswith("resource "):
+                continue
+            res = _RESOURCE_HEADER_PATTERN.match(line)
+            if res is not None:
+                tf_resources.append(TFResource(**res.groupdict()))
         return cls(tf_resources)
 
     def __init__(self, resource_list: List[TFResource]):
         self.resource_list = resource_list
 
+    def get_addresses(self):
+        return [resource.address for resource in self.resource_list]
+
     def get_plan_target_cmds(self):
         target_cmds = []
         for resource in self.resource_list:
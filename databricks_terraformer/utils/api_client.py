@@ -0,0 +1,234 @@
+import json
+import random
+import threading
+import time
+import warnings
+from contextlib import closing
+from typing import Dict, Text, List, BinaryIO
+
+import click
+import requests
+from databricks_cli.sdk import ApiClient
+from urllib3.exceptions import InsecureRequestWarning
+
+from databricks_terraformer import log
+from databricks_terraformer.utils.metrics import Metrics, get_metrics
+
+API_STATS_META_KEY = "databricks_terraformer.api_stats"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def _percentile(sorted_values: List[float], percentile):
+    if len(sorted_values) == 0:
+        return None
+    index = min(len(sorted_values) - 1, int(round(percentile / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+        self.retries = 0
+        self.bytes = 0
+        self.latencies: List[float] = []
+
+    def to_dict(self):
+        latencies = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 2) if latencies else None,
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 2) if latencies else None,
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 2) if latencies else None,
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+        }
+
+
+class ApiStats:
+    """
+    Call counts, response sizes, latencies and retries of the REST api per endpoint (method and path).
+    """
+    TABLE_COLUMNS = ["calls", "errors", "throttled", "retries", "bytes", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+
+    def __init__(self):
+        self.endpoints: Dict[Text, EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    def _get_endpoint(self, endpoint) -> EndpointStats:
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = EndpointStats()
+        return self.endpoints[endpoint]
+
+    def record(self, endpoint, seconds, status_code, size):
+        with self._lock:
+            stats = self._get_endpoint(endpoint)
+            stats.calls += 1
+            stats.latencies.append(seconds)
+            stats.bytes += size
+            if status_code is None or status_code >= 400:
+                stats.errors += 1
+            if status_code == 429:
+                stats.throttled += 1
+
+    def record_retry(self, endpoint):
+        with self._lock:
+            self._get_endpoint(endpoint).retries += 1
+
+    def to_dict(self):
+        with self._lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in sorted(self.endpoints.items())}
+
+    def format_table(self):
+        rows = [["endpoint"] + self.TABLE_COLUMNS]
+        for endpoint, stats in self.to_dict().items():
+            rows.append([endpoint] + ["-" if stats[column] is None else str(stats[column])
+                                      for column in self.TABLE_COLUMNS])
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        return "\n".join("  ".join(value.ljust(width) if i == 0 else value.rjust(width)
+                                   for i, (value, width) in enumerate(zip(row, widths)))
+                         for row in rows)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
+
+
+_default_api_stats = ApiStats()
+
+
+def get_api_stats(ctx: click.Context = None) -> ApiStats:
+    ctx = ctx if ctx is not None else click.get_current_context(silent=True)
+    if ctx is None:
+        return _default_api_stats
+    return ctx.meta.setdefault(API_STATS_META_KEY, ApiStats())
+
+
+class RateLimiter:
+    """
+    Token bucket shared by api clients, i.e. of several workspaces, to stay within one request rate budget.
+    """
+
+    def __init__(self, requests_per_second: float, burst: int = None):
+        self.requests_per_second = requests_per_second
+        self.burst = burst if burst is not None else max(1, int(requests_per_second))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.requests_per_second)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.requests_per_second
+            time.sleep(wait)
+
+
+class InstrumentedApiClient(ApiClient):
+    """
+    ApiClient recording every call in ApiStats and as an api_call phase of the metrics. Throttled calls (429 Too Many
+    Requests) are retried with a bounded exponential backoff, honouring Retry-After when the server sends it. Every
+    attempt waits for the rate_limiter when one is given.
+    """
+
+    def __init__(self, *args, api_stats: ApiStats = None, metrics: Metrics = None, rate_limiter: RateLimiter = None,
+                 max_retries=5, backoff_seconds=1.0,
+                 backoff_max_seconds=30.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.api_stats = api_stats if api_stats is not None else get_api_stats()
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        # the response of the current call is captured by a session hook, calls may run in several threads
+        self._responses = threading.local()
+        self.session.hooks["response"].append(self._capture_response)
+
+    def _capture_response(self, response, *args, **kwargs):
+        self._responses.last = response
+
+    def _get_backoff(self, attempt, response):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            return min(self.backoff_max_seconds, float(retry_after))
+        backoff = min(self.backoff_max_seconds, self.backoff_seconds * 2 ** (attempt - 1))
+        return backoff + random.uniform(0, self.backoff_seconds)
+
+    def perform_query(self, method, path, data={}, headers=None):
+        return self._call(f"{method} {path}", lambda: super(InstrumentedApiClient, self).perform_query(
+            method, path, data=data, headers=headers))
+
+    def perform_download(self, path, data, fileobj: BinaryIO, headers=None, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        GET path and stream the raw response body into the binary fileobj, i.e. a workspace export with
+        direct_download, without holding the body in memory.
+
+        :return: None once the body is written, or the decoded response when the server answered with JSON instead
+        """
+        request_headers = dict(self.default_headers, **(headers or {}))
+        params = {k: str(v).lower() if isinstance(v, bool) else v for k, v in data.items()}
+
+        def download():
+            fileobj.seek(0)
+            fileobj.truncate()
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", InsecureRequestWarning)
+                response = self.session.request("GET", self.url + path, params=params, verify=self.verify,
+                                                headers=request_headers, stream=True)
+            with closing(response):
+                response.raise_for_status()
+                if response.headers.get("Content-Type", "").startswith("application/json"):
+                    return response.json()
+                size = 0
+                for chunk in response.iter_content(chunk_size):
+                    fileobj.write(chunk)
+                    size += len(chunk)
+                self._responses.size = size
+                return None
+
+        return self._call(f"GET {path}", download)
+
+    def _call(self, endpoint, call):
+        for attempt in range(1, self.max_retries + 2):
+            self._responses.last = None
+            self._responses.size = None
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                with self.metrics.timer("api_call", endpoint):
+                    result = call()
+            except requests.exceptions.HTTPError as e:
+                self._record(endpoint, start, e.response)
+                if e.response is None or e.response.status_code != 429 or attempt > self.max_retries:
+                    raise
+                backoff = self._get_backoff(attempt, e.response)
+                log.warning(f"{endpoint} was throttled (attempt {attempt}/{self.max_retries + 1}), retrying in "
+                            f"{backoff:.1f}s")
+                self.api_stats.record_retry(endpoint)
+                time.sleep(backoff)
+                continue
+            except requests.exceptions.RequestException:
+                self._record(endpoint, start, None)
+                raise
+            self._record(endpoint, start, self._responses.last, self._responses.size)
+            return result
+
+    def _record(self, endpoint, start, response, size=None):
+        # streamed bodies are consumed, their size is counted while streaming
+        if size is None:
+            size = len(response.content) if response is not None else 0
+        self.api_stats.record(endpoint, time.perf_counter() - start,
+                              response.status_code if response is not None else None, size)
@@ -0,0 +1,59 @@
+import json
+import os
+from typing import List, Text, Optional
+
+from databricks_terraformer import log
+
+
+class ApplyJournal:
+    """
+    Records which batches of a batched apply have been applied so an interrupted run resumes at the first batch
+    that did not finish. The batches are fixed when the journal is created, the run id identifies the revision,
+    targets and batch size the journal was created for.
+    """
+    FILE_NAME = "apply_journal.json"
+
+    def __init__(self, path, run_id, batches: List[List[Text]], completed: List[int] = None):
+        self.path = path
+        self.run_id = run_id
+        self.batches = batches
+        self.completed = completed if completed is not None else []
+
+    @classmethod
+    def load(cls, artifact_dir, run_id) -> Optional["ApplyJournal"]:
+        path = os.path.join(artifact_dir, cls.FILE_NAME)
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        if data["run_id"] != run_id:
+            log.info(f"Ignoring {path} as it was created for a different batched apply")
+            return None
+        return cls(path, run_id, data["batches"], data["completed"])
+
+    @classmethod
+    def create(cls, artifact_dir, run_id, addresses: List[Text], batch_size) -> "ApplyJournal":
+        addresses = sorted(addresses)
+        batches = [addresses[i:i + batch_size] for i in range(0, len(addresses), batch_size)]
+        journal = cls(os.path.join(artifact_dir, cls.FILE_NAME), run_id, batches)
+        journal.save()
+        return journal
+
+    def pending(self):
+        return [(i, batch) for i, batch in enumerate(self.batches) if i not in self.completed]
+
+    def mark_completed(self, batch_index):
+        self.completed.append(batch_index)
+        self.save()
+
+    def save(self):
+        # the journal is replaced atomically so an interrupted write never loses the recorded progress
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"run_id": self.run_id, "batches": self.batches, "completed": self.completed}, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,37 @@
+import hashlib
+import mmap
+import os
+from typing import Text, Tuple
+
+# payloads of content addressed exports are written to files/by-hash/<sha256 of the content>
+BY_HASH_DIRECTORY = "by-hash"
+
+
+def sha256_file(path) -> Tuple[Text, int]:
+    """
+    Hashes the file through a read only memory map, so large payloads are neither copied into python buffers nor
+    hashed while holding the GIL.
+
+    :return: the hex sha256 and the size of the file
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        # empty files can not be mapped
+        if size == 0:
+            return hashlib.sha256().hexdigest(), 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return hashlib.sha256(m).hexdigest(), size
+
+
+def get_content_name(content: Text) -> Text:
+    """
+    :return: the name of the content below files/
+    """
+    return f"{BY_HASH_DIRECTORY}/{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+
+
+def get_file_content_name(path) -> Text:
+    """
+    :return: the name of the content of the file below files/
+    """
+    return f"{BY_HASH_DIRECTORY}/{sha256_file(path)[0]}"
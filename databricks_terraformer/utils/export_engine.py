@@ -0,0 +1,160 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Any, Dict, Text, Optional, Iterable, List, Tuple, Iterator, BinaryIO
+
+from databricks_terraformer import log
+from databricks_terraformer.hcl import create_hcl_file
+from databricks_terraformer.hcl.json_to_hcl import create_resource_from_dict, validate_hcl
+from databricks_terraformer.utils.git_handler import GitExportHandler
+from databricks_terraformer.utils.metrics import get_metrics, use_metrics
+
+
+class ExportSpec:
+    """
+    How the objects of one resource type are converted to terraform, every function is called with one object of the
+    source iterator.
+
+    :param resource_type: the terraform resource type, i.e. databricks_job
+    :param get_identifier: the terraform resource name, also the name of the exported files
+    :param get_resource_data: the resource attributes passed to the hcl renderer, objects with content are passed
+        the name of their content file below files/ as well
+    :param get_name: the name matched against the pattern, objects are not filtered when it is None
+    :param get_content: the content written to files/<identifier>, objects without content are skipped
+    :param write_content: streams the content into the binary file which replaces files/<identifier>, used instead
+        of get_content for large contents, objects it returns False for are skipped
+    :param get_hcl_file_identity: wraps the hcl in the commented hcl file template with this identity when set
+    :param validate: log the validation errors of the rendered hcl
+    """
+
+    def __init__(self, resource_type: Text, get_identifier: Callable[[Any], Text],
+                 get_resource_data: Callable[[Any], Dict[Text, Any]], get_name: Callable[[Any], Text] = None,
+                 get_content: Callable[[Any], Optional[Text]] = None,
+                 get_hcl_file_identity: Callable[[Any], Text] = None, validate=False,
+                 write_content: Callable[[Any, BinaryIO], bool] = None):
+        self.resource_type = resource_type
+        self.get_identifier = get_identifier
+        self.get_resource_data = get_resource_data
+        self.get_name = get_name
+        self.get_content = get_content
+        self.get_hcl_file_identity = get_hcl_file_identity
+        self.validate = validate
+        self.write_content = write_content
+
+
+class ExportedObject:
+
+    def __init__(self, identifier: Text, hcl: Text, files: List[Tuple[Text, Text]], hcl_errors: Text = ""):
+        self.identifier = identifier
+        self.hcl = hcl
+        self.files = files
+        self.hcl_errors = hcl_errors
+
+
+class ExportEngine:
+    """
+    Streams the objects of a source iterator through the pattern filter, the conversion of an ExportSpec (content
+    fetch, hcl rendering and validation) and GitExportHandler.add_file. Objects are converted in batches, by the
+    calling thread or by a pool of workers with a bounded number of batches in flight, and are written in the order
+    of the source by the calling thread. Streamed contents are written by the converting thread.
+    """
+    BATCH_SIZE = 16
+
+    def __init__(self, gh: GitExportHandler, spec: ExportSpec, workspace_url: Text = None,
+                 pattern_matches: Callable[[Text], bool] = None, workers=1, batch_size=BATCH_SIZE):
+        self.gh = gh
+        self.spec = spec
+        self.workspace_url = workspace_url
+        self.pattern_matches = pattern_matches
+        self.workers = workers
+        self.batch_size = batch_size
+        self.metrics = get_metrics()
+
+    def _filter(self, objects: Iterable[Any]) -> Iterator[Any]:
+        for obj in objects:
+            if self.pattern_matches is not None and self.spec.get_name is not None:
+                name = self.spec.get_name(obj)
+                if not self.pattern_matches(name):
+                    log.debug(f"{name} did not match pattern function {self.pattern_matches}")
+                    continue
+                log.debug(f"{name} matched the pattern function {self.pattern_matches}")
+            yield obj
+
+    def convert(self, obj) -> Optional[ExportedObject]:
+        spec = self.spec
+        identifier = spec.get_identifier(obj)
+        content = None
+        content_name = None
+        if spec.get_content is not None:
+            content = spec.get_content(obj)
+            if content is None:
+                return None
+            content_name = self.gh.get_content_name(identifier, content)
+        elif spec.write_content is not None:
+            written = self.gh.write_stream(f"files/{identifier}", lambda f: spec.write_content(obj, f))
+            if written is None:
+                return None
+            content_name = written[len("files/"):]
+        resource_data = spec.get_resource_data(obj) if content_name is None else \
+            spec.get_resource_data(obj, content_name)
+        hcl = create_resource_from_dict(spec.resource_type, identifier, resource_data, False)
+        tf_file = hcl
+        if spec.get_hcl_file_identity is not None:
+            tf_file = create_hcl_file(spec.get_hcl_file_identity(obj), self.workspace_url, resource_data, hcl)
+        files = [(f"{identifier}.tf", tf_file)]
+        if content is not None:
+            files.append((f"files/{content_name}", content))
+        hcl_errors = validate_hcl(hcl) if spec.validate else ""
+        return ExportedObject(identifier, hcl, files, hcl_errors)
+
+    def _convert_batch(self, batch: List[Any]) -> List[Optional[ExportedObject]]:
+        with use_metrics(self.metrics):
+            converted = []
+            for obj in batch:
+                with self.metrics.timer("convert"):
+                    converted.append(self.convert(obj))
+            return converted
+
+    def _batches(self, objects: Iterable[Any]) -> Iterator[List[Any]]:
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if len(batch) > 0:
+            yield batch
+
+    def _converted(self, objects: Iterable[Any]) -> Iterator[Optional[ExportedObject]]:
+        batches = self._batches(self._filter(objects))
+        if self.workers <= 1:
+            for batch in batches:
+                yield from self._convert_batch(batch)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export-worker") as executor:
+            # at most two batches per worker are in flight so memory stays bounded for large sources
+            in_flight = deque()
+            for batch in batches:
+                in_flight.append(executor.submit(self._convert_batch, batch))
+                if len(in_flight) >= self.workers * 2:
+                    yield from in_flight.popleft().result()
+            while len(in_flight) > 0:
+                yield from in_flight.popleft().result()
+
+    def run(self, objects: Iterable[Any]) -> int:
+        """
+        :return: the number of exported objects
+        """
+        exported = 0
+        for exported_object in self._converted(objects):
+            if exported_object is None:
+                continue
+            for name, data in exported_object.files:
+                self.gh.add_file(name, data)
+            log.debug(exported_object.hcl)
+            if len(exported_object.hcl_errors) > 0:
+                log.error(f"Identified error in the following HCL Config: {exported_object.hcl}")
+                log.error(exported_object.hcl_errors)
+            exported += 1
+        self.metrics.count("convert", objects=exported)
+        log.info(f"Exported {exported} {self.spec.resource_type} resources")
+        return exported
@@ -2,22 +2,35 @@ import datetime
 import logging
 import ntpath
 import os
+import random
 import tempfile
+import threading
+import time
 from pathlib import Path
-from typing import Text, List
+from typing import Text, List, Dict, Callable, BinaryIO, Optional
 
 import click
 import git
 
 from databricks_terraformer import log
+from databricks_terraformer.utils import lfs, content_store
+from databricks_terraformer.utils import TFGitResourceFile
 from databricks_terraformer.utils.change_log import create_change_log, get_previous_changes
+from databricks_terraformer.utils.metrics import get_metrics
+from databricks_terraformer.utils.resource_index import ResourceIndex
 
 logging.basicConfig(level=logging.INFO)
 
+LFS_ATTRIBUTES_FILE = ".gitattributes"
+
 
 class GitExportHandler:
+    # push output fragments that indicate the remote moved on while we were exporting
+    _REJECTED_PUSH_MARKERS = ["[rejected]", "non-fast-forward", "fetch first"]
+
     def __init__(self, git_url, directory, custom_commit_message=None, delete_not_found=False, dry_run=False,
-                 tag=False):
+                 tag=False, push_retries=5, push_backoff_seconds=1.0, push_backoff_max_seconds=30.0,
+                 lfs_threshold=None, content_addressed=False):
         self.tag = tag
         self._tag_now = datetime.datetime.now()
         self._tag_value = self._get_now_as_tag(self._tag_now)
@@ -30,15 +43,118 @@ class GitExportHandler:
         self._git_added = []
         self._git_modified = []
         self._git_removed = []
-        self._ignore_remove_files = ["README.md"]
+        self._ignore_remove_files = ["README.md", ResourceIndex.FILE_NAME, LFS_ATTRIBUTES_FILE]
+        self._change_log_files = ["README.md"]
+        self._resource_addresses = {}
+        self.push_retries = push_retries
+        self.push_backoff_seconds = push_backoff_seconds
+        self.push_backoff_max_seconds = push_backoff_max_seconds
+        self.metrics = get_metrics()
+        # files/ payloads larger than lfs_threshold bytes are stored as Git LFS objects
+        self.lfs_threshold = lfs_threshold
+        self._lfs_objects: List[Text] = []
+        # payloads are written to files/by-hash/<sha256 of the content> so identical payloads are stored once
+        self.content_addressed = content_addressed
+        self._written_content = set()
+        self._written_lock = threading.Lock()
 
     def add_file(self, name, data):
+        if self._is_written(name):
+            log.debug(f"{name} was already written by this export")
+            self.files_created.append(name)
+            return
         write_path = os.path.join(self.resource_path, name)
         os.makedirs(os.path.dirname(write_path), exist_ok=True)
         log.info(f"Writing {self.directory} to path {write_path}")
-        with open(write_path, "w") as f:
+        with self.metrics.timer("write_file", name), open(write_path, "w") as f:
             f.write(data)
+            size = f.tell()
+            self.metrics.count("write_file", objects=1, bytes=size)
+        self._store_in_lfs(name, write_path, size)
+        self.files_created.append(name)
+        if name.endswith(".tf"):
+            self._resource_addresses[name] = TFGitResourceFile.from_lines(data.split("\n")).get_addresses()
+
+    def get_content_name(self, identifier, content: Text) -> Text:
+        """
+        :return: the name of the content file of identifier below files/, by-hash/<sha256> when content addressed
+        """
+        return content_store.get_content_name(content) if self.content_addressed else identifier
+
+    def write_stream(self, name, write: Callable[[BinaryIO], bool]) -> Optional[Text]:
+        """
+        Calls write with a temporary binary file which replaces name when write returns True, so a failed or
+        discarded write leaves the previous export of name untouched. When content addressed a files/ payload is
+        written to files/by-hash/<sha256> instead. May be called by several threads.
+
+        :return: the name of the written file, None when write discarded it
+        """
+        directory = os.path.dirname(os.path.join(self.resource_path, name))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with self.metrics.timer("write_file", name), os.fdopen(fd, "wb") as f:
+                written = write(f)
+                size = f.tell()
+            if not written:
+                return None
+            if self.content_addressed and name.startswith("files/"):
+                with self.metrics.timer("hash_file", name):
+                    name = "files/" + content_store.get_file_content_name(tmp_path)
+            if self._is_written(name):
+                log.debug(f"{name} was already written by this export")
+            else:
+                write_path = os.path.join(self.resource_path, name)
+                os.makedirs(os.path.dirname(write_path), exist_ok=True)
+                log.info(f"Writing {self.directory} to path {write_path}")
+                os.replace(tmp_path, write_path)
+                self.metrics.count("write_file", objects=1, bytes=size)
+                self._store_in_lfs(name, write_path, size)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
         self.files_created.append(name)
+        return name
+
+    def _is_written(self, name) -> bool:
+        # content addressed payloads are written once per export, later references reuse the file
+        if not name.startswith(f"files/{content_store.BY_HASH_DIRECTORY}/"):
+            return False
+        with self._written_lock:
+            if name in self._written_content:
+                return True
+            self._written_content.add(name)
+            return False
+
+    def _store_in_lfs(self, name, write_path, size):
+        if self.lfs_threshold is None or not name.startswith("files/") or size <= self.lfs_threshold:
+            return
+        # the name of a content addressed payload is already its oid
+        oid = ntpath.basename(name) if name.startswith(f"files/{content_store.BY_HASH_DIRECTORY}/") else None
+        with self.metrics.timer("lfs_store", name):
+            oid, _ = lfs.replace_with_pointer(self.repo.git_dir, write_path, oid)
+        log.debug(f"Stored {write_path} as LFS object {oid}")
+        self._lfs_objects.append(oid)
+
+    def _get_lfs_objects(self) -> List[Text]:
+        return self._lfs_objects
+
+    def _update_lfs_attributes(self):
+        """
+        Marks the pointer files below files/ as LFS files, so clones with git-lfs installed check out their content.
+        """
+        files_path = os.path.join(self.resource_path, "files")
+        attributes_path = os.path.join(self.resource_path, LFS_ATTRIBUTES_FILE)
+        pointers = sorted(str(path.relative_to(self.resource_path).as_posix())
+                          for path in Path(files_path).rglob("*")
+                          if path.is_file() and lfs.read_pointer(str(path)) is not None)
+        if len(pointers) == 0:
+            if os.path.exists(attributes_path):
+                os.remove(attributes_path)
+            return
+        with open(attributes_path, "w") as f:
+            f.write("# Generated by databricks-terraformer, payloads stored with Git LFS\n")
+            f.writelines(f"/{path} {lfs.LFS_ATTRIBUTES}\n" for path in pointers)
 
     def _remove_unmanaged_files(self):
         deleted_file_paths_to_stage = []
@@ -55,7 +171,8 @@ class GitExportHandler:
         self._git_tag = self.repo.create_tag(self._tag_value, message=f'Updated {self.directory} "{self._tag_value}"')
 
     def _stage_changes(self):
-        self.repo.git.add(A=True)
+        with self.metrics.timer("git_stage"):
+            self.repo.git.add(A=True)
 
     def _push_tags(self):
         if self._git_tag is not None:
@@ -66,9 +183,72 @@ class GitExportHandler:
     def _push(self):
         commit_msg = f"Updated {self.directory} via databricks-terraformer." \
             if self.custom_commit_message is None else self.custom_commit_message
-        self.repo.index.commit(commit_msg)
-        origin = self.repo.remote()
-        origin.push("--no-verify")
+        with self.metrics.timer("git_commit"):
+            self.repo.index.commit(commit_msg)
+        if len(self._get_lfs_objects()) > 0:
+            with self.metrics.timer("lfs_push"):
+                lfs.push_objects(self.repo, self.repo.active_branch.name)
+        with self.metrics.timer("git_push"):
+            self._push_with_rebase()
+
+    def _push_with_rebase(self):
+        """
+        Pushes the export commit, when the push is rejected because another exporter pushed first, the commit is
+        rebased on top of the remote branch and the push is retried with a bounded exponential backoff.
+        """
+        branch = self.repo.active_branch.name
+        for attempt in range(1, self.push_retries + 1):
+            try:
+                self.repo.git.push("origin", branch, "--porcelain", "--no-verify")
+                return
+            except git.GitCommandError as e:
+                if not self._is_rejected_push(e) or attempt == self.push_retries:
+                    raise
+                backoff = min(self.push_backoff_max_seconds, self.push_backoff_seconds * 2 ** (attempt - 1))
+                backoff += random.uniform(0, self.push_backoff_seconds)
+                log.warning(f"Push of {self.directory} was rejected (attempt {attempt}/{self.push_retries}), "
+                            f"rebasing and retrying in {backoff:.1f}s")
+                time.sleep(backoff)
+                self._rebase_on_remote(branch)
+
+    def _is_rejected_push(self, error: git.GitCommandError):
+        output = f"{error.stdout}\n{error.stderr}"
+        return any(marker in output for marker in self._REJECTED_PUSH_MARKERS)
+
+    def _rebase_on_remote(self, branch):
+        self.repo.git.fetch("origin", branch)
+        try:
+            self.repo.git.rebase(f"origin/{branch}")
+        except git.GitCommandError:
+            self._resolve_rebase_conflicts()
+
+    def _resolve_rebase_conflicts(self):
+        # Resource directories of different exporters do not overlap, so the only expected conflicts are change
+        # logs. Those are regenerated on top of the remote version, anything else aborts the rebase.
+        conflicts = [path for path in self.repo.git.diff(name_only=True, diff_filter="U").split("\n") if path]
+        own_generated_files = self._get_generated_files()
+        unexpected = [path for path in conflicts if path not in own_generated_files]
+        if len(unexpected) > 0:
+            self.repo.git.rebase("--abort")
+            raise ValueError(f"Unable to rebase {self.directory} export on the remote, conflicting files: "
+                             f"{unexpected}")
+        for path in conflicts:
+            log.info(f"Regenerating {path} on top of the remote version")
+            # while rebasing "ours" is the upstream branch we are replaying the export commit on
+            self.repo.git.checkout("--ours", "--", path)
+            self._regenerate_file(path)
+            self.repo.git.add(path)
+        with self.repo.git.custom_environment(GIT_EDITOR="true"):
+            self.repo.git.rebase("--continue")
+
+    def _get_generated_files(self) -> List[Text]:
+        return [os.path.join(self.directory, name) for name in self._change_log_files + [ResourceIndex.FILE_NAME]]
+
+    def _regenerate_file(self, path):
+        if ntpath.basename(path) == ResourceIndex.FILE_NAME:
+            self._update_resource_index()
+        else:
+            self._create_or_update_change_log()
 
     def _get_repo(self):
         try:
@@ -85,7 +265,7 @@ class GitExportHandler:
         return list(managed_set - remote_set)
 
     def _log_diff(self):
-        diff = self.repo.git.diff('HEAD', name_status=True)
+        diff = self.repo.git.diff('HEAD', '--', self.directory, name_status=True)
         if len(diff) is 0:
             log.info("No files were changed and no diff was found.")
         else:
@@ -114,33 +294,52 @@ class GitExportHandler:
                                    removed_files=self._git_removed, previous=previous_changes)
         log.debug(f"Generated changelog: \n{ch_log}")
 
+    def _update_resource_index(self):
+        index = ResourceIndex.load(self.resource_path)
+        index.remove_missing_files(self.resource_path)
+        for name, addresses in self._resource_addresses.items():
+            index.set_file(name, addresses)
+        index.save(self.resource_path)
+
     def __enter__(self):
         self.local_repo_path = tempfile.TemporaryDirectory()
         self.resource_path = os.path.join(self.local_repo_path.name, self.directory)
-        self.repo = self._get_repo()
+        with self.metrics.timer("git_clone"):
+            self.repo = self._get_repo()
         os.makedirs(self.resource_path, exist_ok=True)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         # If not ignoring deleted remote state, delete all files not explicitly added
         if self.delete_not_found is True:
-            self._remove_unmanaged_files()
+            with self.metrics.timer("git_remove_unmanaged_files"):
+                self._remove_unmanaged_files()
+        self._update_lfs_attributes()
 
         log.info("===IDENTIFYING AND STAGING GIT CHANGES===")
         # Stage Changes for logging diff
         self._stage_changes()
 
         # Log Changes
-        self._log_diff()
+        with self.metrics.timer("git_diff"):
+            self._log_diff()
 
         self._stage_changes()
 
-        # First differences need to be logged before applying change log
-        self._create_or_update_change_log()
+        # First differences need to be logged before applying change log and resource index
+        with self.metrics.timer("git_change_log"):
+            self._create_or_update_change_log()
+        with self.metrics.timer("resource_index"):
+            self._update_resource_index()
 
         # Stage stage the change log TODO: maybe this should be a decorator
         self._stage_changes()
 
+        self._publish()
+        # clean temp folder
+        self.local_repo_path.cleanup()
+
+    def _publish(self):
         # Handle Dry Run
         if self.dry_run is not None and self.dry_run is False:
             # push all changes
@@ -149,13 +348,102 @@ class GitExportHandler:
 
             # Tag and push previous changes
             if self.tag is True:
-                # Create tag
-                self._create_tag()
-                # push the tag
-                self._push_tags()
+                with self.metrics.timer("git_tag"):
+                    # Create tag
+                    self._create_tag()
+                    # push the tag
+                    self._push_tags()
                 log.info(f"===FINISHED PUSHING TAG {self._tag_value}===")
 
         else:
             log.info("===RUNNING IN DRY RUN MODE NOT PUSHING CHANGES===")
-        # clean temp folder
+
+
+class SharedGitExportHandler(GitExportHandler):
+    """
+    Exports several directories (i.e. <workspace>/<resource_type>) into one clone of the repository and publishes them
+    with a single commit, push and tag. Every directory is written through its own GitExportHandler from get_handler,
+    which keeps its change log, resource index and unmanaged file removal, handlers may be used by different threads.
+    The label names the export (i.e. the exported workspaces) in the log messages of the shared commit and push.
+    """
+
+    def __init__(self, git_url, label, custom_commit_message=None, dry_run=False, tag=False, lfs_threshold=None,
+                 content_addressed=False, **kwargs):
+        super().__init__(git_url, label, custom_commit_message=custom_commit_message, dry_run=dry_run, tag=tag,
+                         lfs_threshold=lfs_threshold, content_addressed=content_addressed, **kwargs)
+        self.handlers: Dict[Text, GitExportHandler] = {}
+        self._handlers_lock = threading.Lock()
+
+    def get_handler(self, directory, delete_not_found=False) -> GitExportHandler:
+        with self._handlers_lock:
+            if directory not in self.handlers:
+                handler = GitExportHandler(self.git_url, directory, delete_not_found=delete_not_found,
+                                           dry_run=self.dry_run, tag=self.tag, lfs_threshold=self.lfs_threshold,
+                                           content_addressed=self.content_addressed)
+                handler._tag_now = self._tag_now
+                handler._tag_value = self._tag_value
+                handler.local_repo_path = self.local_repo_path
+                handler.repo = self.repo
+                handler.resource_path = os.path.join(self.local_repo_path.name, directory)
+                os.makedirs(handler.resource_path, exist_ok=True)
+                self.handlers[directory] = handler
+            return self.handlers[directory]
+
+    def _create_tag(self):
+        self._git_tag = self.repo.create_tag(self._tag_value, message=f'Updated {len(self.handlers)} directories '
+                                                                      f'"{self._tag_value}"')
+
+    def _get_lfs_objects(self) -> List[Text]:
+        return [oid for handler in self.handlers.values() for oid in handler._get_lfs_objects()]
+
+    def _log_diff(self):
+        # the label is not a directory, the diff is logged per exported directory
+        for directory in sorted(self.handlers):
+            self.handlers[directory]._log_diff()
+
+    def _get_generated_files(self) -> List[Text]:
+        return [path for handler in self.handlers.values() for path in handler._get_generated_files()]
+
+    def _regenerate_file(self, path):
+        for handler in self.handlers.values():
+            if path in handler._get_generated_files():
+                handler._regenerate_file(path)
+
+    def __enter__(self):
+        self.local_repo_path = tempfile.TemporaryDirectory()
+        self.resource_path = self.local_repo_path.name
+        with self.metrics.timer("git_clone"):
+            self.repo = self._get_repo()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            # a partial export would remove the unmanaged files of the directories which were not finished
+            log.error(f"Export failed, not publishing {', '.join(sorted(self.handlers))}")
+            self.local_repo_path.cleanup()
+            return
+        handlers = [self.handlers[directory] for directory in sorted(self.handlers)]
+        with self.metrics.timer("git_remove_unmanaged_files"):
+            for handler in handlers:
+                if handler.delete_not_found is True:
+                    handler._remove_unmanaged_files()
+        for handler in handlers:
+            handler._update_lfs_attributes()
+
+        log.info("===IDENTIFYING AND STAGING GIT CHANGES===")
+        self._stage_changes()
+        with self.metrics.timer("git_diff"):
+            self._log_diff()
+        with self.metrics.timer("git_change_log"):
+            for handler in handlers:
+                handler._create_or_update_change_log()
+        with self.metrics.timer("resource_index"):
+            for handler in handlers:
+                handler._update_resource_index()
+        self._stage_changes()
+
+        if self.custom_commit_message is None:
+            self.custom_commit_message = f"Updated {len(self.handlers)} directories via databricks-terraformer.\n\n" + \
+                                         "\n".join(sorted(self.handlers))
+        self._publish()
         self.local_repo_path.cleanup()
@@ -0,0 +1,82 @@
+import os
+from typing import Text, Optional, Tuple, List
+
+import git
+
+from databricks_terraformer.utils.content_store import sha256_file
+
+LFS_SPEC = "https://git-lfs.github.com/spec/v1"
+LFS_ATTRIBUTES = "filter=lfs diff=lfs merge=lfs -text"
+# pointer files are a few lines, larger files are never parsed as pointers
+MAX_POINTER_SIZE = 1024
+
+
+def get_pointer(oid: Text, size: int) -> Text:
+    return f"version {LFS_SPEC}\noid sha256:{oid}\nsize {size}\n"
+
+
+def read_pointer(path) -> Optional[Tuple[Text, int]]:
+    """
+    :return: the oid and size of the object when path is a Git LFS pointer file, None otherwise
+    """
+    if os.path.getsize(path) > MAX_POINTER_SIZE:
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(f"version {LFS_SPEC}\n".encode("utf-8")):
+        return None
+    fields = dict(line.split(" ", 1) for line in data.decode("utf-8").splitlines() if " " in line)
+    if not fields.get("oid", "").startswith("sha256:") or not fields.get("size", "").isdigit():
+        return None
+    return fields["oid"][len("sha256:"):], int(fields["size"])
+
+
+def get_object_path(git_dir, oid: Text):
+    return os.path.join(git_dir, "lfs", "objects", oid[0:2], oid[2:4], oid)
+
+
+def replace_with_pointer(git_dir, path, oid: Text = None) -> Tuple[Text, int]:
+    """
+    Moves the file into the local LFS object store of the repository and writes its pointer file in its place.
+    The oid is the sha256 of the content, it is computed when not given.
+
+    :return: the oid and size of the object
+    """
+    if oid is None:
+        oid, size = sha256_file(path)
+    else:
+        size = os.path.getsize(path)
+    object_path = get_object_path(git_dir, oid)
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    # objects are content addressed, an existing object has the same content
+    if os.path.exists(object_path):
+        os.remove(path)
+    else:
+        os.replace(path, object_path)
+    with open(path, "w") as f:
+        f.write(get_pointer(oid, size))
+    return oid, size
+
+
+def _run_lfs(repo: git.Repo, *args):
+    try:
+        return repo.git.lfs(*args)
+    except git.GitCommandError as e:
+        if "is not a git command" in str(e.stderr):
+            raise ValueError(f"git-lfs is required to run git lfs {args[0]}, install it from "
+                             "https://git-lfs.github.com")
+        raise
+
+
+def push_objects(repo: git.Repo, branch):
+    """
+    Uploads the LFS objects referenced by the commits of branch which the remote does not have yet.
+    """
+    _run_lfs(repo, "push", "origin", branch)
+
+
+def fetch_objects(repo: git.Repo, ref, include: List[Text]):
+    """
+    Downloads the LFS objects referenced by ref below the include paths into the local object store.
+    """
+    _run_lfs(repo, "fetch", "origin", ref, f"--include={','.join(include)}")
@@ -0,0 +1,139 @@
+import functools
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Text, List, Callable, Optional
+
+import click
+
+METRICS_META_KEY = "databricks_terraformer.metrics"
+
+
+class PhaseMetrics:
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self.objects = 0
+        self.bytes = 0
+
+    def to_dict(self):
+        # phases that do not count objects explicitly handle one object per call
+        objects = self.objects if self.objects > 0 else self.calls
+        return {
+            "seconds": round(self.seconds, 6),
+            "calls": self.calls,
+            "objects": objects,
+            "bytes": self.bytes,
+            "objects_per_second": round(objects / self.seconds, 2) if self.seconds > 0 else None,
+            "bytes_per_second": round(self.bytes / self.seconds, 2) if self.seconds > 0 and self.bytes > 0 else None,
+        }
+
+
+class Metrics:
+    """
+    Timers and counters per phase of a command (listing, content fetch, hcl rendering, git, terraform, ...).
+    Phases running concurrently, i.e. partitioned terraform plans, add up their durations.
+    """
+
+    def __init__(self):
+        self.phases: Dict[Text, PhaseMetrics] = {}
+        # called with the phase name whenever a timed phase ends, i.e. to snapshot memory per phase
+        self.phase_listeners: List[Callable[[Text], None]] = []
+        # called with the phase, its start (perf_counter), duration and resource of every timed span, i.e. to trace
+        self.span_listeners: List[Callable[[Text, float, float, Optional[Text]], None]] = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def _get_phase(self, phase) -> PhaseMetrics:
+        if phase not in self.phases:
+            self.phases[phase] = PhaseMetrics()
+        return self.phases[phase]
+
+    @contextmanager
+    def timer(self, phase, resource=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                phase_metrics = self._get_phase(phase)
+                phase_metrics.seconds += seconds
+                phase_metrics.calls += 1
+            for listener in self.phase_listeners:
+                listener(phase)
+            for span_listener in self.span_listeners:
+                span_listener(phase, start, seconds, resource)
+
+    def count(self, phase, objects=0, bytes=0):
+        with self._lock:
+            phase_metrics = self._get_phase(phase)
+            phase_metrics.objects += objects
+            phase_metrics.bytes += bytes
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "wall_seconds": round(time.perf_counter() - self._start, 6),
+                "phases": {phase: phase_metrics.to_dict() for phase, phase_metrics in self.phases.items()},
+            }
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+_default_metrics = Metrics()
+_thread_metrics = threading.local()
+
+
+def get_metrics(ctx: click.Context = None) -> Metrics:
+    """
+    Returns the metrics of the running command, they are kept in the click context meta which is shared by the
+    command and its groups. Worker threads have no click context, they get the metrics set with use_metrics or else
+    a process wide instance; objects doing work in other threads may also get their metrics when they are created.
+    """
+    ctx = ctx if ctx is not None else click.get_current_context(silent=True)
+    if ctx is None:
+        return getattr(_thread_metrics, "metrics", _default_metrics)
+    return ctx.meta.setdefault(METRICS_META_KEY, Metrics())
+
+
+@contextmanager
+def use_metrics(metrics: Metrics):
+    """
+    Makes get_metrics return metrics in the current thread, i.e. in the workers of a command.
+    """
+    previous = getattr(_thread_metrics, "metrics", None)
+    _thread_metrics.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _thread_metrics.metrics = previous if previous is not None else _default_metrics
+
+
+def timed(phase, resource_arg=None):
+    """
+    Times the decorated function as phase, the value of its argument named resource_arg identifies the resource of
+    the span when spans are traced.
+    """
+
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            metrics = get_metrics()
+            resource = None
+            if resource_arg is not None and len(metrics.span_listeners) > 0:
+                resource = str(signature.bind(*args, **kwargs).arguments.get(resource_arg))
+            with metrics.timer(phase, resource):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,16 +1,114 @@
 import fnmatch
 import functools
+import re
+from typing import List, Text, Optional, Pattern
 
 import click
 from click import Context
 from databricks_cli.click_types import ContextObject
 
+REGEX_PREFIX = "re:"
+_REGEX_SPECIAL_CHARS = set(".^$*+?{}[]\\|()")
+_GLOB_SPECIAL_CHARS = set("*?[")
+
 
 def match_pattern(value, pattern):
     return fnmatch.fnmatch(value, pattern)
 
 
+def _literal_prefix(pattern: Text) -> Text:
+    """
+    The leading characters every value matched by the glob or regex pattern starts with.
+    """
+    if not pattern.startswith(REGEX_PREFIX):
+        for i, char in enumerate(pattern):
+            if char in _GLOB_SPECIAL_CHARS:
+                return pattern[:i]
+        return pattern
+    regex = pattern[len(REGEX_PREFIX):]
+    regex = regex[1:] if regex.startswith("^") else regex
+    prefix = []
+    for char in regex:
+        if char in _REGEX_SPECIAL_CHARS:
+            # a quantifier applies to the previous character, it may be missing
+            if char in "*?{" and len(prefix) > 0:
+                prefix.pop()
+            break
+        prefix.append(char)
+    else:
+        return "".join(prefix)
+    # alternations make the prefix meaningless
+    return "".join(prefix) if "|" not in regex else ""
+
+
+def _is_prefix_only(pattern: Text) -> bool:
+    # patterns which match everything starting with their literal prefix, i.e. /Shared/*, /Shared/** or re:/tmp/.*
+    if pattern.startswith(REGEX_PREFIX):
+        # regexes match from the start of the value so a literal regex is a prefix as well
+        regex = pattern[len(REGEX_PREFIX):].lstrip("^")
+        return regex in [_literal_prefix(pattern), _literal_prefix(pattern) + ".*"]
+    # a glob * matches across /, any run of them is the same as one
+    rest = pattern[len(_literal_prefix(pattern)):]
+    return len(rest) > 0 and set(rest) == {"*"}
+
+
+def _to_regex(pattern: Text) -> Text:
+    # globs match the whole value, regexes match from the start of the value
+    if pattern.startswith(REGEX_PREFIX):
+        return f"(?:{pattern[len(REGEX_PREFIX):]})"
+    return fnmatch.translate(pattern)
+
+
+def _compile(patterns: List[Text]) -> Optional[Pattern]:
+    if len(patterns) == 0:
+        return None
+    return re.compile("|".join(_to_regex(pattern) for pattern in patterns))
+
+
+class PatternMatcher:
+    """
+    Include and exclude patterns compiled into one regex each. Patterns are globs, or regexes when prefixed with re:.
+    A value is matched when it matches an include pattern (or there are none) and no exclude pattern.
+    The literal prefixes of the patterns tell the recursive crawlers which directories can not contain a match.
+    """
+
+    def __init__(self, includes: List[Text] = None, excludes: List[Text] = None):
+        self.includes = list(includes or [])
+        self.excludes = list(excludes or [])
+        self._include = _compile(self.includes)
+        self._exclude = _compile(self.excludes)
+        self._include_prefixes = [_literal_prefix(pattern) for pattern in self.includes]
+        self._exclude_prefixes = [_literal_prefix(pattern) for pattern in self.excludes if _is_prefix_only(pattern)]
+
+    def __call__(self, value: Text) -> bool:
+        if self._include is not None and self._include.match(value) is None:
+            return False
+        return self._exclude is None or self._exclude.match(value) is None
+
+    def could_match_under(self, directory: Text) -> bool:
+        """
+        :return: False when no value below directory can be matched, so the crawl may skip it
+        """
+        directory = directory.rstrip("/") + "/"
+        for prefix in self._exclude_prefixes:
+            if directory.startswith(prefix):
+                return False
+        if self._include is None:
+            return True
+        return any(directory.startswith(prefix) or prefix.startswith(directory)
+                   for prefix in self._include_prefixes)
+
+    def __repr__(self):
+        return f"PatternMatcher(includes={self.includes}, excludes={self.excludes})"
+
+
 def pattern_option(f):
+    f = click.option('--exclude', multiple=True,
+                     help="Skip resources whose name (or path) matches this glob, or regex when prefixed with re:. "
+                          "May be repeated.")(f)
+    f = click.option('--include', multiple=True,
+                     help="Only export resources whose name (or path) matches this glob, or regex when prefixed with "
+                          "re:. May be repeated, notebook and dbfs crawls skip folders no pattern can match.")(f)
     return click.option('--pattern', default="*", help="Pattern to use to identify resources via name/etc.")(f)
 
 
@@ -23,8 +121,9 @@ def provide_pattern_func(func_name="pattern_func"):
 
         @functools.wraps(f)
         def decorator(*args, **kwargs):
-            pattern_f = functools.partial(match_pattern, pattern=kwargs["pattern"])
-            kwargs.pop("pattern")
+            pattern = kwargs.pop("pattern")
+            includes = list(kwargs.pop("include")) + ([pattern] if pattern != "*" else [])
+            pattern_f = PatternMatcher(includes, list(kwargs.pop("exclude")))
             return f(*args, **kwargs, **{func_name: pattern_f})
 
         return decorator
@@ -0,0 +1,141 @@
+import cProfile
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from databricks_terraformer import log
+from databricks_terraformer.utils.metrics import Metrics
+
+PROFILE_MODES = ["cprofile", "sampling", "tracemalloc"]
+
+
+class CProfileProfiler:
+    """
+    Deterministic profile of the command thread written in the pstats format (python -m pstats, snakeviz).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+        self._profile.dump_stats(self.path)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread at a fixed interval and writes them in the folded format
+    (thread;frame;frame count) understood by flamegraph.pl and speedscope. It is cheap enough to leave on in
+    production runs and also sees the terraform worker threads.
+    """
+
+    def __init__(self, path, interval_seconds=0.005):
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.samples = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="databricks-terraformer-sampler", daemon=True)
+
+    def _run(self):
+        sampler_id = threading.get_ident()
+        while not self._stopped.wait(self.interval_seconds):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        with open(self.path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class TracemallocProfiler:
+    """
+    Records the traced memory and the top allocation sites at the end of every major phase of the command and
+    writes them as JSON.
+    """
+    MAJOR_PHASES = {"list", "git_clone", "git_checkout", "git_stage", "git_diff", "git_change_log", "resource_index",
+                    "git_commit", "git_push", "stage"}
+
+    def __init__(self, path, metrics: Metrics, top=10, frames=5):
+        self.path = path
+        self.metrics = metrics
+        self.top = top
+        self.frames = frames
+        self.snapshots = []
+        self._lock = threading.Lock()
+
+    def _is_major_phase(self, phase):
+        return phase in self.MAJOR_PHASES or phase.startswith("terraform_")
+
+    def on_phase_end(self, phase):
+        if self._is_major_phase(phase):
+            self.take_snapshot(phase)
+
+    def take_snapshot(self, phase):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            self.snapshots.append({
+                "phase": phase,
+                "time": time.time(),
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "top_allocations": [{"size_bytes": stat.size, "count": stat.count,
+                                     "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]}
+                                    for stat in snapshot.statistics("traceback")[:self.top]],
+            })
+
+    def start(self):
+        tracemalloc.start(self.frames)
+        self.metrics.phase_listeners.append(self.on_phase_end)
+
+    def stop(self):
+        self.metrics.phase_listeners.remove(self.on_phase_end)
+        self.take_snapshot("end")
+        tracemalloc.stop()
+        with open(self.path, "w") as f:
+            json.dump({"snapshots": self.snapshots}, f, indent=2)
+            f.write("\n")
+
+
+def start_profiler(ctx, path, mode, metrics: Metrics):
+    """
+    Profiles the rest of the command and writes the profile to path when the click context closes.
+    """
+    if mode == "cprofile":
+        profiler = CProfileProfiler(path)
+    elif mode == "sampling":
+        profiler = SamplingProfiler(path)
+    elif mode == "tracemalloc":
+        profiler = TracemallocProfiler(path, metrics)
+    else:
+        raise ValueError(f"Unknown profile mode {mode}, use one of {PROFILE_MODES}")
+    log.info(f"Profiling with {mode}, the profile is written to {path}")
+    profiler.start()
+    ctx.call_on_close(profiler.stop)
+    return profiler
@@ -0,0 +1,73 @@
+import json
+import os
+from typing import Dict, Text, List, Optional
+
+from databricks_terraformer.utils import TFGitResourceFile
+
+
+class ResourceIndex:
+    """
+    Maps terraform resource addresses to the file defining them within an exported directory. The index is written
+    next to the exported files so resources can be targeted without scanning every file.
+    """
+    FILE_NAME = "resource_index.json"
+    VERSION = 1
+
+    def __init__(self, resources: Dict[Text, Text] = None):
+        self.resources = resources if resources is not None else {}
+        self._files: Optional[Dict[Text, List[Text]]] = None
+
+    @classmethod
+    def from_json(cls, data: Text):
+        return cls(json.loads(data)["resources"])
+
+    @classmethod
+    def load(cls, directory_path):
+        try:
+            with open(os.path.join(directory_path, cls.FILE_NAME), "r") as f:
+                return cls.from_json(f.read())
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, directory_path):
+        with open(os.path.join(directory_path, self.FILE_NAME), "w") as f:
+            json.dump({"version": self.VERSION, "resources": self.resources}, f, indent=1, sort_keys=True)
+            f.write("\n")
+
+    def _get_files(self):
+        if self._files is None:
+            self._files = {}
+            for address, file in self.resources.items():
+                self._files.setdefault(file, []).append(address)
+        return self._files
+
+    def get_file(self, address) -> Optional[Text]:
+        return self.resources.get(address)
+
+    def get_addresses(self, file) -> Optional[List[Text]]:
+        return self._get_files().get(file)
+
+    def set_file(self, file, addresses: List[Text]):
+        self.remove_file(file)
+        files = self._get_files()
+        for address in addresses:
+            previous = self.resources.get(address)
+            if previous is not None:
+                files[previous].remove(address)
+                if len(files[previous]) == 0:
+                    del files[previous]
+            self.resources[address] = file
+            files.setdefault(file, []).append(address)
+
+    def set_file_content(self, file, content: Text):
+        self.set_file(file, TFGitResourceFile.from_lines(content.split("\n")).get_addresses())
+
+    def remove_file(self, file):
+        # the file to addresses map is kept up to date, rebuilding it for every file is quadratic
+        for address in self._get_files().pop(file, []):
+            del self.resources[address]
+
+    def remove_missing_files(self, directory_path):
+        for file in list(self._get_files().keys()):
+            if not os.path.exists(os.path.join(directory_path, file)):
+                self.remove_file(file)
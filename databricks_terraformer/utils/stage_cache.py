@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from typing import Text, List, Optional
+
+import git
+
+from databricks_terraformer import log
+
+CACHE_DIR_ENV_VAR = "DATABRICKS_TERRAFORMER_CACHE_DIR"
+
+
+def get_default_cache_dir():
+    return os.environ.get(CACHE_DIR_ENV_VAR, os.path.join(os.path.expanduser("~"), ".databricks-terraformer", "cache"))
+
+
+def get_plugin_cache_dir(cache_dir):
+    return os.path.join(cache_dir, "plugins")
+
+
+def resolve_remote_ref(git_url, ref) -> Optional[Text]:
+    """
+    Resolves a branch or tag to the commit it points to without cloning the repository.
+    Returns None when the ref cannot be resolved remotely (i.e. an abbreviated commit sha).
+    """
+    if ref is None:
+        return None
+    if re.fullmatch("[0-9a-f]{40}", ref) is not None:
+        return ref
+    try:
+        output = git.cmd.Git().ls_remote(git_url, ref)
+    except git.GitCommandError as e:
+        log.debug(f"Unable to resolve {ref} on {git_url}: {e}")
+        return None
+    remote_refs = {}
+    for line in output.split("\n"):
+        if len(line) > 0:
+            sha, name = line.split("\t")
+            remote_refs[name] = sha
+    # annotated tags are peeled to the commit they point to
+    for name in [f"refs/tags/{ref}^{{}}", f"refs/heads/{ref}", f"refs/tags/{ref}", ref]:
+        if name in remote_refs:
+            return remote_refs[name]
+    return None
+
+
+class StageCache:
+    """
+    Keeps git clones and initialized terraform stage directories between invocations so that a plan and a later
+    apply of the same revision do not clone the repository and run terraform init twice.
+    """
+    STAGED_MARKER = ".databricks-terraformer-staged"
+
+    def __init__(self, cache_dir=None, max_stages=10):
+        self.cache_dir = cache_dir if cache_dir is not None else get_default_cache_dir()
+        self.max_stages = max_stages
+        self.plugin_cache_dir = get_plugin_cache_dir(self.cache_dir)
+        self._stages_dir = os.path.join(self.cache_dir, "stages")
+        self._repos_dir = os.path.join(self.cache_dir, "repos")
+        for path in [self.plugin_cache_dir, self._stages_dir, self._repos_dir]:
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def _hash(*parts):
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def repo_path(self, git_url):
+        return os.path.join(self._repos_dir, self._hash(git_url)[:16])
+
+    def stage_key(self, git_url, commit, ref, directories: List[Text], backend_file=None, workspace=None, name=None):
+        """
+        The name of a partition is part of the key, partitions without backend have neither directories nor a
+        workspace that tell their stages apart.
+        """
+        backend_content = None
+        if backend_file is not None:
+            with open(backend_file, "r") as f:
+                backend_content = f.read()
+        return self._hash(git_url, commit, ref, sorted(directories), backend_content, workspace, name)[:32]
+
+    def stage_path(self, key):
+        return os.path.join(self._stages_dir, key)
+
+    def is_staged(self, stage_path):
+        marker = os.path.join(stage_path, self.STAGED_MARKER)
+        if not os.path.exists(marker):
+            return False
+        # refresh the marker so that pruning keeps recently used stages
+        os.utime(marker)
+        return True
+
+    def mark_staged(self, stage_path):
+        with open(os.path.join(stage_path, self.STAGED_MARKER), "w") as f:
+            f.write("")
+        self.prune()
+
+    def reset(self, stage_path):
+        shutil.rmtree(stage_path, ignore_errors=True)
+        os.makedirs(stage_path)
+
+    def prune(self):
+        staged = []
+        for key in os.listdir(self._stages_dir):
+            marker = os.path.join(self.stage_path(key), self.STAGED_MARKER)
+            if os.path.exists(marker):
+                staged.append((os.path.getmtime(marker), key))
+        for _, key in sorted(staged, reverse=True)[self.max_stages:]:
+            log.info(f"Removing least recently used terraform stage {key}")
+            shutil.rmtree(self.stage_path(key), ignore_errors=True)
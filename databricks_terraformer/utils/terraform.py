@@ -1,15 +1,29 @@
+import filecmp
+import hashlib
+import json
 import ntpath
 import os
+import re
 import subprocess
 import sys
 import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from shutil import copyfile
-from typing import Optional, List, Text
+from typing import Optional, List, Text, Dict
 
 import git
 
 from databricks_terraformer import log
-from databricks_terraformer.utils import TFGitResource
+from databricks_terraformer.utils import TFGitResourceFile, lfs
+from databricks_terraformer.utils.apply_journal import ApplyJournal
+from databricks_terraformer.utils.content_store import BY_HASH_DIRECTORY
+from databricks_terraformer.utils.metrics import Metrics, get_metrics
+from databricks_terraformer.utils.resource_index import ResourceIndex
+from databricks_terraformer.utils.stage_cache import StageCache, resolve_remote_ref
 
 
 class TerraformCommandError(subprocess.CalledProcessError):
@@ -19,12 +33,109 @@ class TerraformCommandError(subprocess.CalledProcessError):
         self.err = err
 
 
+class TerraformOutputMonitor:
+    """
+    Follows the streamed terraform output and periodically logs how many resources were refreshed, planned and
+    applied so far.
+    """
+    REFRESHED_PATTERN = re.compile(r": Refreshing state\.\.\.")
+    PLANNED_PATTERN = re.compile(r"^\s*# \S+ (will be|must be) ")
+    APPLIED_PATTERN = re.compile(r": (Creation|Modifications|Destruction) complete after")
+    THROTTLED_PATTERN = re.compile(r"Too Many Requests|rate[ _-]?limit|REQUEST_LIMIT_EXCEEDED|"
+                                   r"(status|code|error)\W{0,10}429\b", re.IGNORECASE)
+
+    def __init__(self, name=None, report_interval_seconds=10):
+        self.name = name
+        self.report_interval_seconds = report_interval_seconds
+        self.refreshed = 0
+        self.planned = 0
+        self.applied = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._last_report = time.monotonic()
+
+    def on_line(self, line):
+        with self._lock:
+            if self.REFRESHED_PATTERN.search(line) is not None:
+                self.refreshed += 1
+            elif self.PLANNED_PATTERN.search(line) is not None:
+                self.planned += 1
+            elif self.APPLIED_PATTERN.search(line) is not None:
+                self.applied += 1
+            if self.THROTTLED_PATTERN.search(line) is not None:
+                self.throttled += 1
+            if time.monotonic() - self._last_report >= self.report_interval_seconds:
+                self.report()
+
+    def report(self):
+        self._last_report = time.monotonic()
+        prefix = f"[{self.name}] " if self.name is not None else ""
+        log.info(f"{prefix}terraform progress: {self.refreshed} refreshed, {self.planned} planned, "
+                 f"{self.applied} applied, {self.throttled} throttled")
+
+
+class AdaptiveParallelism:
+    """
+    Chooses the terraform -parallelism for a workspace host. The value is halved whenever the provider output shows
+    API throttling and the last value is remembered per host in a local json file. Hosts that were not throttled
+    in their last run start with a slightly higher value to probe for more throughput.
+    """
+    DEFAULT = 10
+    MINIMUM = 1
+    MAXIMUM = 64
+
+    def __init__(self, host, store_path):
+        self.host = host
+        self.store_path = store_path
+        self.throttled = False
+        self._lock = threading.Lock()
+        previous = self._load().get(host)
+        if previous is None:
+            self.value = self.DEFAULT
+        elif previous["throttled"] is True:
+            self.value = previous["parallelism"]
+        else:
+            self.value = min(self.MAXIMUM, max(previous["parallelism"] + 1, int(previous["parallelism"] * 1.25)))
+        log.info(f"Using terraform parallelism {self.value} for {host}")
+
+    def _load(self):
+        try:
+            with open(self.store_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def on_throttled(self, used):
+        """
+        Lowers the parallelism after a throttled run at the used parallelism.
+        :return: whether a retry at a lower parallelism is possible
+        """
+        with self._lock:
+            self.throttled = True
+            self.value = min(self.value, max(self.MINIMUM, used // 2))
+            log.warning(f"API throttling detected at parallelism {used}, lowering parallelism to {self.value}")
+            return used > self.MINIMUM
+
+    def save(self):
+        with self._lock:
+            store = self._load()
+            store[self.host] = {"parallelism": self.value, "throttled": self.throttled}
+            with open(self.store_path, "w") as f:
+                json.dump(store, f, indent=2, sort_keys=True)
+
+
 class Terraform:
     BASE_COMMAND = ["terraform"]
 
-    def __init__(self, working_dir=None, is_env_vars_included=False):
+    def __init__(self, working_dir=None, is_env_vars_included=False, plugin_cache_dir=None, log_prefix=None,
+                 output_tail_lines=10000, metrics: Metrics = None):
+        self.metrics = metrics if metrics is not None else get_metrics()
         self.is_env_vars_included = is_env_vars_included
         self.working_dir = working_dir
+        self.plugin_cache_dir = plugin_cache_dir
+        self.log_prefix = log_prefix
+        self.output_tail_lines = output_tail_lines
+        self.last_monitor: Optional[TerraformOutputMonitor] = None
 
     def cmd(self, cmds, *args, **kwargs):
         """
@@ -70,6 +181,8 @@ class Terraform:
         environ_vars = {}
         if self.is_env_vars_included:
             environ_vars = os.environ.copy()
+        if self.plugin_cache_dir is not None:
+            environ_vars["TF_PLUGIN_CACHE_DIR"] = self.plugin_cache_dir
 
         p = subprocess.Popen(cmds, stdout=stdout, stderr=stderr,
                              cwd=working_folder, env=environ_vars)
@@ -78,23 +191,58 @@ class Terraform:
         if not synchronous:
             return p, None, None
 
-        out, err = p.communicate()
-        ret_code = p.returncode
-        log.debug('output: {o}'.format(o=out))
+        return self.wait(p, capture_output=capture_output, raise_on_error=raise_on_error)
 
-        if capture_output is True:
-            out = out.decode('utf-8')
-            err = err.decode('utf-8')
-        else:
-            out = None
-            err = None
+    def wait(self, p: subprocess.Popen, capture_output=True, raise_on_error=False):
+        """
+        wait for a process started with cmd(..., synchronous=False) to finish, captured output is streamed line by
+        line to the logger while the process runs and only the last output_tail_lines lines are kept in memory
+        :return: ret_code, out, err where out and err are the captured output tails
+        """
+        # processes are waited for right after they are started so the wait covers the whole command
+        with self.metrics.timer(self._get_phase(p.args), self.log_prefix):
+            return self._wait(p, capture_output, raise_on_error)
+
+    def _get_phase(self, cmds):
+        return "terraform_" + cmds[len(self.BASE_COMMAND)].lstrip("-")
+
+    def _wait(self, p: subprocess.Popen, capture_output, raise_on_error):
+        if capture_output is not True:
+            return p.wait(), None, None
+
+        monitor = TerraformOutputMonitor(self.log_prefix)
+        out_tail = deque(maxlen=self.output_tail_lines)
+        err_tail = deque(maxlen=self.output_tail_lines)
+        readers = [threading.Thread(target=self._stream, args=(p.stdout, out_tail, monitor, log.info)),
+                   threading.Thread(target=self._stream, args=(p.stderr, err_tail, monitor, log.warning))]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        ret_code = p.wait()
+        if monitor.refreshed + monitor.planned + monitor.applied > 0:
+            monitor.report()
+        self.last_monitor = monitor
+
+        out = "".join(out_tail)
+        err = "".join(err_tail)
 
         if ret_code != 0 and raise_on_error:
             raise TerraformCommandError(
-                ret_code, ' '.join(cmds), out=out, err=err)
+                ret_code, ' '.join(p.args), out=out, err=err)
 
         return ret_code, out, err
 
+    def _stream(self, pipe, tail, monitor: TerraformOutputMonitor, log_line):
+        prefix = f"[{self.log_prefix}] " if self.log_prefix is not None else ""
+        with pipe:
+            for raw_line in iter(pipe.readline, b""):
+                line = raw_line.decode("utf-8", errors="replace")
+                tail.append(line)
+                monitor.on_line(line)
+                if len(line.strip()) > 0:
+                    log_line(prefix + line.rstrip("\n"))
+
     def version(self):
         version_cmd = self.BASE_COMMAND + ["--version"]
         return self.cmd(version_cmd)
@@ -103,30 +251,74 @@ class Terraform:
         version_cmd = self.BASE_COMMAND + ["init"]
         return self.cmd(version_cmd)
 
-    def plan(self, output_file=None, targets=None, state_file_abs_path=None):
+    def show(self, plan_file, synchronous=True):
+        show_cmd = self.BASE_COMMAND + ["show", "-no-color", plan_file]
+        return self.cmd(show_cmd, synchronous=synchronous)
+
+    def _read_output(self, cmds):
+        # the output is read in full, it is not streamed to the logger
+        with self.metrics.timer(self._get_phase(cmds), self.log_prefix):
+            p, _, _ = self.cmd(cmds, synchronous=False)
+            out, err = p.communicate()
+        if p.returncode != 0:
+            raise TerraformCommandError(p.returncode, ' '.join(p.args), out=None, err=err.decode('utf-8'))
+        return out.decode('utf-8')
+
+    def state_pull(self):
+        return self._read_output(self.BASE_COMMAND + ["state", "pull"])
+
+    def state_list(self, state_file_abs_path=None) -> List[Text]:
+        list_cmd = self.BASE_COMMAND + ["state", "list"]
+        if state_file_abs_path is not None:
+            list_cmd += [f"-state={state_file_abs_path}"]
+        return [line for line in self._read_output(list_cmd).split("\n") if len(line) > 0]
+
+    def workspace_select(self, workspace):
+        select_cmd = self.BASE_COMMAND + ["workspace", "select", workspace]
+        return_code, stdout, stderr = self.cmd(select_cmd)
+        if return_code != 0:
+            new_cmd = self.BASE_COMMAND + ["workspace", "new", workspace]
+            return self.cmd(new_cmd, raise_on_error=True)
+        return return_code, stdout, stderr
+
+    def plan(self, output_file=None, targets=None, state_file_abs_path=None, synchronous=True, parallelism=None):
         plan_cmd = self.BASE_COMMAND + ["plan"]
+        if parallelism is not None:
+            plan_cmd += [f"-parallelism={parallelism}"]
         if output_file is not None:
             plan_cmd += ["-out", output_file]
         if state_file_abs_path is not None:
             plan_cmd += ["-state", state_file_abs_path]
         if targets is not None:
             plan_cmd += targets
-        return self.cmd(plan_cmd)
+        return self.cmd(plan_cmd, synchronous=synchronous)
 
-    def apply(self, plan_file=None, state_file_abs_path=None):
+    def apply(self, plan_file=None, state_file_abs_path=None, synchronous=True, parallelism=None):
         apply_cmd = self.BASE_COMMAND + ["apply"]
+        if parallelism is not None:
+            apply_cmd += [f"-parallelism={parallelism}"]
         if state_file_abs_path is not None:
             apply_cmd += ["-state", state_file_abs_path]
         if plan_file is not None:
             apply_cmd += [plan_file]
-        return self.cmd(apply_cmd)
+        return self.cmd(apply_cmd, synchronous=synchronous)
 
 
 class GitTFStage_V2:
 
-    # TODO: Support tag and batch id for batched-targeted plans
     def __init__(self, git_url, directories: List[Text], cur_ref, artifact_dir,
-                 prev_ref=None, init=True, backend_file=None):
+                 prev_ref=None, init=True, backend_file=None, max_targets=None, stage_cache: StageCache = None,
+                 plugin_cache_dir=None, workspace=None, name=None, parallelism=None, reuse_plan=False):
+        self.metrics = get_metrics()
+        self.reuse_plan = reuse_plan
+        # parallelism is either a fixed number or an AdaptiveParallelism shared by all stages of a run
+        self.parallelism = parallelism
+        self.name = name
+        self.workspace = workspace
+        self.stage_cache = stage_cache
+        self.plugin_cache_dir = plugin_cache_dir if plugin_cache_dir is not None or stage_cache is None \
+            else stage_cache.plugin_cache_dir
+        self.max_targets = max_targets
         self.backend_file = backend_file
         self.prev_ref = prev_ref
         self.cur_ref = cur_ref
@@ -135,48 +327,295 @@ class GitTFStage_V2:
         self.artifact_dir = artifact_dir
         self.init = init
         self._terraform: Optional[Terraform] = None
+        self.repo: Optional[git.Repo] = None
+        self._cur_commit = None
+        self._prev_commit = None
+        self._staged_sources: Dict[Text, Text] = {}
+        self._lfs_sources: Dict[Text, Text] = {}
+        self._plan_targets = None
+        self._plan_targets_computed = False
+        self._resource_indexes: Dict[tuple, ResourceIndex] = {}
+        self._tmp_directories: List[tempfile.TemporaryDirectory] = []
+
+    @staticmethod
+    def _get_stage_rel_path(directory_rel_path):
+        """
+        Terraform files are staged in the root of the stage directory and payloads keep their path relative to
+        files/ so the generated filebase64/pathexpand references resolve from the terraform working directory.
+        Anything else (i.e. change logs) is not needed by terraform and is not staged.
+        """
+        if directory_rel_path.endswith(".tf"):
+            return ntpath.basename(directory_rel_path)
+        if directory_rel_path.startswith("files/"):
+            return directory_rel_path[len("files/"):]
+        return None
 
     def _stage_file(self, abs_file_path):
-        file_name = ntpath.basename(abs_file_path)
-        copyfile(abs_file_path, os.path.join(self.tf_stage_directory.name, file_name))
-
-    # Currently not supporting resource targeting
-    # Will eventually set up a resource targetting Mode
-    def plan(self):
+        directory = next(d for d in self.directories
+                         if abs_file_path.startswith(os.path.join(self.local_repo_directory, d) + os.sep))
+        directory_rel_path = os.path.relpath(abs_file_path, os.path.join(self.local_repo_directory, directory))
+        stage_rel_path = self._get_stage_rel_path(directory_rel_path.replace(os.sep, "/"))
+        if stage_rel_path is None:
+            return
+        stage_path = os.path.join(self.stage_directory, stage_rel_path)
+        source_path = self._lfs_sources.get(abs_file_path, abs_file_path)
+
+        if stage_rel_path in self._staged_sources:
+            if filecmp.cmp(source_path, stage_path, shallow=False):
+                return
+            raise ValueError(f"Unable to stage {abs_file_path} as {stage_rel_path}, it collides with "
+                             f"{self._staged_sources[stage_rel_path]}")
+        self._staged_sources[stage_rel_path] = abs_file_path
+
+        os.makedirs(os.path.dirname(stage_path), exist_ok=True)
+        # hard links avoid copying the payloads, fall back to copying across file systems. Symbolic links are not
+        # used as the temporary clone is removed while cached stages are kept.
+        try:
+            os.link(source_path, stage_path)
+        except OSError:
+            copyfile(source_path, stage_path)
+
+    def _resolve_lfs_pointers(self):
+        """
+        Payloads exported as Git LFS pointers are staged from their objects so filebase64 and pathexpand read the
+        content, objects which are not in the local store are fetched with one git lfs fetch.
+        """
+        self._lfs_sources = {}
+        missing = []
+        for abs_file_path in self.targeted_files_abs_paths:
+            pointer = lfs.read_pointer(abs_file_path)
+            if pointer is None:
+                continue
+            self._lfs_sources[abs_file_path] = lfs.get_object_path(self.repo.git_dir, pointer[0])
+            if not os.path.exists(self._lfs_sources[abs_file_path]):
+                missing.append(abs_file_path)
+        if len(missing) > 0:
+            log.info(f"Fetching {len(missing)} LFS objects")
+            with self.metrics.timer("lfs_fetch"):
+                lfs.fetch_objects(self.repo, self.repo.head.commit.hexsha, self.directories)
+        for abs_file_path, object_path in self._lfs_sources.items():
+            if not os.path.exists(object_path):
+                raise ValueError(f"Unable to stage {abs_file_path}, its LFS object {object_path} is missing")
+        self.metrics.count("lfs_fetch", objects=len(missing))
+
+    def _get_parallelism(self):
+        if isinstance(self.parallelism, AdaptiveParallelism):
+            return self.parallelism.value
+        return self.parallelism
+
+    # When a previous revision is provided only the resources changed between the two revisions are planned,
+    # the targets are baked into plan.out so the apply is targeted as well
+    def start_plan(self, parallelism=None, targets=None, plan_abs_path=None) -> subprocess.Popen:
+        state_abs_path = os.path.join(self.artifact_dir, "terraform.tfstate")
+        plan_abs_path = plan_abs_path if plan_abs_path is not None else os.path.join(self.artifact_dir, "plan.out")
+        p, _, _ = self._terraform.plan(plan_abs_path,
+                                       targets=targets if targets is not None else self._get_plan_targets(),
+                                       state_file_abs_path=state_abs_path,
+                                       synchronous=False,
+                                       parallelism=parallelism)
+        return p
+
+    def start_apply(self, custom_plan_path=None, parallelism=None) -> subprocess.Popen:
         state_abs_path = os.path.join(self.artifact_dir, "terraform.tfstate")
         plan_abs_path = os.path.join(self.artifact_dir, "plan.out")
-        return_code, stdout, stderr = self._terraform.plan(plan_abs_path,
-                                                           state_file_abs_path=state_abs_path)
-        log.info(stdout)
+        p, _, _ = self._terraform.apply(custom_plan_path if custom_plan_path is not None else plan_abs_path,
+                                        state_file_abs_path=state_abs_path,
+                                        synchronous=False,
+                                        parallelism=parallelism)
+        return p
+
+    def wait(self, p: subprocess.Popen):
+        return_code, stdout, stderr = self._terraform.wait(p)
         if return_code != 0:
-            log.error(stderr)
+            log.error(f"terraform exited with code {return_code}")
+        return return_code, stdout, stderr
+
+    def _record_throttling(self, parallelism):
+        """
+        Lowers the adaptive parallelism when the last run was throttled, whether it succeeded or not.
+        :return: whether a retry at a lower parallelism is possible
+        """
+        if not isinstance(self.parallelism, AdaptiveParallelism):
+            return False
+        if self._terraform.last_monitor is None or self._terraform.last_monitor.throttled == 0:
+            return False
+        return self.parallelism.on_throttled(parallelism)
+
+    def _should_retry(self, return_code, parallelism):
+        can_retry = self._record_throttling(parallelism)
+        return return_code != 0 and can_retry
+
+    def _get_state_identity(self):
+        if self.backend_file is not None:
+            state = json.loads(self._terraform.state_pull() or "{}")
+        else:
+            try:
+                with open(os.path.join(self.artifact_dir, "terraform.tfstate"), "r") as f:
+                    state = json.load(f)
+            except FileNotFoundError:
+                state = {}
+        return [state.get("lineage"), state.get("serial")]
+
+    def _get_plan_fingerprint(self):
+        """
+        Fingerprints everything a plan depends on: the staged files, the targets, the workspace and the serial and
+        lineage of the current state.
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps([self._get_plan_targets(), self.workspace, self._get_state_identity()]).encode())
+        for root, d_names, f_names in os.walk(self.stage_directory):
+            d_names[:] = sorted(d for d in d_names if d != ".terraform")
+            for f in sorted(f_names):
+                if f == StageCache.STAGED_MARKER:
+                    continue
+                path = os.path.join(root, f)
+                digest.update(os.path.relpath(path, self.stage_directory).encode("utf-8") + b"\0")
+                with open(path, "rb") as fh:
+                    for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                        digest.update(chunk)
+        return digest.hexdigest()
+
+    def _reuse_plan(self, plan_abs_path, fingerprint_path, fingerprint):
+        if not os.path.exists(plan_abs_path) or not os.path.exists(fingerprint_path):
+            return None
+        with open(fingerprint_path, "r") as f:
+            if f.read() != fingerprint:
+                return None
+        log.info(f"Stage, targets and state are unchanged since {plan_abs_path} was created, verifying the plan")
+        p, _, _ = self._terraform.show(plan_abs_path, synchronous=False)
+        result = self.wait(p)
+        if result[0] != 0:
+            log.warning(f"Unable to read {plan_abs_path}, planning again")
+            return None
+        log.info(f"Reusing {plan_abs_path}")
+        return result
+
+    def run_step(self, step, custom_plan_path=None):
+        """
+        Runs the plan or apply step, with adaptive parallelism throttled runs are retried at a lower parallelism.
+        A throttled apply leaves the saved plan stale so it is planned again before retrying the apply.
+        With plan reuse a plan.out created from the same fingerprint is verified and reused instead of planning.
+        """
+        parallelism = self._get_parallelism()
+        fingerprint = None
+        if step == "plan" and self.reuse_plan is True:
+            plan_abs_path = os.path.join(self.artifact_dir, "plan.out")
+            fingerprint_path = os.path.join(self.artifact_dir, "plan.out.fingerprint")
+            fingerprint = self._get_plan_fingerprint()
+            reused = self._reuse_plan(plan_abs_path, fingerprint_path, fingerprint)
+            if reused is not None:
+                return reused
+            if os.path.exists(fingerprint_path):
+                os.remove(fingerprint_path)
+
+        if step == "plan":
+            result = self.wait(self.start_plan(parallelism))
+        else:
+            result = self.wait(self.start_apply(custom_plan_path, parallelism))
+        while self._should_retry(result[0], parallelism) and custom_plan_path is None:
+            parallelism = self._get_parallelism()
+            log.info(f"Retrying terraform {step} with parallelism {parallelism}")
+            result = self.wait(self.start_plan(parallelism))
+            if step == "apply" and result[0] == 0:
+                self._record_throttling(parallelism)
+                result = self.wait(self.start_apply(parallelism=parallelism))
+
+        if fingerprint is not None and result[0] == 0:
+            with open(fingerprint_path, "w") as f:
+                f.write(fingerprint)
+        return result
+
+    def plan(self):
+        return_code, _, _ = self.run_step("plan")
+        return return_code
 
     def apply(self, custom_plan_path=None):
-        state_abs_path = os.path.join(self.artifact_dir, "terraform.tfstate")
-        plan_abs_path = os.path.join(self.artifact_dir, "plan.out")
-        if custom_plan_path is not None:
-            return_code, stdout, stderr = self._terraform.apply(custom_plan_path,
-                                                                state_file_abs_path=state_abs_path)
+        return_code, _, _ = self.run_step("apply", custom_plan_path)
+        return return_code
+
+    def _get_batch_addresses(self) -> List[Text]:
+        # without targets every resource in the staged configuration and every resource in the state is applied,
+        # resources only found in the state are the ones being destroyed
+        targets = self._get_plan_targets()
+        if targets is not None:
+            return targets[1::2]
+        addresses = set()
+        for f in os.listdir(self.stage_directory):
+            if f.endswith(".tf"):
+                addresses.update(TFGitResourceFile.from_file_path(os.path.join(self.stage_directory, f))
+                                 .get_addresses())
+        state_abs_path = None if self.backend_file is not None else os.path.join(self.artifact_dir,
+                                                                                 "terraform.tfstate")
+        if state_abs_path is None or os.path.exists(state_abs_path):
+            addresses.update(address for address in self._terraform.state_list(state_abs_path)
+                             if not address.startswith("data."))
+        return list(addresses)
+
+    def _get_batch_run_id(self, batch_size):
+        revision = self._cur_commit or (self.repo.head.commit.hexsha if self.repo is not None else self.cur_ref)
+        return hashlib.sha256(json.dumps([self.git_url, revision, sorted(self.directories), self.workspace,
+                                          self._get_plan_targets(), batch_size]).encode("utf-8")).hexdigest()
+
+    def _apply_batch(self, targets):
+        plan_abs_path = os.path.join(self.artifact_dir, "plan.batch.out")
+        while True:
+            parallelism = self._get_parallelism()
+            result = self.wait(self.start_plan(parallelism, targets=targets, plan_abs_path=plan_abs_path))
+            if result[0] == 0:
+                self._record_throttling(parallelism)
+                result = self.wait(self.start_apply(plan_abs_path, parallelism))
+            if not self._should_retry(result[0], parallelism):
+                return result
+            log.info(f"Retrying the batch with parallelism {self._get_parallelism()}")
+
+    def run_batched_apply(self, batch_size):
+        """
+        Plans and applies the resources in batches of batch_size targets. Completed batches are recorded in the
+        apply journal in the artifact dir so a failed or interrupted run resumes at the first unfinished batch.
+        """
+        run_id = self._get_batch_run_id(batch_size)
+        journal = ApplyJournal.load(self.artifact_dir, run_id)
+        if journal is None:
+            journal = ApplyJournal.create(self.artifact_dir, run_id, self._get_batch_addresses(), batch_size)
         else:
-            return_code, stdout, stderr = self._terraform.apply(plan_abs_path,
-                                                                state_file_abs_path=state_abs_path)
-        log.info(stdout)
-        if return_code != 0:
-            log.error(stderr)
+            log.info(f"Resuming batched apply, {len(journal.completed)} of {len(journal.batches)} batches are "
+                     f"already applied")
+
+        result = 0, "", ""
+        for batch_index, batch in journal.pending():
+            log.info(f"Applying batch {batch_index + 1} of {len(journal.batches)} with {len(batch)} resources")
+            targets = []
+            for address in batch:
+                targets += ["--target", address]
+            result = self._apply_batch(targets)
+            if result[0] != 0:
+                log.error(f"Batch {batch_index + 1} of {len(journal.batches)} failed, run the apply again to resume "
+                          f"from this batch")
+                return result
+            journal.mark_completed(batch_index)
+        log.info(f"Applied {len(journal.batches)} batches")
+        journal.remove()
+        return result
+
+    def apply_batched(self, batch_size):
+        return_code, _, _ = self.run_batched_apply(batch_size)
+        return return_code
 
     def _init(self):
         if self._terraform is not None:
             self._terraform.init()
+            if self.workspace is not None:
+                self._terraform.workspace_select(self.workspace)
         else:
             raise ValueError("Terraform is not configured")
 
     def _add_provider_block(self):
-        provider_path = os.path.join(self.tf_stage_directory.name, "provider.tf")
+        provider_path = os.path.join(self.stage_directory, "provider.tf")
         with open(provider_path, "w") as f:
             f.write("provider databricks {}")
 
     def _add_output_tag_block(self):
-        provider_path = os.path.join(self.tf_stage_directory.name, "output_commit.tf")
+        provider_path = os.path.join(self.stage_directory, "output_commit.tf")
         with open(provider_path, "w") as f:
             f.write("""
             output "cur_git_rev" {{
@@ -188,7 +627,7 @@ class GitTFStage_V2:
             """.format(self.cur_ref, self.git_url))
 
     def _add_back_end_file(self):
-        provider_path = os.path.join(self.tf_stage_directory.name, "backend.tf")
+        provider_path = os.path.join(self.stage_directory, "backend.tf")
         with open(provider_path, "w") as f:
             with open(self.backend_file, "r") as bk:
                 bkend_content = bk.read()
@@ -196,27 +635,162 @@ class GitTFStage_V2:
             f.flush()
 
     def _get_code(self):
-        self.local_repo_directory = tempfile.TemporaryDirectory()
-        # self.resource_path = os.path.join(self.local_repo_directory.name, self.directory)
-        self.repo = git.Repo.clone_from(self.git_url, self.local_repo_directory.name,
-                                        branch='master')
-        self.repo.git.checkout(self.cur_ref)
+        with self.metrics.timer("git_checkout"):
+            self._checkout_code()
+
+    def _checkout_code(self):
+        if self.stage_cache is None:
+            self.local_repo_directory = self._make_tmp_directory()
+            self.repo = git.Repo.clone_from(self.git_url, self.local_repo_directory,
+                                            branch='master')
+            self.repo.git.checkout(self.cur_ref)
+            self._cur_commit = self.repo.head.commit.hexsha
+            return
+
+        # cached clones are refreshed with a fetch and checked out detached so a stale local branch is never used
+        self.local_repo_directory = self.stage_cache.repo_path(self.git_url)
+        if os.path.exists(os.path.join(self.local_repo_directory, ".git")):
+            self.repo = git.Repo(self.local_repo_directory)
+            # without a remotely resolved commit the local branches may be stale, so the clone is always refreshed
+            refs = [ref for ref in [self._cur_commit, self.prev_ref] if ref is not None]
+            if self._cur_commit is None or not all(self._has_commit(ref) for ref in refs):
+                log.info(f"Fetching {self.git_url} into cached clone {self.local_repo_directory}")
+                self.repo.git.fetch("origin", "--tags", "--force")
+        else:
+            log.info(f"Cloning {self.git_url} into cached clone {self.local_repo_directory}")
+            self.repo = git.Repo.clone_from(self.git_url, self.local_repo_directory, branch='master')
+        # the local branches of a cached clone are never moved, refs are resolved on the fetched remote branches
+        self.repo.git.checkout("--force", "--detach", self._cur_commit or self._resolve_commit(self.cur_ref))
+        self._cur_commit = self.repo.head.commit.hexsha
+
+    def _resolve_commit(self, ref) -> Optional[Text]:
+        for candidate in [f"origin/{ref}", ref]:
+            try:
+                return self.repo.git.rev_parse("--verify", "--quiet", f"{candidate}^{{commit}}")
+            except git.GitCommandError:
+                continue
+        return None
+
+    def _has_commit(self, ref):
+        try:
+            self.repo.git.rev_parse("--verify", "--quiet", f"{ref}^{{commit}}")
+            return True
+        except git.GitCommandError:
+            return False
+
+    def _make_tmp_directory(self):
+        tmp_directory = tempfile.TemporaryDirectory()
+        self._tmp_directories.append(tmp_directory)
+        return tmp_directory.name
 
     def _git_diff(self):
         if self.prev_ref is None or self.cur_ref is None:
             return None
+        self._prev_commit = self._resolve_commit(self.prev_ref)
+        if self._prev_commit is None:
+            log.warning(f"Unable to resolve {self.prev_ref} in {self.git_url}, running a full plan")
+            return None
         fmt = '--name-status'
         commits = []
-        differ = self.repo.git.diff(f"{self.prev_ref}..{self.cur_ref}", fmt).split("\n")
+        differ = self.repo.git.diff(f"{self._prev_commit}..{self._cur_commit}", fmt).split("\n")
         for line in differ:
             if len(line) > 0:
                 commits.append(line)
         return commits
 
+    def _get_changed_tf_files(self, diff_lines):
+        """
+        Maps the git name-status diff to the terraform files owning the changes as (revision, path) pairs.
+        Deleted files are read from the previous revision and changes to files/<identifier> map to <identifier>.tf.
+        Content addressed payloads (files/by-hash/<sha256>) are skipped, the .tf files referencing them change as well.
+        """
+        changed = {}
+        for line in diff_lines:
+            status, *paths = line.split("\t")
+            # renames and copies list the old and the new path
+            if status[0] in ["R", "C"]:
+                changed[paths[0]] = self._prev_commit
+                changed[paths[1]] = self._cur_commit
+            else:
+                changed[paths[0]] = self._prev_commit if status[0] == "D" else self._cur_commit
+
+        tf_files = {}
+        for path, ref in changed.items():
+            directory, _, rel_path = path.partition("/")
+            if directory not in self.directories:
+                continue
+            if rel_path.startswith(f"files/{BY_HASH_DIRECTORY}/"):
+                continue
+            if rel_path.startswith("files/"):
+                path = f"{directory}/{ntpath.basename(rel_path)}.tf"
+                ref = self._cur_commit if os.path.exists(os.path.join(self.local_repo_directory, path)) \
+                    else self._prev_commit
+            if path.endswith(".tf"):
+                tf_files[path] = ref
+        return tf_files
+
+    def _get_resource_index(self, ref, directory) -> ResourceIndex:
+        if (ref, directory) not in self._resource_indexes:
+            if ref == self._cur_commit:
+                index = ResourceIndex.load(os.path.join(self.local_repo_directory, directory))
+            else:
+                try:
+                    index = ResourceIndex.from_json(self.repo.git.show(f"{ref}:{directory}/{ResourceIndex.FILE_NAME}"))
+                except git.GitCommandError:
+                    index = ResourceIndex()
+            self._resource_indexes[(ref, directory)] = index
+        return self._resource_indexes[(ref, directory)]
+
+    def _get_resource_addresses(self, path, ref) -> List[Text]:
+        # the resource index written at export time is used when it knows the file, otherwise the file is scanned
+        directory, _, file = path.partition("/")
+        addresses = self._get_resource_index(ref, directory).get_addresses(file)
+        if addresses is not None:
+            return addresses
+        # a path missing at the ref defines no resources there
+        if ref == self._cur_commit:
+            abs_path = os.path.join(self.local_repo_directory, path)
+            if not os.path.exists(abs_path):
+                return []
+            return TFGitResourceFile.from_file_path(abs_path).get_addresses()
+        try:
+            lines = self.repo.git.show(f"{ref}:{path}").split("\n")
+        except git.GitCommandError:
+            log.debug(f"{path} does not exist at {ref}")
+            return []
+        return TFGitResourceFile.from_lines(lines).get_addresses()
+
+    def _get_plan_targets(self):
+        if not self._plan_targets_computed:
+            self._plan_targets = self._compute_plan_targets()
+            self._plan_targets_computed = True
+        return self._plan_targets
+
+    def _compute_plan_targets(self):
+        diff_lines = self._git_diff()
+        if diff_lines is None:
+            return None
+
+        targets = []
+        for path, ref in self._get_changed_tf_files(diff_lines).items():
+            for address in self._get_resource_addresses(path, ref):
+                targets += ["--target", address]
+
+        target_count = len(targets) // 2
+        if target_count == 0:
+            log.info(f"No resource changes found between {self.prev_ref} and {self.cur_ref}, running a full plan")
+            return None
+        if self.max_targets is not None and target_count > self.max_targets:
+            log.info(f"{target_count} resources changed between {self.prev_ref} and {self.cur_ref} which is more "
+                     f"than {self.max_targets} targets, running a full plan")
+            return None
+        log.info(f"Targeting {target_count} resources changed between {self.prev_ref} and {self.cur_ref}")
+        return targets
+
     def _identify_files_to_stage(self):
         paths = []
         for d in self.directories:
-            path = os.path.join(self.local_repo_directory.name, d)
+            path = os.path.join(self.local_repo_directory, d)
             for root, d_names, f_names in os.walk(path):
                 for f in f_names:
                     paths.append(os.path.join(root, f))
@@ -227,15 +801,15 @@ class GitTFStage_V2:
 
         self.targeted_files_abs_paths = paths
 
-    def __enter__(self):
-        # Get the terraform code
-        self._get_code()
+    def _stage(self):
+        with self.metrics.timer("stage"):
+            self._stage_files()
+        self.metrics.count("stage", objects=len(self._staged_sources))
+
+    def _stage_files(self):
         # identify targets and changes
         self._identify_files_to_stage()
 
-        # stage the terraform files
-        self.tf_stage_directory = tempfile.TemporaryDirectory()
-
         self._add_provider_block()
         log.info(f"staged provider")
 
@@ -246,20 +820,110 @@ class GitTFStage_V2:
             self._add_back_end_file()
             log.info(f"added backend")
 
+        self._resolve_lfs_pointers()
+        self._staged_sources = {}
         for file_path in self.targeted_files_abs_paths:
             self._stage_file(file_path)
-        log.info("copied files")
-
-        contents = os.listdir(self.tf_stage_directory.name)
-        log.info(f"TF contents: {contents}")
+        log.info(f"staged {len(self._staged_sources)} files")
 
-        self._terraform = Terraform(self.tf_stage_directory.name, True)
+        contents = os.listdir(self.stage_directory)
+        log.debug(f"TF contents: {contents}")
 
+    def __enter__(self):
+        if self.stage_cache is None:
+            # Get the terraform code
+            self._get_code()
+            # stage the terraform files
+            self.stage_directory = self._make_tmp_directory()
+            self._stage()
+            self._terraform = Terraform(self.stage_directory, True, plugin_cache_dir=self.plugin_cache_dir,
+                                    log_prefix=self.name, metrics=self.metrics)
+            if self.init is True:
+                log.info("RUNNING TERRAFORM INIT")
+                self._init()
+            return self
+
+        self._cur_commit = resolve_remote_ref(self.git_url, self.cur_ref)
+        if self._cur_commit is None or self.prev_ref is not None:
+            self._get_code()
+            self._cur_commit = self.repo.head.commit.hexsha
+        stage_key = self.stage_cache.stage_key(self.git_url, self._cur_commit, self.cur_ref, self.directories,
+                                               self.backend_file, self.workspace, self.name)
+        self.stage_directory = self.stage_cache.stage_path(stage_key)
+        self._terraform = Terraform(self.stage_directory, True, plugin_cache_dir=self.plugin_cache_dir,
+                                    log_prefix=self.name, metrics=self.metrics)
+        if self.stage_cache.is_staged(self.stage_directory):
+            log.info(f"Reusing initialized terraform stage {self.stage_directory} for {self._cur_commit}")
+            return self
+
+        if self.repo is None:
+            self._get_code()
+        self.stage_cache.reset(self.stage_directory)
+        self._stage()
         if self.init is True:
             log.info("RUNNING TERRAFORM INIT")
             self._init()
+            self.stage_cache.mark_staged(self.stage_directory)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for tmp_directory in self._tmp_directories:
+            tmp_directory.cleanup()
+
+
+class PartitionedGitTFStage:
+    """
+    Stages every partition (usually one databricks object type) in its own terraform directory with its own state
+    and runs their plans and applies concurrently. With a backend file every partition uses a terraform workspace
+    named after the partition, otherwise the state lives in <artifact_dir>/<partition>/terraform.tfstate.
+    """
+    SUMMARY_PATTERN = re.compile(r"^(Plan: .*|No changes\..*|Apply complete!.*|Error: .*)$", re.MULTILINE)
+
+    def __init__(self, git_url, partitions: Dict[Text, List[Text]], cur_ref, artifact_dir, backend_file=None,
+                 **stage_kwargs):
+        self.partitions = {}
+        for name, directories in partitions.items():
+            partition_artifact_dir = os.path.join(artifact_dir, name)
+            os.makedirs(partition_artifact_dir, exist_ok=True)
+            self.partitions[name] = GitTFStage_V2(git_url, directories, cur_ref, partition_artifact_dir,
+                                                  backend_file=backend_file,
+                                                  workspace=name if backend_file is not None else None,
+                                                  name=name,
+                                                  **stage_kwargs)
+        self.failed: List[Text] = []
+        self._exit_stack = ExitStack()
+
+    def _run(self, step, run=None):
+        results = {}
+        run = run if run is not None else (lambda tf: tf.run_step(step))
+        with ThreadPoolExecutor(max_workers=max(len(self.partitions), 1)) as executor:
+            futures = {name: executor.submit(run, tf) for name, tf in self.partitions.items()}
+            for name, future in futures.items():
+                results[name] = future.result()
+
+        log.info(f"===TERRAFORM {step.upper()} REPORT===")
+        for name, (return_code, stdout, stderr) in results.items():
+            summary = "; ".join(self.SUMMARY_PATTERN.findall(f"{stdout}\n{stderr}"))
+            status = "succeeded" if return_code == 0 else f"failed with exit code {return_code}"
+            log.info(f"{name}: {step} {status}. {summary}")
+        self.failed = [name for name, (return_code, _, _) in results.items() if return_code != 0]
+        return max([return_code for return_code, _, _ in results.values()], default=0)
+
+    def plan(self):
+        return self._run("plan")
+
+    def apply(self, custom_plan_path=None):
+        if custom_plan_path is not None:
+            raise ValueError("A custom plan path cannot be applied to partitioned stages.")
+        return self._run("apply")
+
+    def apply_batched(self, batch_size):
+        return self._run("apply", lambda tf: tf.run_batched_apply(batch_size))
+
+    def __enter__(self):
+        for tf in self.partitions.values():
+            self._exit_stack.enter_context(tf)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.tf_stage_directory.cleanup()
-        self.local_repo_directory.cleanup()
+        self._exit_stack.close()
@@ -0,0 +1,52 @@
+import json
+import os
+import threading
+import time
+
+from databricks_terraformer.utils.metrics import Metrics
+
+
+class TraceRecorder:
+    """
+    Records every timed span of the metrics (listing, content fetch, rendering, validation, writes, git, terraform,
+    api calls) with its thread and resource and writes them in the Chrome trace event format, which opens in
+    chrome://tracing, Perfetto and speedscope.
+    """
+
+    def __init__(self, path, metrics: Metrics):
+        self.path = path
+        self.metrics = metrics
+        self.events = []
+        self.thread_names = {}
+        self._pid = os.getpid()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def on_span(self, phase, start, seconds, resource):
+        thread = threading.current_thread()
+        event = {
+            "name": phase if resource is None else f"{phase} {resource}",
+            "cat": phase,
+            "ph": "X",
+            "ts": round((start - self._start) * 1e6, 3),
+            "dur": round(seconds * 1e6, 3),
+            "pid": self._pid,
+            "tid": thread.ident,
+            "args": {"phase": phase, "resource": resource, "thread": thread.name},
+        }
+        with self._lock:
+            self.events.append(event)
+            self.thread_names[thread.ident] = thread.name
+
+    def start(self):
+        self.metrics.span_listeners.append(self.on_span)
+
+    def stop(self):
+        self.metrics.span_listeners.remove(self.on_span)
+        with self._lock:
+            metadata = [{"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+                        for tid, name in self.thread_names.items()]
+            events = metadata + sorted(self.events, key=lambda e: e["ts"])
+        with open(self.path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            f.write("\n")
@@ -0,0 +1,155 @@
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from databricks_cli.configure.config import debug_option
+from databricks_cli.utils import eat_exceptions
+
+from databricks_terraformer import CONTEXT_SETTINGS, log
+from databricks_terraformer.cluster_policies.cli import export_cluster_policies
+from databricks_terraformer.config import git_url_option, ssh_key_option, delete_option, dry_run_option, tag_option, \
+    workers_option, get_api_client, lfs_threshold_option, content_addressed_option
+from databricks_terraformer.dbfs.cli import export_dbfs
+from databricks_terraformer.instance_pools.cli import export_instance_pools
+from databricks_terraformer.instance_profiles.cli import export_instance_profiles
+from databricks_terraformer.jobs.cli import export_jobs
+from databricks_terraformer.notebooks.cli import export_notebooks
+from databricks_terraformer.secret_acls.cli import export_secret_acls
+from databricks_terraformer.secret_scopes.cli import export_secret_scopes
+from databricks_terraformer.secrets.cli import export_secrets
+from databricks_terraformer.utils.api_client import RateLimiter, get_api_stats
+from databricks_terraformer.utils.git_handler import SharedGitExportHandler
+from databricks_terraformer.utils.metrics import get_metrics, use_metrics
+from databricks_terraformer.utils.patterns import provide_pattern_func
+from databricks_terraformer.version import print_version_callback, version
+
+# resource type directory -> export function, notebooks and dbfs are only exported when their path is given
+RESOURCE_EXPORTERS = OrderedDict([
+    ("cluster_policies", export_cluster_policies),
+    ("dbfs", export_dbfs),
+    ("instance_pools", export_instance_pools),
+    ("instance_profiles", export_instance_profiles),
+    ("jobs", export_jobs),
+    ("notebooks", export_notebooks),
+    ("secret_acls", export_secret_acls),
+    ("secret_scopes", export_secret_scopes),
+    ("secrets", export_secrets),
+])
+
+
+def read_profiles_file(path):
+    """
+    One profile per line, blank lines and lines starting with # are ignored.
+    """
+    with open(path, "r") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+
+def get_resources(resources, notebook_path, dbfs_path):
+    if len(resources) == 0:
+        resources = [resource for resource in RESOURCE_EXPORTERS if resource not in ["notebooks", "dbfs"]]
+        resources += ["notebooks"] if notebook_path is not None else []
+        resources += ["dbfs"] if dbfs_path is not None else []
+    if "notebooks" in resources and notebook_path is None:
+        raise ValueError("Exporting notebooks requires --notebook-path")
+    if "dbfs" in resources and dbfs_path is None:
+        raise ValueError("Exporting dbfs requires --dbfs-path")
+    return sorted(resources)
+
+
+def export_workspace(gh: SharedGitExportHandler, profile, resources, delete, pattern_matches, workers,
+                     notebook_path, dbfs_path, **api_client_kwargs):
+    """
+    Exports the resources of the workspace of the profile into <profile>/<resource type> of the shared repository.
+    """
+    api_client = get_api_client(profile, f"workspaces-export-{uuid.uuid1()}", **api_client_kwargs)
+    exported = {}
+    for resource in resources:
+        kwargs = {"notebook_path": notebook_path} if resource == "notebooks" else \
+            {"dbfs_path": dbfs_path} if resource == "dbfs" else {}
+        handler = gh.get_handler(f"{profile}/{resource}", delete_not_found=delete)
+        log.info(f"Exporting {resource} of {profile}")
+        exported[resource] = RESOURCE_EXPORTERS[resource](handler, api_client, pattern_matches, workers, **kwargs)
+    return exported
+
+
+@click.command(context_settings=CONTEXT_SETTINGS, help="Export several workspaces into one repository.")
+@click.option("--hcl", is_flag=True, help='Will export the data as HCL.')
+@click.option("--profile", "profiles", multiple=True,
+              help="CLI connection profile of a workspace to export, may be repeated. The resources of every "
+                   "workspace are exported to <profile>/<resource type>.")
+@click.option("--profiles-file", type=click.Path(exists=True, dir_okay=False), default=None,
+              help="File with a CLI connection profile per line to export.")
+@click.option("--resource", "resources", type=click.Choice(list(RESOURCE_EXPORTERS)), multiple=True,
+              help="Resource types to export, may be repeated. Defaults to all of them, notebooks and dbfs only "
+                   "when their path is given.")
+@click.option("--notebook-path", default=None)
+@click.option("--dbfs-path", default=None)
+@click.option("--concurrency", type=click.IntRange(min=1), default=4, show_default=True,
+              help="Number of workspaces exported concurrently.")
+@click.option("--max-requests-per-second", type=float, default=None,
+              help="Request rate budget shared by all workspaces, unlimited by default.")
+@provide_pattern_func("pattern_matches")
+@debug_option
+@eat_exceptions
+@git_url_option
+@ssh_key_option
+@delete_option
+@dry_run_option
+@tag_option
+@workers_option
+@lfs_threshold_option
+@content_addressed_option
+def export_cli(dry_run, tag, delete, git_ssh_url, hcl, profiles, profiles_file, resources, notebook_path, dbfs_path,
+               concurrency, max_requests_per_second, workers, lfs_threshold, content_addressed, pattern_matches):
+    profiles = list(profiles) + (read_profiles_file(profiles_file) if profiles_file is not None else [])
+    if len(profiles) == 0:
+        raise ValueError("Provide at least one workspace with --profile or --profiles-file")
+    if len(set(profiles)) != len(profiles):
+        raise ValueError(f"Duplicate profiles in {profiles}")
+    resources = get_resources(resources, notebook_path, dbfs_path)
+    if max_requests_per_second is not None and max_requests_per_second <= 0:
+        raise ValueError("--max-requests-per-second must be positive")
+
+    if hcl:
+        metrics = get_metrics()
+        rate_limiter = RateLimiter(max_requests_per_second) if max_requests_per_second is not None else None
+        api_client_kwargs = {"api_stats": get_api_stats(), "metrics": metrics, "rate_limiter": rate_limiter}
+
+        def export(profile):
+            with use_metrics(metrics):
+                return export_workspace(gh, profile, resources, delete, pattern_matches, workers, notebook_path,
+                                        dbfs_path, **api_client_kwargs)
+
+        with SharedGitExportHandler(git_ssh_url, f"workspaces {', '.join(profiles)}", dry_run=dry_run, tag=tag,
+                                    lfs_threshold=lfs_threshold, content_addressed=content_addressed) as gh:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="workspace") as executor:
+                futures = OrderedDict((profile, executor.submit(export, profile)) for profile in profiles)
+            failed = []
+            for profile, future in futures.items():
+                try:
+                    log.info(f"Exported {profile}: {future.result()}")
+                except Exception as e:
+                    log.error(f"Export of {profile} failed: {e!r}")
+                    failed.append(profile)
+            if len(failed) > 0:
+                raise ValueError(f"Export of {failed} failed, nothing was pushed")
+
+
+@click.group(context_settings=CONTEXT_SETTINGS,
+             short_help='Utility to export several workspaces.')
+@click.option('--version', '-v', is_flag=True, callback=print_version_callback,
+              expose_value=False, is_eager=True, help=version)
+@debug_option
+@eat_exceptions
+def workspaces_group():
+    """
+    Utility to export several Databricks workspaces into one repository.
+    """
+    pass
+
+
+workspaces_group.add_command(export_cli, name="export")
+
+# GIT_PYTHON_TRACE=full databricks-terraformer -v debug workspaces export --hcl --profile demo --profile demo-aws -g git@github.com:stikkireddy/export-repo.git --dry-run --delete
@@ -0,0 +1,155 @@
+"""
+End to end export throughput benchmark against the offline fake Databricks server and a local bare git remote.
+
+    python -m tests.benchmarks.export_benchmark --notebooks 1000 --latency-ms 20 --output export.json
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+import git
+
+from tests.fake_databricks import FakeDatabricksServer, FakeWorkspaceSpec
+
+PROFILE = "benchmark"
+# the ApiClient drops the port of the host, requests reach the fake server through HTTP_PROXY instead
+FAKE_HOST = "http://benchmark.databricks.invalid"
+GIT_IDENTITY = dict(GIT_AUTHOR_NAME="benchmark", GIT_AUTHOR_EMAIL="benchmark@example.com",
+                    GIT_COMMITTER_NAME="benchmark", GIT_COMMITTER_EMAIL="benchmark@example.com")
+
+# command group, extra export arguments and the number of objects the command exports for a spec
+EXPORT_COMMANDS = {
+    "notebooks": (["--notebook-path", "/benchmark"], lambda spec: spec.notebooks),
+    "dbfs": (["--dbfs-path", "/benchmark"], lambda spec: spec.dbfs_files),
+    "jobs": ([], lambda spec: spec.jobs),
+    "cluster-policies": ([], lambda spec: spec.cluster_policies),
+    "instance-pools": ([], lambda spec: spec.instance_pools),
+    "instance-profiles": ([], lambda spec: spec.instance_profiles),
+    "secret-scopes": ([], lambda spec: spec.secret_scopes),
+    "secrets": ([], lambda spec: spec.secret_scopes * spec.secrets_per_scope),
+    "secret-acls": ([], lambda spec: spec.secret_scopes * spec.acls_per_scope),
+}
+
+
+def create_bare_remote(path):
+    """
+    Creates a bare repository with an initial commit on master, the branch GitExportHandler clones.
+    """
+    remote = git.Repo.init(path, bare=True)
+    remote.git.symbolic_ref("HEAD", "refs/heads/master")
+    with tempfile.TemporaryDirectory() as seed_path:
+        seed = git.Repo.init(seed_path)
+        with open(os.path.join(seed_path, "README.md"), "w") as f:
+            f.write("# databricks-terraformer benchmark\n")
+        seed.git.add("README.md")
+        with seed.git.custom_environment(**GIT_IDENTITY):
+            seed.git.commit("-m", "Initial commit")
+        seed.git.push(path, "HEAD:refs/heads/master")
+    return path
+
+
+def write_databricks_config(path):
+    with open(path, "w") as f:
+        f.write(f"[{PROFILE}]\nhost = {FAKE_HOST}\ntoken = dapi-benchmark\n")
+    return path
+
+
+def get_benchmark_env(server: FakeDatabricksServer, config_path):
+    env = dict(os.environ)
+    for name in ["NO_PROXY", "no_proxy", "HTTPS_PROXY", "https_proxy"]:
+        env.pop(name, None)
+    env["HTTP_PROXY"] = env["http_proxy"] = server.url
+    env["DATABRICKS_CONFIG_FILE"] = config_path
+    env.update(GIT_IDENTITY)
+    return env
+
+
+def run_export(command, remote_path, server: FakeDatabricksServer, env, log_path, extra_args=None):
+    args, count = EXPORT_COMMANDS[command]
+    cmd = [sys.executable, "-m", "databricks_terraformer.cli", command, "export", "--hcl", "--profile", PROFILE,
+           "-g", remote_path] + args + (extra_args or [])
+    requests_before = sum(server.request_counts.values())
+    start = time.perf_counter()
+    with open(log_path, "ab") as log_file:
+        return_code = subprocess.call(cmd, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    wall_seconds = time.perf_counter() - start
+    objects = count(server.workspace.spec)
+    return {
+        "command": command,
+        "return_code": return_code,
+        "objects": objects,
+        "requests": sum(server.request_counts.values()) - requests_before,
+        "wall_seconds": round(wall_seconds, 4),
+        "objects_per_second": round(objects / wall_seconds, 2) if return_code == 0 and wall_seconds > 0 else None,
+    }
+
+
+def run_benchmark(spec: FakeWorkspaceSpec, commands, repeat=1, latency_seconds=0.0, throttle_rate=0.0,
+                  work_dir=None, extra_args=None):
+    """
+    Exports every command repeat times into the same remote, the first run exports into an empty directory and
+    later runs measure exports without changes.
+    """
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir, \
+            FakeDatabricksServer(spec, latency_seconds=latency_seconds, throttle_rate=throttle_rate) as server:
+        remote_path = create_bare_remote(os.path.join(tmp_dir, "remote.git"))
+        env = get_benchmark_env(server, write_databricks_config(os.path.join(tmp_dir, "databrickscfg")))
+        log_path = os.path.join(tmp_dir, "export.log")
+        runs = []
+        for run in range(1, repeat + 1):
+            for command in commands:
+                result = run_export(command, remote_path, server, env, log_path, extra_args)
+                result["run"] = run
+                runs.append(result)
+                click.echo(f"run {run} {command}: {result['objects']} objects in {result['wall_seconds']}s "
+                           f"({result['objects_per_second']} objects/s), exit code {result['return_code']}",
+                           err=True)
+        if any(result["return_code"] != 0 for result in runs):
+            with open(log_path, "r", errors="replace") as f:
+                click.echo("".join(f.readlines()[-50:]), err=True)
+        return {
+            "spec": spec.to_dict(),
+            "latency_seconds": latency_seconds,
+            "throttle_rate": throttle_rate,
+            "results": runs,
+            "total_wall_seconds": round(sum(result["wall_seconds"] for result in runs), 4),
+            "requests_by_endpoint": dict(server.request_counts),
+        }
+
+
+@click.command(help="Benchmark export commands against an offline fake Databricks workspace.")
+@click.option("--command", "commands", type=click.Choice(list(EXPORT_COMMANDS)), multiple=True,
+              default=list(EXPORT_COMMANDS), help="Export commands to run, defaults to all of them.")
+@click.option("--notebooks", type=int, default=100, show_default=True)
+@click.option("--notebook-size", type=int, default=2048, show_default=True, help="Notebook size in bytes.")
+@click.option("--dbfs-files", type=int, default=100, show_default=True)
+@click.option("--dbfs-file-size", type=int, default=4096, show_default=True, help="DBFS file size in bytes.")
+@click.option("--jobs", type=int, default=100, show_default=True)
+@click.option("--latency-ms", type=float, default=0.0, show_default=True, help="Latency added to every request.")
+@click.option("--throttle-rate", type=float, default=0.0, show_default=True,
+              help="Share of the requests answered with 429 Too Many Requests.")
+@click.option("--repeat", type=int, default=1, show_default=True,
+              help="Number of times every command runs, later runs export an unchanged workspace.")
+@click.option("--output", type=click.Path(), default=None, help="Write the JSON results to this file.")
+def main(commands, notebooks, notebook_size, dbfs_files, dbfs_file_size, jobs, latency_ms, throttle_rate, repeat,
+         output):
+    spec = FakeWorkspaceSpec(notebooks=notebooks, notebook_size=notebook_size, dbfs_files=dbfs_files,
+                             dbfs_file_size=dbfs_file_size, jobs=jobs)
+    results = run_benchmark(spec, commands, repeat=repeat, latency_seconds=latency_ms / 1000,
+                            throttle_rate=throttle_rate)
+    data = json.dumps(results, indent=2)
+    if output is not None:
+        with open(output, "w") as f:
+            f.write(data + "\n")
+    else:
+        click.echo(data)
+    if any(result["return_code"] != 0 for result in results["results"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Benchmark of GitExportHandler on large synthetic export repositories in a local bare remote.
+
+    python -m tests.benchmarks.git_benchmark --files 1000 --files 10000 --history-depth 20 --output git.json
+
+Every phase of __enter__ and __exit__ is timed separately.
+"""
+import contextlib
+import io
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from typing import List
+
+import click
+
+from databricks_terraformer import log
+from databricks_terraformer.utils.git_handler import GitExportHandler
+from tests.benchmarks.export_benchmark import GIT_IDENTITY
+
+DIRECTORY = "notebooks"
+
+
+def get_identifier(i):
+    return f"databricks_notebook-benchmark_notebook_{i}"
+
+
+def get_tf_content(i):
+    identifier = get_identifier(i)
+    return (f'resource "databricks_notebook" "{identifier}" {{\n'
+            f'  content  = filebase64("{identifier}")\n'
+            f'  path     = "/benchmark/notebook_{i}"\n'
+            f'  language = "PYTHON"\n'
+            f'  format   = "SOURCE"\n'
+            f'}}\n')
+
+
+def get_payload(i, revision, payload_size):
+    header = f"# Databricks notebook source\n# notebook {i} revision {revision}\n"
+    return header + "x" * max(0, payload_size - len(header))
+
+
+class SyntheticExportRepo:
+    """
+    An export repository of file_count resources, each a .tf file and a files/ payload, with history_depth commits.
+    Every commit after the first changes changed_fraction of the payloads.
+    """
+
+    def __init__(self, file_count, history_depth=1, changed_fraction=0.01, payload_size=1024):
+        self.file_count = file_count
+        self.history_depth = history_depth
+        self.changed_count = max(1, int(file_count * changed_fraction))
+        self.payload_size = payload_size
+        self.revisions = [0] * file_count
+
+    def _changed_indexes(self, commit):
+        start = (commit * self.changed_count) % self.file_count
+        return [(start + j) % self.file_count for j in range(self.changed_count)]
+
+    def _fast_import_stream(self, out):
+        def write_file(path, content):
+            data = content.encode("utf-8")
+            out.write(f"M 100644 inline {path}\ndata {len(data)}\n".encode("utf-8") + data + b"\n")
+
+        for commit in range(self.history_depth):
+            message = f"Updated {DIRECTORY} via databricks-terraformer.".encode("utf-8")
+            out.write(f"commit refs/heads/master\ncommitter benchmark <benchmark@example.com> "
+                      f"{1600000000 + commit} +0000\ndata {len(message)}\n".encode("utf-8") + message + b"\n")
+            indexes = range(self.file_count) if commit == 0 else self._changed_indexes(commit)
+            for i in indexes:
+                self.revisions[i] = commit
+                if commit == 0:
+                    write_file(f"{DIRECTORY}/{get_identifier(i)}.tf", get_tf_content(i))
+                write_file(f"{DIRECTORY}/files/{get_identifier(i)}", get_payload(i, commit, self.payload_size))
+            out.write(b"\n")
+
+    def create(self, remote_path):
+        subprocess.check_call(["git", "init", "--quiet", "--bare", remote_path])
+        subprocess.check_call(["git", "symbolic-ref", "HEAD", "refs/heads/master"], cwd=remote_path)
+        p = subprocess.Popen(["git", "fast-import", "--quiet"], cwd=remote_path, stdin=subprocess.PIPE)
+        self._fast_import_stream(p.stdin)
+        p.stdin.close()
+        if p.wait() != 0:
+            raise ValueError(f"git fast-import failed with exit code {p.returncode}")
+        return remote_path
+
+    def export(self, gh: GitExportHandler, export_commit):
+        # re-exports every resource, the payloads of one more commit worth of resources change
+        changed = set(self._changed_indexes(export_commit))
+        for i in range(self.file_count):
+            revision = export_commit if i in changed else self.revisions[i]
+            gh.add_file(f"{get_identifier(i)}.tf", get_tf_content(i))
+            gh.add_file(f"files/{get_identifier(i)}", get_payload(i, revision, self.payload_size))
+
+
+class TimedGitExportHandler(GitExportHandler):
+    """
+    Records the duration of every phase of the export, phases that run more than once are numbered.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = {}
+        self._phase_counts = {}
+
+    def _timed(self, phase, f, *args, **kwargs):
+        self._phase_counts[phase] = self._phase_counts.get(phase, 0) + 1
+        if phase == "stage_changes":
+            phase = f"{phase}_{self._phase_counts[phase]}"
+        start = time.perf_counter()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - start
+
+    def _get_repo(self):
+        return self._timed("clone", super()._get_repo)
+
+    def add_file(self, name, data):
+        return self._timed("add_file", super().add_file, name, data)
+
+    def _remove_unmanaged_files(self):
+        return self._timed("remove_unmanaged_files", super()._remove_unmanaged_files)
+
+    def _stage_changes(self):
+        return self._timed("stage_changes", super()._stage_changes)
+
+    def _log_diff(self):
+        return self._timed("log_diff", super()._log_diff)
+
+    def _create_or_update_change_log(self):
+        return self._timed("change_log", super()._create_or_update_change_log)
+
+    def _update_resource_index(self):
+        return self._timed("resource_index", super()._update_resource_index)
+
+    def _push(self):
+        # the commit is the push phase minus the push itself
+        start = time.perf_counter()
+        super()._push()
+        self.timings["commit"] = time.perf_counter() - start - self.timings.get("push", 0.0)
+
+    def _push_with_rebase(self):
+        return self._timed("push", super()._push_with_rebase)
+
+    def _create_tag(self):
+        return self._timed("tag", super()._create_tag)
+
+    def _push_tags(self):
+        return self._timed("push_tags", super()._push_tags)
+
+
+def run_benchmark(file_count, history_depth=1, changed_fraction=0.01, payload_size=1024, delete=True, tag=False,
+                  work_dir=None):
+    repo = SyntheticExportRepo(file_count, history_depth, changed_fraction, payload_size)
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        start = time.perf_counter()
+        remote_path = repo.create(os.path.join(tmp_dir, "remote.git"))
+        create_seconds = time.perf_counter() - start
+
+        gh = TimedGitExportHandler(remote_path, DIRECTORY, delete_not_found=delete, tag=tag)
+        start = time.perf_counter()
+        # the diff of every file is echoed to stdout, it is discarded to keep the output machine readable
+        with contextlib.redirect_stdout(io.StringIO()), gh:
+            gh.timings["enter"] = time.perf_counter() - start
+            repo.export(gh, history_depth)
+            exit_start = time.perf_counter()
+        gh.timings["exit"] = time.perf_counter() - exit_start
+        total_seconds = time.perf_counter() - start
+
+    return {
+        "files": file_count * 2,
+        "resources": file_count,
+        "history_depth": history_depth,
+        "changed_resources": repo.changed_count,
+        "payload_size": payload_size,
+        "delete": delete,
+        "tag": tag,
+        "create_remote_seconds": round(create_seconds, 4),
+        "total_seconds": round(total_seconds, 4),
+        "phases": {phase: round(seconds, 4) for phase, seconds in gh.timings.items()},
+    }
+
+
+@click.command(help="Benchmark GitExportHandler on large synthetic export repositories.")
+@click.option("--files", "file_counts", type=int, multiple=True, default=[1000], show_default=True,
+              help="Number of exported resources, every resource is a .tf file and a payload. Repeat the option to "
+                   "benchmark several sizes.")
+@click.option("--history-depth", type=int, default=10, show_default=True, help="Number of commits in the remote.")
+@click.option("--changed-fraction", type=float, default=0.01, show_default=True,
+              help="Share of the resources changed by every commit and by the benchmarked export.")
+@click.option("--payload-size", type=int, default=1024, show_default=True, help="Payload size in bytes.")
+@click.option("--no-delete", is_flag=True, help="Export without removing unmanaged files.")
+@click.option("--tag", is_flag=True, help="Also create and push a tag.")
+@click.option("--verbosity", default="WARNING", show_default=True,
+              type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR"]), help="Log level of the export.")
+@click.option("--output", type=click.Path(), default=None, help="Write the JSON results to this file.")
+def main(file_counts: List[int], history_depth, changed_fraction, payload_size, no_delete, tag, verbosity, output):
+    log.setLevel(getattr(logging, verbosity))
+    results = []
+    with _git_identity():
+        for file_count in file_counts:
+            result = run_benchmark(file_count, history_depth, changed_fraction, payload_size, not no_delete, tag)
+            click.echo(f"{file_count} resources: {result['total_seconds']}s {result['phases']}", err=True)
+            results.append(result)
+    data = json.dumps({"results": results}, indent=2)
+    if output is not None:
+        with open(output, "w") as f:
+            f.write(data + "\n")
+    else:
+        click.echo(data)
+
+
+@contextlib.contextmanager
+def _git_identity():
+    previous = {name: os.environ.get(name) for name in GIT_IDENTITY}
+    os.environ.update(GIT_IDENTITY)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = value
+
+
+if __name__ == "__main__":
+    main()
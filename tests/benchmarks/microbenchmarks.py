@@ -0,0 +1,276 @@
+"""
+Microbenchmarks of the CPU bound hot paths of an export with a regression gate against a committed baseline.
+
+    python -m tests.benchmarks.microbenchmarks run --output results.json
+    python -m tests.benchmarks.microbenchmarks record
+    python -m tests.benchmarks.microbenchmarks compare --threshold 0.2
+
+The baseline is machine dependent, record adds the benchmarks it does not have yet (or replaces all of them with
+--all) on the machine running the gate, with the json2hcl shared library built (make shared). compare does not
+fail for benchmarks without a baseline.
+"""
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+from collections import OrderedDict
+
+import click
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "microbenchmarks_baseline.json")
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name):
+    """
+    Registers a setup function which builds the inputs and returns the callable to time.
+    """
+
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+def _job_settings(i=0):
+    return {
+        "name": f"nightly ingestion job {i} for the finance and risk domain",
+        "max_concurrent_runs": 1,
+        "timeout_seconds": 3600,
+        "new_cluster": {"spark_version": "7.3.x-scala2.12", "node_type_id": "i3.xlarge", "num_workers": 8,
+                        "spark_conf": {"spark.speculation": "true"}, "enable_elastic_disk": True},
+        "autoscale": {"min_workers": 2, "max_workers": 16},
+        "notebook_task": {"notebook_path": f"/Repos/finance/ingestion/notebook_{i}",
+                          "base_parameters": {"date": "2020-10-01", "env": "prod"}},
+        "spark_env_vars": {"PYSPARK_PYTHON": "/databricks/python3/bin/python3"},
+        "email_notifications": {"on_failure": ["oncall@example.com"], "on_success": []},
+        "custom_tags": {"team": "finance", "cost_center": "1234", "owner": "data-platform"},
+    }
+
+
+def _prep_job(i=0):
+    from databricks_terraformer.utils import handle_block, handle_map, prep_json
+    block_key_map = {"new_cluster": handle_block, "notebook_task": handle_block, "spark_env_vars": handle_block,
+                     "autoscale": handle_block, "email_notifications": handle_map, "custom_tags": handle_map}
+    return prep_json(block_key_map, set(), _job_settings(i), {"max_concurrent_runs", "name"}), block_key_map
+
+
+def _notebook_resource_data():
+    identifier = "databricks_notebook__Users_someone_example_com_project_ingestion_notebook"
+    return identifier, {
+        "@expr:content": f'filebase64("{identifier}")',
+        "path": "/Users/someone@example.com/project/ingestion/notebook",
+        "overwrite": True,
+        "mkdirs": True,
+        "language": "PYTHON",
+        "format": "SOURCE",
+    }
+
+
+def _notebook_hcl(identifier):
+    return (f'resource "databricks_notebook" "{identifier}" {{\n'
+            f'  content   = filebase64("{identifier}")\n'
+            f'  path      = "/Users/someone@example.com/project/ingestion/notebook"\n'
+            f'  overwrite = true\n  mkdirs    = true\n  language  = "PYTHON"\n  format    = "SOURCE"\n}}\n')
+
+
+@benchmark("create_resource_from_dict")
+def bench_create_resource_from_dict():
+    from databricks_terraformer.hcl.json_to_hcl import create_resource_from_dict
+    job_resource_data, _ = _prep_job()
+    return lambda: create_resource_from_dict("databricks_job", "databricks_job-nightly_ingestion", job_resource_data,
+                                             False)
+
+
+@benchmark("validate_hcl")
+def bench_validate_hcl():
+    from databricks_terraformer.hcl.json_to_hcl import create_resource_from_dict, validate_hcl
+    job_resource_data, _ = _prep_job()
+    hcl = create_resource_from_dict("databricks_job", "databricks_job-nightly_ingestion", job_resource_data, False)
+    return lambda: validate_hcl(hcl)
+
+
+@benchmark("create_hcl_file")
+def bench_create_hcl_file():
+    from databricks_terraformer.hcl import create_hcl_file
+    identifier, resource_data = _notebook_resource_data()
+    hcl = _notebook_hcl(identifier)
+    return lambda: create_hcl_file(resource_data["path"], "https://example.cloud.databricks.com/api/2.0",
+                                   resource_data, hcl)
+
+
+@benchmark("normalize_identifier")
+def bench_normalize_identifier():
+    from databricks_terraformer.utils import normalize_identifier
+    identifier = "databricks_notebook-/Users/someone@example.com/project/sub dir/Ingestion notebook \U0001F680 v2"
+    return lambda: normalize_identifier(identifier)
+
+
+@benchmark("remove_emoji")
+def bench_remove_emoji():
+    from databricks_terraformer.utils import remove_emoji
+    text = "Nightly ingestion \U0001F680 for finance, risk and marketing ✅ " * 32
+    return lambda: remove_emoji(text)
+
+
+@benchmark("prep_json")
+def bench_prep_json():
+    from databricks_terraformer.utils import prep_json
+    _, block_key_map = _prep_job()
+    settings = _job_settings()
+    return lambda: prep_json(block_key_map, set(), settings, {"max_concurrent_runs", "name"})
+
+
+@benchmark("TFGitResourceFile.from_file_path")
+def bench_tf_git_resource_file():
+    from databricks_terraformer.utils import TFGitResourceFile
+    identifier, resource_data = _notebook_resource_data()
+    # an exported file: the header comment with the raw json followed by the resource
+    content = "# " + "\n# ".join(json.dumps(resource_data, indent=4).split("\n")) + "\n" + _notebook_hcl(identifier)
+    f = tempfile.NamedTemporaryFile("w", suffix=".tf", delete=False)
+    with f:
+        f.write(content)
+    return lambda: TFGitResourceFile.from_file_path(f.name)
+
+
+@benchmark("get_previous_changes")
+def bench_get_previous_changes():
+    from databricks_terraformer.utils.change_log import get_previous_changes
+    directory = tempfile.mkdtemp()
+    entries = []
+    for entry in range(200):
+        files = "\n".join(f"* databricks_notebook-notebook_{entry}_{i}.tf" for i in range(50))
+        entries.append(f"# notebooks changes v2020100{entry}\n\n## Added\n\n{files}\n")
+    with open(os.path.join(directory, "README.md"), "w") as f:
+        f.write("\n---\n".join(entries))
+    return lambda: get_previous_changes(directory)
+
+
+def run_benchmarks(names=None, repeat=5, min_seconds=0.2, allow_missing=False):
+    """
+    Times every benchmark with timeit, the fastest of repeat runs of at least min_seconds is reported per call.
+    A benchmark whose dependencies are not available (i.e. the json2hcl shared library) fails the run, unless
+    allow_missing is set in which case it is recorded as skipped.
+    """
+    results = OrderedDict()
+    for name, setup in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        try:
+            function = setup()
+        except (ImportError, OSError) as e:
+            if not allow_missing:
+                raise click.ClickException(f"Unable to run the benchmark {name}: {e}")
+            results[name] = {"skipped": str(e)}
+            click.echo(f"{name}: skipped, {e}", err=True)
+            continue
+        timer = timeit.Timer(function)
+        number, _ = timer.autorange()
+        number = max(1, int(number * min_seconds / 0.2))
+        seconds_per_call = min(timer.repeat(repeat=repeat, number=number)) / number
+        results[name] = {"seconds_per_call": seconds_per_call, "calls_per_second": round(1 / seconds_per_call, 1),
+                         "number": number}
+        click.echo(f"{name}: {seconds_per_call * 1e6:.2f}us per call", err=True)
+    return {"python": platform.python_version(), "platform": platform.platform(), "benchmarks": results}
+
+
+def compare(baseline, results, threshold):
+    """
+    :return: the names of the benchmarks which are more than threshold (a fraction) slower than the baseline, or
+        which the baseline has but the results are missing or skipped. Benchmarks without a baseline are reported
+        and left out until they are recorded.
+    """
+    regressions = []
+    for name in baseline["benchmarks"]:
+        if name not in results["benchmarks"]:
+            regressions.append(name)
+            click.echo(f"{name:40} missing from the results", err=True)
+    for name, result in results["benchmarks"].items():
+        base = baseline["benchmarks"].get(name, {})
+        if "seconds_per_call" not in base:
+            click.echo(f"{name:40} not compared, no baseline yet, add it with record", err=True)
+            continue
+        if "seconds_per_call" not in result:
+            regressions.append(name)
+            click.echo(f"{name:40} not compared, skipped in the results", err=True)
+            continue
+        ratio = result["seconds_per_call"] / base["seconds_per_call"]
+        regressed = ratio > 1 + threshold
+        if regressed:
+            regressions.append(name)
+        click.echo(f"{name:40} {base['seconds_per_call'] * 1e6:10.2f}us -> {result['seconds_per_call'] * 1e6:10.2f}us "
+                   f"{ratio:6.2f}x{'  REGRESSION' if regressed else ''}", err=True)
+    return regressions
+
+
+@click.group(help="Microbenchmarks of the export hot paths.")
+def cli():
+    pass
+
+
+@cli.command(help="Run the microbenchmarks.")
+@click.option("--benchmark", "names", type=click.Choice(list(BENCHMARKS)), multiple=True,
+              help="Benchmarks to run, defaults to all of them.")
+@click.option("--output", type=click.Path(), default=None, help="Write the JSON results to this file.")
+@click.option("--allow-missing", is_flag=True,
+              help="Record benchmarks whose dependencies are missing as skipped instead of failing.")
+def run(names, output, allow_missing):
+    data = json.dumps(run_benchmarks(names, allow_missing=allow_missing), indent=2)
+    if output is not None:
+        with open(output, "w") as f:
+            f.write(data + "\n")
+    else:
+        click.echo(data)
+
+
+@cli.command(help="Add the benchmarks the baseline does not have yet to the baseline.")
+@click.option("--baseline", type=click.Path(), default=BASELINE_PATH, show_default=True)
+@click.option("--benchmark", "names", type=click.Choice(list(BENCHMARKS)), multiple=True,
+              help="Benchmarks to record even when the baseline has them.")
+@click.option("--all", "record_all", is_flag=True, help="Record every benchmark, replacing the whole baseline.")
+def record(baseline, names, record_all):
+    baseline_data = {"benchmarks": {}}
+    if os.path.exists(baseline) and not record_all:
+        with open(baseline, "r") as f:
+            baseline_data = json.load(f)
+    recorded = {name: result for name, result in baseline_data["benchmarks"].items()
+                if "seconds_per_call" in result and name not in names}
+    missing = [name for name in BENCHMARKS if name not in recorded]
+    if len(missing) == 0:
+        click.echo("Every benchmark has a baseline", err=True)
+        return
+    results = run_benchmarks(missing)
+    # the baseline keeps the order of the benchmarks
+    benchmarks = OrderedDict((name, recorded.get(name, results["benchmarks"].get(name))) for name in BENCHMARKS)
+    data = {"python": results["python"], "platform": results["platform"], "benchmarks": benchmarks}
+    with open(baseline, "w") as f:
+        f.write(json.dumps(data, indent=2) + "\n")
+    click.echo(f"Recorded {missing} in {baseline}", err=True)
+
+
+@cli.command(name="compare", help="Fail when a benchmark is slower than the baseline by more than the threshold.")
+@click.option("--baseline", type=click.Path(exists=True), default=BASELINE_PATH, show_default=True)
+@click.option("--results", type=click.Path(exists=True), default=None,
+              help="Results of a previous run, the benchmarks are run when omitted.")
+@click.option("--threshold", type=float, default=0.2, show_default=True,
+              help="Allowed slowdown as a fraction of the baseline.")
+def compare_cli(baseline, results, threshold):
+    with open(baseline, "r") as f:
+        baseline_data = json.load(f)
+    if results is not None:
+        with open(results, "r") as f:
+            results_data = json.load(f)
+    else:
+        results_data = run_benchmarks()
+    regressions = compare(baseline_data, results_data, threshold)
+    if len(regressions) > 0:
+        click.echo(f"{len(regressions)} benchmarks regressed by more than {threshold:.0%} or were not compared: "
+                   f"{regressions}", err=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,300 @@
+"""
+An in-process fake of the Databricks REST endpoints used by the exporters, for offline benchmarks.
+
+The databricks_cli ApiClient drops the port of the configured host, so clients reach the fake through it acting as
+an http proxy: configure the host as http://<any name> and set HTTP_PROXY to FakeDatabricksServer.url.
+"""
+import io
+import json
+import posixpath
+import random
+import threading
+import time
+import zipfile
+from base64 import b64encode
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+class FakeWorkspaceSpec:
+    """
+    Sizes of the synthetic workspace, every object is generated deterministically from its index.
+    """
+
+    def __init__(self, notebooks=100, notebook_size=2048, notebooks_per_directory=50, dbfs_files=100,
+                 dbfs_file_size=4096, jobs=100, cluster_policies=10, instance_pools=10, instance_profiles=10,
+                 secret_scopes=5, secrets_per_scope=10, acls_per_scope=3, max_archive_notebooks=None):
+        self.notebooks = notebooks
+        self.notebook_size = notebook_size
+        self.notebooks_per_directory = notebooks_per_directory
+        self.dbfs_files = dbfs_files
+        self.dbfs_file_size = dbfs_file_size
+        self.jobs = jobs
+        self.cluster_policies = cluster_policies
+        self.instance_pools = instance_pools
+        self.instance_profiles = instance_profiles
+        self.secret_scopes = secret_scopes
+        self.secrets_per_scope = secrets_per_scope
+        self.acls_per_scope = acls_per_scope
+        # DBC exports of folders with more notebooks are refused like too large exports
+        self.max_archive_notebooks = max_archive_notebooks
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+def _text(header, size):
+    line = "print('databricks-terraformer benchmark payload')\n"
+    body = line * max(0, (size - len(header)) // len(line) + 1)
+    return (header + body)[:max(size, len(header))]
+
+
+class FakeWorkspace:
+
+    def __init__(self, spec: FakeWorkspaceSpec):
+        self.spec = spec
+        self.workspace_objects = {"/": []}
+        self.dbfs_objects = {"/": []}
+        for i in range(spec.notebooks):
+            self._add(self.workspace_objects, f"/benchmark/dir_{i // spec.notebooks_per_directory}",
+                      {"object_type": "NOTEBOOK", "path": f"/benchmark/dir_{i // spec.notebooks_per_directory}/"
+                                                          f"notebook_{i}", "language": "PYTHON"},
+                      lambda path: {"object_type": "DIRECTORY", "path": path})
+        for i in range(spec.dbfs_files):
+            self._add(self.dbfs_objects, "/benchmark",
+                      {"path": f"/benchmark/file_{i}.py", "is_dir": False, "file_size": spec.dbfs_file_size},
+                      lambda path: {"path": path, "is_dir": True, "file_size": 0})
+
+    @staticmethod
+    def _add(tree, parent, obj, make_directory):
+        # creates the missing parent directories and appends the object to its parent listing
+        path = ""
+        for part in parent.strip("/").split("/"):
+            parent_path = path or "/"
+            path = f"{path}/{part}"
+            if path not in tree:
+                tree[path] = []
+                tree[parent_path].append(make_directory(path))
+        tree[parent].append(obj)
+
+    def notebook_content(self, path):
+        return _text(f"# Databricks notebook source\n# {path}\n", self.spec.notebook_size).encode("utf-8")
+
+    def notebooks_below(self, path):
+        notebooks = []
+        for obj in self.workspace_objects.get(path, []):
+            if obj["object_type"] == "DIRECTORY":
+                notebooks += self.notebooks_below(obj["path"])
+            else:
+                notebooks.append(obj["path"])
+        return notebooks
+
+    def archive(self, path):
+        # the source export of a notebook is its header followed by a single command
+        parent = posixpath.dirname(path.rstrip("/"))
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, "w") as zf:
+            for notebook_path in self.notebooks_below(path):
+                command = self.notebook_content(notebook_path).decode("utf-8").split("\n", 1)[1]
+                notebook = {"version": "NotebookV1", "name": posixpath.basename(notebook_path), "language": "python",
+                            "commands": [{"version": "CommandV1", "position": 1.0, "command": command}]}
+                zf.writestr(posixpath.relpath(notebook_path, parent) + ".python", json.dumps(notebook))
+        return data.getvalue()
+
+    def dbfs_content(self, path):
+        return _text(f"# {path}\n", self.spec.dbfs_file_size).encode("utf-8")
+
+    def jobs(self):
+        return [{"job_id": i, "created_time": 1600000000000, "creator_user_name": "benchmark@example.com",
+                 "settings": {"name": f"benchmark job {i}", "max_concurrent_runs": 1,
+                              "new_cluster": {"spark_version": "7.3.x-scala2.12", "node_type_id": "i3.xlarge",
+                                              "num_workers": 2},
+                              "notebook_task": {"notebook_path": f"/benchmark/dir_0/notebook_{i}"},
+                              "email_notifications": {}}}
+                for i in range(self.spec.jobs)]
+
+    def cluster_policies(self):
+        return [{"policy_id": f"policy{i:012d}", "name": f"benchmark policy {i}",
+                 "definition": json.dumps({"spark_version": {"type": "fixed", "value": "7.3.x-scala2.12"}})}
+                for i in range(self.spec.cluster_policies)]
+
+    def instance_pools(self):
+        return [{"instance_pool_id": f"pool-{i}", "instance_pool_name": f"benchmark pool {i}",
+                 "min_idle_instances": 0, "node_type_id": "i3.xlarge", "idle_instance_autotermination_minutes": 10,
+                 "enable_elastic_disk": False, "state": "ACTIVE", "stats": {}, "status": {},
+                 "default_tags": {"Vendor": "Databricks"}}
+                for i in range(self.spec.instance_pools)]
+
+    def instance_profiles(self):
+        return [{"instance_profile_arn": f"arn:aws:iam::123456789012:instance-profile/benchmark-{i}"}
+                for i in range(self.spec.instance_profiles)]
+
+    def secret_scopes(self):
+        return [{"name": f"benchmark-scope-{i}", "backend_type": "DATABRICKS", "is_databricks_managed": False}
+                for i in range(self.spec.secret_scopes)]
+
+    def secrets(self, scope):
+        return [{"key": f"{scope}-secret-{i}", "last_updated_timestamp": 1600000000000}
+                for i in range(self.spec.secrets_per_scope)]
+
+    def secret_acls(self, scope):
+        return [{"principal": f"{scope}-principal-{i}", "permission": "READ"}
+                for i in range(self.spec.acls_per_scope)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, with Nagle every keep-alive response waits for a delayed ack
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def log_message(self, format, *args):  # NOQA
+        pass
+
+    def do_GET(self):  # NOQA
+        self._handle()
+
+    def do_POST(self):  # NOQA
+        self._handle()
+
+    def _handle(self):
+        # proxied requests carry the absolute url, direct requests only the path
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length", 0))
+        if length > 0:
+            params.update(json.loads(self.rfile.read(length) or b"{}"))
+        fake = self.server.fake
+        fake.record(url.path)
+        if fake.latency_seconds > 0:
+            time.sleep(fake.latency_seconds)
+        if fake.should_throttle():
+            return self._reply(429, {"error_code": "REQUEST_LIMIT_EXCEEDED", "message": "Too Many Requests"})
+        handler = fake.routes.get(url.path)
+        if handler is None:
+            return self._reply(404, {"error_code": "ENDPOINT_NOT_FOUND", "message": f"No API found for {url.path}"})
+        try:
+            status, body = handler(params)
+        except KeyError as e:
+            status, body = 400, {"error_code": "INVALID_PARAMETER_VALUE", "message": f"Missing {e}"}
+        self._reply(status, body)
+
+    def _reply(self, status, body):
+        # raw bytes are sent like direct downloads
+        raw = isinstance(body, bytes)
+        data = body if raw else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream" if raw else "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeDatabricksServer"
+
+
+class FakeDatabricksServer:
+    """
+    Serves a FakeWorkspace on 127.0.0.1. latency_seconds delays every request and throttle_rate answers that share
+    of the requests with 429 Too Many Requests. Use it as a context manager to start and stop the server.
+    """
+    API = "/api/2.0"
+
+    def __init__(self, spec: FakeWorkspaceSpec = None, latency_seconds=0.0, throttle_rate=0.0, seed=0, port=0):
+        self.workspace = FakeWorkspace(spec if spec is not None else FakeWorkspaceSpec())
+        self.latency_seconds = latency_seconds
+        self.throttle_rate = throttle_rate
+        self.port = port
+        self.request_counts = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        w = self.workspace
+        self.routes = {
+            f"{self.API}/workspace/list": lambda p: self._list(w.workspace_objects, p["path"], "objects"),
+            f"{self.API}/workspace/export": self._workspace_export,
+            f"{self.API}/dbfs/list": lambda p: self._list(w.dbfs_objects, p["path"], "files"),
+            f"{self.API}/dbfs/get-status": lambda p: (200, {
+                "path": self._dbfs_path(p), "is_dir": self._dbfs_path(p) in w.dbfs_objects,
+                "file_size": w.spec.dbfs_file_size}),
+            f"{self.API}/dbfs/read": self._dbfs_read,
+            f"{self.API}/jobs/list": lambda p: self._page(w.jobs(), "jobs", p),
+            f"{self.API}/policies/clusters/list": lambda p: (200, {"policies": w.cluster_policies()}),
+            f"{self.API}/instance-pools/list": lambda p: (200, {"instance_pools": w.instance_pools()}),
+            f"{self.API}/instance-profiles/list": lambda p: (200, {"instance_profiles": w.instance_profiles()}),
+            f"{self.API}/secrets/scopes/list": lambda p: (200, {"scopes": w.secret_scopes()}),
+            f"{self.API}/secrets/list": lambda p: (200, {"secrets": w.secrets(p["scope"])}),
+            f"{self.API}/secrets/acls/list": lambda p: (200, {"items": w.secret_acls(p["scope"])}),
+        }
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def record(self, path):
+        with self._lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+    def should_throttle(self):
+        with self._lock:
+            return self.throttle_rate > 0 and self._random.random() < self.throttle_rate
+
+    @staticmethod
+    def _list(tree, path, key):
+        if path not in tree:
+            return 404, {"error_code": "RESOURCE_DOES_NOT_EXIST", "message": f"Path ({path}) doesn't exist."}
+        return 200, {key: tree[path]} if len(tree[path]) > 0 else {}
+
+    @staticmethod
+    def _page(items, key, params):
+        # without a limit everything is returned in one response like the 2.0 api
+        if "limit" not in params:
+            return 200, {key: items}
+        offset, limit = int(params.get("offset", 0)), int(params["limit"])
+        return 200, {key: items[offset:offset + limit], "has_more": offset + limit < len(items)}
+
+    def _workspace_export(self, params):
+        w = self.workspace
+        if params.get("format") != "DBC":
+            if params.get("direct_download") == "true":
+                return 200, w.notebook_content(params["path"])
+            return 200, {"content": b64encode(w.notebook_content(params["path"])).decode("utf-8")}
+        if params["path"] not in w.workspace_objects:
+            return 400, {"error_code": "INVALID_PARAMETER_VALUE", "message": "Only folders are archived"}
+        limit = w.spec.max_archive_notebooks
+        if limit is not None and len(w.notebooks_below(params["path"])) > limit:
+            return 400, {"error_code": "MAX_NOTEBOOK_SIZE_EXCEEDED", "message": "Export is too large"}
+        return 200, {"content": b64encode(w.archive(params["path"])).decode("utf-8")}
+
+    @staticmethod
+    def _dbfs_path(params):
+        path = params["path"]
+        return path[len("dbfs:"):] if path.startswith("dbfs:") else path
+
+    def _dbfs_read(self, params):
+        content = self.workspace.dbfs_content(self._dbfs_path(params))
+        offset, length = int(params.get("offset", 0)), int(params.get("length", 1024 * 1024))
+        data = content[offset:offset + length]
+        return 200, {"bytes_read": len(data), "data": b64encode(data).decode("utf-8")}
+
+    def start(self):
+        self._server = _Server(("127.0.0.1", self.port), _Handler)
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,27 @@
+import pytest
+from databricks_cli.sdk import ApiClient, WorkspaceService
+
+from tests.benchmarks.export_benchmark import FAKE_HOST
+from tests.fake_databricks import FakeDatabricksServer, FakeWorkspaceSpec
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """
+    Starts a FakeDatabricksServer for a spec and returns it with a WorkspaceService calling it.
+    """
+    servers = []
+
+    def start(spec: FakeWorkspaceSpec):
+        # the ApiClient drops the port of the host, requests reach the fake server through HTTP_PROXY
+        server = FakeDatabricksServer(spec).start()
+        servers.append(server)
+        for name in ["NO_PROXY", "no_proxy", "HTTPS_PROXY", "https_proxy"]:
+            monkeypatch.delenv(name, raising=False)
+        monkeypatch.setenv("HTTP_PROXY", server.url)
+        monkeypatch.setenv("http_proxy", server.url)
+        return server, WorkspaceService(ApiClient(host=FAKE_HOST, token="dapi-test"))
+
+    yield start
+    for server in servers:
+        server.stop()
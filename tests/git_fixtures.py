@@ -0,0 +1,45 @@
+import os
+import tempfile
+from typing import Dict, Text, Iterable
+
+import git
+import pytest
+
+from tests.benchmarks.export_benchmark import create_bare_remote, GIT_IDENTITY
+
+
+@pytest.fixture
+def git_identity(monkeypatch):
+    for name, value in GIT_IDENTITY.items():
+        monkeypatch.setenv(name, value)
+
+
+@pytest.fixture
+def remote(tmp_path, git_identity):
+    return create_bare_remote(str(tmp_path / "remote.git"))
+
+
+def push_files(remote_path, files: Dict[Text, Text], deleted: Iterable[Text] = (), message="Update",
+               branch="master") -> Text:
+    """
+    Commits the files (path -> content) and deletions on top of the branch of the remote, or of master when the
+    branch does not exist yet, and pushes them.
+
+    :return: the sha of the pushed commit
+    """
+    with tempfile.TemporaryDirectory() as clone_path:
+        repo = git.Repo.clone_from(remote_path, clone_path, branch="master")
+        if branch != "master":
+            exists = f"origin/{branch}" in [ref.name for ref in repo.remotes.origin.refs]
+            repo.git.checkout("-B", branch, f"origin/{branch}" if exists else "origin/master")
+        for path, content in files.items():
+            abs_path = os.path.join(clone_path, path)
+            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+            with open(abs_path, "w") as f:
+                f.write(content)
+        repo.git.add(A=True)
+        for path in deleted:
+            repo.git.rm(path)
+        repo.index.commit(message)
+        repo.git.push("origin", f"HEAD:refs/heads/{branch}")
+        return repo.head.commit.hexsha
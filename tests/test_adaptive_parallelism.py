@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+from databricks_terraformer.utils.terraform import AdaptiveParallelism, GitTFStage_V2, TerraformOutputMonitor
+
+HOST = "https://example.cloud.databricks.com"
+
+
+def get_stage(tmp_path, parallelism, throttled_lines):
+    stage = GitTFStage_V2("git@example.com:repo.git", [], "master", str(tmp_path), parallelism=parallelism)
+    monitor = TerraformOutputMonitor()
+    for line in throttled_lines:
+        monitor.on_line(line)
+    stage._terraform = SimpleNamespace(last_monitor=monitor)
+    return stage
+
+
+def test_unthrottled_host_probes_a_higher_parallelism(tmp_path):
+    store = str(tmp_path / "parallelism.json")
+    AdaptiveParallelism(HOST, store).save()
+
+    assert AdaptiveParallelism(HOST, store).value > AdaptiveParallelism.DEFAULT
+
+
+def test_throttled_successful_run_lowers_the_parallelism(tmp_path):
+    store = str(tmp_path / "parallelism.json")
+    parallelism = AdaptiveParallelism(HOST, store)
+    stage = get_stage(tmp_path, parallelism, ["Error: status 429 Too Many Requests"])
+
+    # a successful run is not retried but its throttling is recorded
+    assert stage._should_retry(0, parallelism.value) is False
+    assert parallelism.throttled is True
+    assert parallelism.value == AdaptiveParallelism.DEFAULT // 2
+    parallelism.save()
+    assert AdaptiveParallelism(HOST, store).value == AdaptiveParallelism.DEFAULT // 2
+
+
+def test_throttled_failed_run_is_retried(tmp_path):
+    parallelism = AdaptiveParallelism(HOST, str(tmp_path / "parallelism.json"))
+    stage = get_stage(tmp_path, parallelism, ["Error: REQUEST_LIMIT_EXCEEDED"])
+
+    assert stage._should_retry(1, parallelism.value) is True
+
+
+def test_failed_run_without_throttling_is_not_retried(tmp_path):
+    parallelism = AdaptiveParallelism(HOST, str(tmp_path / "parallelism.json"))
+    stage = get_stage(tmp_path, parallelism, ["Error: invalid configuration"])
+
+    assert stage._should_retry(1, parallelism.value) is False
+    assert parallelism.throttled is False
@@ -0,0 +1,34 @@
+import os
+
+from databricks_terraformer.apply.cli import _get_cache_kwargs
+from databricks_terraformer.utils.stage_cache import StageCache
+from databricks_terraformer.utils.terraform import PartitionedGitTFStage
+from tests.git_fixtures import push_files, remote, git_identity  # NOQA
+
+
+def test_no_stage_cache_only_creates_the_plugin_cache(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    kwargs = _get_cache_kwargs(cache_dir, no_stage_cache=True)
+
+    assert kwargs["stage_cache"] is None
+    assert kwargs["plugin_cache_dir"] == os.path.join(cache_dir, "plugins")
+    assert os.listdir(cache_dir) == ["plugins"]
+
+
+def test_stage_cache_is_created_when_enabled(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    kwargs = _get_cache_kwargs(cache_dir, no_stage_cache=False)
+
+    assert kwargs["stage_cache"].cache_dir == cache_dir
+    assert sorted(os.listdir(cache_dir)) == ["plugins", "repos", "stages"]
+
+
+def test_partitions_without_backend_get_their_own_stage(remote, tmp_path):
+    push_files(remote, {"dbfs/databricks_dbfs_file_a.tf": ""})
+    stage_cache = StageCache(str(tmp_path / "cache"))
+    tf = PartitionedGitTFStage(remote, {"dbfs": [], "notebooks": []}, "master", str(tmp_path / "artifacts"),
+                               init=False, stage_cache=stage_cache)
+
+    with tf:
+        stage_directories = {stage.stage_directory for stage in tf.partitions.values()}
+    assert len(stage_directories) == 2
@@ -0,0 +1,55 @@
+from databricks_terraformer.utils.apply_journal import ApplyJournal
+from databricks_terraformer.utils.terraform import GitTFStage_V2
+from tests.git_fixtures import push_files, remote, git_identity  # NOQA
+
+
+def job(name):
+    return f'resource "databricks_job" "{name}" {{\n}}\n'
+
+
+def run_batched_apply(remote_path, artifact_dir, batch_size, fail_batch=None):
+    """
+    :return: the return code and the targets of every planned and applied batch
+    """
+    applied = []
+
+    def apply_batch(targets):
+        applied.append(targets[1::2])
+        return (1, "", "Error: failed") if targets[1::2] == fail_batch else (0, "", "")
+
+    with GitTFStage_V2(remote_path, ["jobs"], "master", artifact_dir, init=False) as stage:
+        stage._apply_batch = apply_batch
+        return stage.run_batched_apply(batch_size)[0], applied
+
+
+def _run_id(remote_path, artifact_dir, batch_size=2):
+    with GitTFStage_V2(remote_path, ["jobs"], "master", artifact_dir, init=False) as stage:
+        return stage._get_batch_run_id(batch_size)
+
+
+def test_resumes_at_the_failed_batch(remote, tmp_path):
+    push_files(remote, {f"jobs/databricks_job_{name}.tf": job(name) for name in "abcde"})
+    artifact_dir = str(tmp_path)
+    batches = [["databricks_job.a", "databricks_job.b"], ["databricks_job.c", "databricks_job.d"],
+               ["databricks_job.e"]]
+
+    return_code, applied = run_batched_apply(remote, artifact_dir, 2, fail_batch=batches[1])
+    assert return_code == 1
+    assert applied == batches[:2]
+    assert ApplyJournal.load(artifact_dir, _run_id(remote, artifact_dir)).completed == [0]
+
+    # the completed batch is skipped, the failed one is run again
+    return_code, applied = run_batched_apply(remote, artifact_dir, 2)
+    assert return_code == 0
+    assert applied == batches[1:]
+    assert ApplyJournal.load(artifact_dir, _run_id(remote, artifact_dir)) is None
+
+
+def test_journal_of_another_batch_size_is_ignored(remote, tmp_path):
+    push_files(remote, {f"jobs/databricks_job_{name}.tf": job(name) for name in "abc"})
+    artifact_dir = str(tmp_path)
+    run_batched_apply(remote, artifact_dir, 2, fail_batch=["databricks_job.c"])
+
+    return_code, applied = run_batched_apply(remote, artifact_dir, 1)
+    assert return_code == 0
+    assert applied == [["databricks_job.a"], ["databricks_job.b"], ["databricks_job.c"]]
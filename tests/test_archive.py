@@ -0,0 +1,81 @@
+import json
+
+import pytest
+import requests
+
+from databricks_terraformer.notebooks.archive import dbc_notebook_to_source, _unpack_archive, _is_too_large, \
+    _iter_folder, iter_archived_notebooks
+from tests.fake_databricks import FakeWorkspace, FakeWorkspaceSpec
+from tests.fake_databricks_fixtures import serve  # NOQA
+
+
+def test_dbc_notebook_to_source_orders_commands_and_comments_magic_cells():
+    notebook = {"commands": [{"position": 2.0, "command": "%md\n# Title\n\ntext"},
+                             {"position": 1.0, "command": "print(1)"},
+                             {"position": 3.5, "command": "print(3)"}]}
+
+    assert dbc_notebook_to_source(notebook, "PYTHON") == (
+        "# Databricks notebook source\n"
+        "print(1)\n\n# COMMAND ----------\n\n"
+        "# MAGIC %md\n# MAGIC # Title\n# MAGIC\n# MAGIC text\n\n# COMMAND ----------\n\n"
+        "print(3)")
+
+
+def test_dbc_notebook_to_source_uses_the_comment_of_the_language():
+    notebook = {"commands": [{"position": 1.0, "command": "%python\nprint(1)"}]}
+
+    assert dbc_notebook_to_source(notebook, "SCALA") == \
+        "// Databricks notebook source\n// MAGIC %python\n// MAGIC print(1)"
+    assert dbc_notebook_to_source(notebook, "SQL") == \
+        "-- Databricks notebook source\n-- MAGIC %python\n-- MAGIC print(1)"
+
+
+@pytest.mark.parametrize("folder, path", [("/benchmark", "/benchmark"), ("/benchmark", "/benchmark/"),
+                                          ("/benchmark/dir_1", "/benchmark/dir_1")])
+def test_unpack_archive_maps_entries_to_workspace_paths(folder, path):
+    workspace = FakeWorkspace(FakeWorkspaceSpec(notebooks=4, notebooks_per_directory=2, notebook_size=256))
+
+    notebooks = list(_unpack_archive(workspace.archive(folder), path))
+
+    assert sorted(notebook.path for notebook in notebooks) == sorted(workspace.notebooks_below(folder))
+    for notebook in notebooks:
+        assert notebook.language == "PYTHON"
+        assert notebook.content == workspace.notebook_content(notebook.path).decode("utf-8")
+
+
+def _http_error(status_code, body):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body.encode("utf-8")
+    return requests.exceptions.HTTPError(response=response)
+
+
+@pytest.mark.parametrize("status_code, body, expected", [
+    (413, "", True),
+    (400, json.dumps({"error_code": "MAX_NOTEBOOK_SIZE_EXCEEDED", "message": "Export is too large"}), True),
+    (400, json.dumps({"error_code": "BAD_REQUEST", "message": "The export is too large, export a sub folder"}), True),
+    (400, json.dumps({"error_code": "INVALID_PARAMETER_VALUE", "message": "Only folders are archived"}), False),
+    (400, "<html>Bad Request</html>", False),
+    (404, json.dumps({"error_code": "RESOURCE_DOES_NOT_EXIST", "message": "too large"}), False),
+])
+def test_is_too_large(status_code, body, expected):
+    assert _is_too_large(_http_error(status_code, body)) is expected
+
+
+def test_too_large_folders_are_split(serve):
+    spec = FakeWorkspaceSpec(notebooks=6, notebooks_per_directory=2, notebook_size=256, max_archive_notebooks=2)
+    server, service = serve(spec)
+
+    notebooks = list(iter_archived_notebooks(service, "/"))
+
+    assert sorted(notebook.path for notebook in notebooks) == sorted(server.workspace.notebooks_below("/benchmark"))
+    assert all(notebook.content is not None for notebook in notebooks)
+    # /benchmark is refused, each of its three sub folders is archived
+    assert server.request_counts["/api/2.0/workspace/export"] == 4
+
+
+def test_other_bad_requests_are_raised(serve):
+    _, service = serve(FakeWorkspaceSpec(notebooks=2, notebook_size=256))
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        list(_iter_folder(service, "/benchmark/dir_0/notebook_0"))
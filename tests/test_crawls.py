@@ -0,0 +1,46 @@
+from databricks_cli.sdk import DbfsService
+
+from databricks_terraformer.dbfs import get_dbfs_files_recursive
+from databricks_terraformer.notebooks import get_workspace_notebooks_recursive
+from databricks_terraformer.utils.metrics import Metrics, use_metrics
+from databricks_terraformer.utils.patterns import PatternMatcher
+from tests.fake_databricks import FakeWorkspaceSpec
+from tests.fake_databricks_fixtures import serve  # NOQA
+
+WORKSPACE_LIST = "/api/2.0/workspace/list"
+
+
+def test_notebooks_are_yielded_while_the_folders_are_listed(serve):
+    server, service = serve(FakeWorkspaceSpec(notebooks=12, notebooks_per_directory=4))
+
+    notebooks = get_workspace_notebooks_recursive(service, "/")
+    assert server.request_counts.get(WORKSPACE_LIST, 0) == 0
+    # /, /benchmark and its first folder are listed before the first notebook is yielded
+    assert next(notebooks).path == "/benchmark/dir_0/notebook_0"
+    assert server.request_counts[WORKSPACE_LIST] == 3
+
+    assert [notebook.path for notebook in notebooks] == server.workspace.notebooks_below("/benchmark")[1:]
+    assert server.request_counts[WORKSPACE_LIST] == 5
+
+
+def test_notebook_crawl_skips_folders_no_pattern_can_match(serve):
+    server, service = serve(FakeWorkspaceSpec(notebooks=12, notebooks_per_directory=4))
+
+    metrics = Metrics()
+    with use_metrics(metrics):
+        paths = [notebook.path for notebook in
+                 get_workspace_notebooks_recursive(service, "/", PatternMatcher(["/benchmark/dir_1/*"]))]
+
+    assert paths == server.workspace.notebooks_below("/benchmark/dir_1")
+    assert server.request_counts[WORKSPACE_LIST] == 3
+    assert (metrics.phases["list"].calls, metrics.phases["list"].objects) == (3, 4)
+
+
+def test_dbfs_files_are_yielded_while_the_directories_are_listed(serve):
+    server, service = serve(FakeWorkspaceSpec(dbfs_files=5))
+
+    files = get_dbfs_files_recursive(DbfsService(service.client), "/")
+    assert server.request_counts.get("/api/2.0/dbfs/list", 0) == 0
+
+    assert [file["path"] for file in files] == [f"/benchmark/file_{i}.py" for i in range(5)]
+    assert server.request_counts["/api/2.0/dbfs/list"] == 2
@@ -0,0 +1,25 @@
+import hashlib
+
+from databricks_cli.sdk import DbfsService
+
+from databricks_terraformer.dbfs import download_file_contents, get_file_contents
+from databricks_terraformer.utils.content_store import BY_HASH_DIRECTORY
+from databricks_terraformer.utils.git_handler import GitExportHandler
+from tests.fake_databricks import FakeWorkspaceSpec
+from tests.fake_databricks_fixtures import serve  # NOQA
+from tests.git_fixtures import remote, git_identity  # NOQA
+
+
+def test_download_is_streamed_into_a_content_addressed_file(remote, serve):
+    server, workspace_service = serve(FakeWorkspaceSpec(dbfs_files=2, dbfs_file_size=4096))
+    service = DbfsService(workspace_service.client)
+    content = server.workspace.dbfs_content("/benchmark/file_0.py")
+
+    with GitExportHandler(remote, "dbfs", dry_run=True, content_addressed=True) as gh:
+        name = gh.write_stream("files/databricks_dbfs_file-benchmark_file_0_py",
+                               lambda f: download_file_contents(service, "/benchmark/file_0.py", f))
+
+        assert name == f"files/{BY_HASH_DIRECTORY}/{hashlib.sha256(content).hexdigest()}"
+        with open(f"{gh.resource_path}/{name}", "rb") as f:
+            assert f.read() == content
+    assert get_file_contents(service, "/benchmark/file_0.py") == content.decode("utf-8")
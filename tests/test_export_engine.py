@@ -0,0 +1,83 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+import databricks_terraformer.hcl
+from databricks_terraformer.notebooks import get_content
+from databricks_terraformer.utils.content_store import BY_HASH_DIRECTORY
+from databricks_terraformer.utils.git_handler import GitExportHandler
+from tests.fake_databricks import FakeWorkspaceSpec
+from tests.fake_databricks_fixtures import serve  # NOQA
+from tests.git_fixtures import remote, git_identity  # NOQA
+
+# the engine renders hcl with the json2hcl shared library, build it with make shared
+pytestmark = pytest.mark.skipif(
+    not os.path.exists(os.path.join(os.path.dirname(databricks_terraformer.hcl.__file__), "json2hcl.so")),
+    reason="the json2hcl shared library is not built")
+
+
+def get_spec(service, before_fetch=None):
+    from databricks_terraformer.utils.export_engine import ExportSpec
+
+    def get_notebook_content(path):
+        if before_fetch is not None:
+            before_fetch(path)
+        return get_content(service, path)
+
+    return ExportSpec("databricks_notebook", lambda path: path.strip("/").replace("/", "_"),
+                      lambda path, content_name: {"path": path, "language": "PYTHON",
+                                                  "content": f'filebase64("{content_name}")'},
+                      get_name=lambda path: path, get_content=get_notebook_content)
+
+
+def export(remote_path, spec, paths, **engine_kwargs):
+    from databricks_terraformer.utils.export_engine import ExportEngine
+
+    with GitExportHandler(remote_path, "notebooks", dry_run=True) as gh:
+        exported = ExportEngine(gh, spec, **engine_kwargs).run(paths)
+        return exported, list(gh.files_created)
+
+
+def test_workers_keep_the_order_of_the_source(remote, serve):
+    server, service = serve(FakeWorkspaceSpec(notebooks=24, notebooks_per_directory=8, notebook_size=256))
+    paths = server.workspace.notebooks_below("/benchmark")
+    # later notebooks are fetched faster so workers finish their batches out of order
+    delays = {path: 0.002 * (len(paths) - i) for i, path in enumerate(paths)}
+
+    sequential = export(remote, get_spec(service), paths)
+    concurrent = export(remote, get_spec(service, lambda path: time.sleep(delays[path])), paths, workers=4,
+                        batch_size=2)
+
+    assert sequential[0] == concurrent[0] == len(paths)
+    assert sequential[1] == concurrent[1]
+    assert concurrent[1][0:2] == ["benchmark_dir_0_notebook_0.tf", "files/benchmark_dir_0_notebook_0"]
+
+
+def test_worker_exception_fails_the_export(remote, serve):
+    server, service = serve(FakeWorkspaceSpec(notebooks=24, notebooks_per_directory=8, notebook_size=256))
+    paths = server.workspace.notebooks_below("/benchmark")
+
+    def fail(path):
+        if path == paths[5]:
+            raise ValueError(f"Unable to fetch {path}")
+
+    with pytest.raises(ValueError, match=paths[5]):
+        export(remote, get_spec(service, fail), paths, workers=4, batch_size=2)
+
+
+def test_dbfs_payloads_are_streamed_to_content_addressed_files(remote, serve):
+    from databricks_terraformer.dbfs.cli import export_dbfs
+
+    server, service = serve(FakeWorkspaceSpec(dbfs_files=3, dbfs_file_size=4096))
+    with GitExportHandler(remote, "dbfs", dry_run=True, content_addressed=True) as gh:
+        assert export_dbfs(gh, service.client, None, workers=2, dbfs_path="/benchmark") == 3
+
+        payloads = [name for name in gh.files_created if name.startswith(f"files/{BY_HASH_DIRECTORY}/")]
+        assert len(payloads) == 3
+        for i, name in enumerate(payloads):
+            content = server.workspace.dbfs_content(f"/benchmark/file_{i}.py")
+            assert name == f"files/{BY_HASH_DIRECTORY}/{hashlib.sha256(content).hexdigest()}"
+            with open(os.path.join(gh.resource_path, f"databricks_dbfs_file_benchmark_file_{i}_py.tf")) as f:
+                assert name[len("files/"):] in f.read()
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import tempfile
+
+import git
+import pytest
+
+from databricks_terraformer.utils.git_handler import GitExportHandler, SharedGitExportHandler
+from databricks_terraformer.utils.resource_index import ResourceIndex
+from tests.git_fixtures import push_files, remote, git_identity  # NOQA
+
+
+def job(name):
+    return f'resource "databricks_job" "{name}" {{\n}}\n'
+
+
+def get_handler(remote_path, directory="jobs"):
+    return GitExportHandler(remote_path, directory, push_backoff_seconds=0.0)
+
+
+def read_remote(remote_path, paths):
+    with tempfile.TemporaryDirectory() as clone_path:
+        git.Repo.clone_from(remote_path, clone_path, branch="master")
+        contents = {}
+        for path in paths:
+            abs_path = os.path.join(clone_path, path)
+            if os.path.exists(abs_path):
+                with open(abs_path, "r") as f:
+                    contents[path] = f.read()
+        return contents
+
+
+def test_rebased_push_keeps_the_generated_files_of_both_exports(remote, caplog):
+    caplog.set_level(logging.INFO)
+    # both exports clone the same commit before either of them pushes
+    first, second = get_handler(remote).__enter__(), get_handler(remote).__enter__()
+    first.add_file("databricks_job_a.tf", job("a"))
+    second.add_file("databricks_job_b.tf", job("b"))
+    first.__exit__(None, None, None)
+    second.__exit__(None, None, None)
+    assert "Regenerating jobs/README.md" in caplog.text
+    assert f"Regenerating jobs/{ResourceIndex.FILE_NAME}" in caplog.text
+
+    files = read_remote(remote, ["jobs/databricks_job_a.tf", "jobs/databricks_job_b.tf", "jobs/README.md",
+                                 f"jobs/{ResourceIndex.FILE_NAME}"])
+    assert files["jobs/databricks_job_a.tf"] == job("a")
+    assert files["jobs/databricks_job_b.tf"] == job("b")
+    assert json.loads(files[f"jobs/{ResourceIndex.FILE_NAME}"])["resources"] == {
+        "databricks_job.a": "databricks_job_a.tf", "databricks_job.b": "databricks_job_b.tf"}
+    assert "databricks_job_a.tf" in files["jobs/README.md"]
+    assert "databricks_job_b.tf" in files["jobs/README.md"]
+    assert len(git.Repo(remote).git.rev_list("master").split()) == 3
+
+
+def test_conflicting_exported_files_abort_the_rebase(remote):
+    first, second = get_handler(remote).__enter__(), get_handler(remote).__enter__()
+    first.add_file("databricks_job_a.tf", job("a"))
+    second.add_file("databricks_job_a.tf", job("a") + "# changed\n")
+    first.__exit__(None, None, None)
+
+    with pytest.raises(ValueError, match="databricks_job_a.tf"):
+        second.__exit__(None, None, None)
+    assert not os.path.exists(os.path.join(second.repo.git_dir, "rebase-merge"))
+    assert read_remote(remote, ["jobs/databricks_job_a.tf"])["jobs/databricks_job_a.tf"] == job("a")
+
+
+def test_exports_of_other_directories_are_rebased_without_conflicts(remote):
+    push_files(remote, {"dbfs/databricks_dbfs_file_a.tf": ""})
+    jobs, notebooks = get_handler(remote).__enter__(), get_handler(remote, "notebooks").__enter__()
+    jobs.add_file("databricks_job_a.tf", job("a"))
+    notebooks.add_file("databricks_notebook_a.tf", 'resource "databricks_notebook" "a" {\n}\n')
+    jobs.__exit__(None, None, None)
+    notebooks.__exit__(None, None, None)
+
+    files = read_remote(remote, ["dbfs/databricks_dbfs_file_a.tf", "jobs/databricks_job_a.tf",
+                                 "notebooks/databricks_notebook_a.tf", "jobs/README.md", "notebooks/README.md"])
+    assert len(files) == 5
+
+
+def test_shared_export_logs_its_label_and_the_diff_of_every_directory(remote, caplog, capsys):
+    first = SharedGitExportHandler(remote, "workspaces dev", push_backoff_seconds=0.0).__enter__()
+    second = SharedGitExportHandler(remote, "workspaces prod", push_backoff_seconds=0.0).__enter__()
+    first.get_handler("dev/jobs").add_file("databricks_job_a.tf", job("a"))
+    for directory in ["prod/jobs", "prod/cluster_policies"]:
+        second.get_handler(directory).add_file("databricks_job_b.tf", job("b"))
+    first.__exit__(None, None, None)
+    second.__exit__(None, None, None)
+
+    assert "Push of workspaces prod was rejected" in caplog.text
+    out = capsys.readouterr().out
+    assert "A\tprod/cluster_policies/databricks_job_b.tf" in out
+    assert "A\tprod/jobs/databricks_job_b.tf" in out
+    assert second.handlers["prod/jobs"]._git_added == ["databricks_job_b.tf"]
+    assert len(read_remote(remote, ["dev/jobs/databricks_job_a.tf", "prod/jobs/databricks_job_b.tf",
+                                    "prod/cluster_policies/databricks_job_b.tf"])) == 3
@@ -0,0 +1,88 @@
+import pytest
+
+from databricks_terraformer.utils.patterns import PatternMatcher
+
+# includes, excludes, directory, whether a value below the directory can be matched
+COULD_MATCH_UNDER = [
+    ([], [], "/", True),
+    ([], [], "/Users/someone", True),
+    # ** matches like * across /
+    (["/Shared/**"], [], "/", True),
+    (["/Shared/**"], [], "/Shared", True),
+    (["/Shared/**"], [], "/Shared/team/project", True),
+    (["/Shared/**"], [], "/Users", False),
+    # a trailing / does not change the directory
+    (["/Shared/**"], [], "/Shared/", True),
+    (["/Shared/**"], [], "/Users/", False),
+    (["/Shared/*"], [], "/Shared/team/", True),
+    # prefixes which only partly match a directory name
+    (["/Shared/**"], [], "/Sha", False),
+    (["/Shared/**"], [], "/SharedData", False),
+    (["/Shared/team_a*"], [], "/Shared", True),
+    (["/Shared/team_a*"], [], "/Shared/team", False),
+    (["/Shared/team_a*"], [], "/Shared/team_ab", True),
+    (["/Users/*/notebooks/*"], [], "/Users/someone", True),
+    (["/Users/*/notebooks/*"], [], "/Repos", False),
+    (["re:^/jobs/data_?x"], [], "/jobs/data", True),
+    (["re:^/jobs/data_?x"], [], "/jobs/dat", False),
+    # alternations have no literal prefix, every directory is crawled
+    (["re:/tmp/(a|b)/.*"], [], "/other", True),
+    # excludes prune only the directories they match entirely
+    ([], ["/Shared/tmp/**"], "/Shared", True),
+    ([], ["/Shared/tmp/**"], "/Shared/tmp", False),
+    ([], ["/Shared/tmp/**"], "/Shared/tmp/", False),
+    ([], ["/Shared/tmp/**"], "/Shared/tmpfiles", True),
+    ([], ["/Shared/tmp*"], "/Shared/tmpfiles", False),
+    ([], ["re:/tmp/.*"], "/tmp", False),
+    ([], ["re:/tmp/.*"], "/tmpfiles", True),
+    ([], ["re:/tmp"], "/tmpfiles", False),
+    ([], ["*/tmp/*.py"], "/tmp", True),
+    # includes and excludes combined
+    (["/Shared/**"], ["/Shared/tmp/**"], "/", True),
+    (["/Shared/**"], ["/Shared/tmp/**"], "/Shared", True),
+    (["/Shared/**"], ["/Shared/tmp/**"], "/Shared/tmp/nested", False),
+    (["/Shared/**"], ["/Shared/tmp/**"], "/Users", False),
+    (["/Shared/tmp/keep*"], ["/Shared/*"], "/Shared/tmp", False),
+    (["/Shared/**", "/Users/someone/*"], ["/Users/someone/scratch/*"], "/Users", True),
+    (["/Shared/**", "/Users/someone/*"], ["/Users/someone/scratch/*"], "/Users/other", False),
+    (["/Shared/**", "/Users/someone/*"], ["/Users/someone/scratch/*"], "/Users/someone/scratch", False),
+]
+
+# includes, excludes, value, whether it is matched
+MATCHES = [
+    ([], [], "/anything", True),
+    (["/Shared/**"], [], "/Shared/a/b", True),
+    (["/Shared/**"], [], "/Users/a", False),
+    (["/Shared/**"], ["/Shared/tmp/**"], "/Shared/a", True),
+    (["/Shared/**"], ["/Shared/tmp/**"], "/Shared/tmp/a", False),
+    (["re:/jobs/data_?x"], [], "/jobs/datax_1", True),
+    (["re:/jobs/data_?x"], [], "/jobs/other", False),
+    ([], ["*.py"], "/Shared/a.py", False),
+    ([], ["*.py"], "/Shared/a.scala", True),
+]
+
+# values which are matched below their directories in some of the cases above
+VALUES = ["/Shared/a", "/Shared/team/project/a", "/Shared/team_ab/a", "/Shared/tmp/a", "/Shared/tmp/keep/a",
+          "/Shared/tmpfiles/a", "/SharedData/a", "/Users/someone/a", "/Users/someone/notebooks/a",
+          "/Users/someone/scratch/a", "/Users/other/a", "/jobs/datax/a", "/jobs/data_x/a", "/tmp/a/b", "/tmp/b.py",
+          "/tmpfiles/a", "/other/a"]
+
+
+@pytest.mark.parametrize("includes, excludes, directory, expected", COULD_MATCH_UNDER)
+def test_could_match_under(includes, excludes, directory, expected):
+    assert PatternMatcher(includes, excludes).could_match_under(directory) is expected
+
+
+@pytest.mark.parametrize("includes, excludes, value, expected", MATCHES)
+def test_matches(includes, excludes, value, expected):
+    assert PatternMatcher(includes, excludes)(value) is expected
+
+
+@pytest.mark.parametrize("includes, excludes", sorted({(tuple(i), tuple(e)) for i, e, _, _ in COULD_MATCH_UNDER}))
+def test_matched_values_are_never_pruned(includes, excludes):
+    matcher = PatternMatcher(list(includes), list(excludes))
+    for value in filter(matcher, VALUES):
+        parts = value.split("/")[1:-1]
+        for depth in range(len(parts) + 1):
+            directory = "/" + "/".join(parts[:depth])
+            assert matcher.could_match_under(directory), f"{value} is matched but {directory} is pruned"
@@ -0,0 +1,69 @@
+import hashlib
+
+from databricks_terraformer.utils.stage_cache import StageCache
+from databricks_terraformer.utils.terraform import GitTFStage_V2
+from tests.git_fixtures import push_files, remote, git_identity  # NOQA
+
+
+def dbfs_file(name, content_name):
+    return f'resource "databricks_dbfs_file" "{name}" {{\n  source = pathexpand("{content_name}")\n}}\n'
+
+
+def by_hash(content):
+    return f"by-hash/{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+
+
+def get_targets(remote_path, tmp_path, prev_ref="master~1", **kwargs):
+    with GitTFStage_V2(remote_path, ["dbfs"], "master", str(tmp_path / "artifacts"), prev_ref=prev_ref, init=False,
+                       **kwargs) as stage:
+        return stage._get_plan_targets()
+
+
+def test_content_addressed_payload_change_targets_its_resource(remote, tmp_path):
+    push_files(remote, {"dbfs/databricks_dbfs_file_a.tf": dbfs_file("a", by_hash("v1")),
+                        "dbfs/databricks_dbfs_file_b.tf": dbfs_file("b", by_hash("b")),
+                        f"dbfs/files/{by_hash('v1')}": "v1",
+                        f"dbfs/files/{by_hash('b')}": "b"})
+    push_files(remote, {"dbfs/databricks_dbfs_file_a.tf": dbfs_file("a", by_hash("v2")),
+                        f"dbfs/files/{by_hash('v2')}": "v2"},
+               deleted=[f"dbfs/files/{by_hash('v1')}"])
+
+    assert get_targets(remote, tmp_path) == ["--target", "databricks_dbfs_file.a"]
+
+
+def test_removed_resource_is_targeted_from_the_previous_revision(remote, tmp_path):
+    push_files(remote, {"dbfs/databricks_dbfs_file_a.tf": dbfs_file("a", "databricks_dbfs_file_a"),
+                        "dbfs/files/databricks_dbfs_file_a": "a"})
+    push_files(remote, {}, deleted=["dbfs/databricks_dbfs_file_a.tf", "dbfs/files/databricks_dbfs_file_a"])
+
+    assert get_targets(remote, tmp_path) == ["--target", "databricks_dbfs_file.a"]
+
+
+def test_payload_without_tf_file_has_no_targets(remote, tmp_path):
+    push_files(remote, {"dbfs/databricks_dbfs_file_a.tf": dbfs_file("a", "databricks_dbfs_file_a")})
+    # a payload whose .tf file exists at neither revision
+    push_files(remote, {"dbfs/files/orphan": "orphan"})
+
+    assert get_targets(remote, tmp_path) is None
+
+
+def test_cached_clone_diffs_against_the_remote_branch(remote, tmp_path):
+    stage_cache = StageCache(str(tmp_path / "cache"))
+    push_files(remote, {"dbfs/databricks_dbfs_file_a.tf": dbfs_file("a", "databricks_dbfs_file_a")})
+    push_files(remote, {"dbfs/databricks_dbfs_file_b.tf": dbfs_file("b", "databricks_dbfs_file_b")})
+    assert get_targets(remote, tmp_path, stage_cache=stage_cache) == ["--target", "databricks_dbfs_file.b"]
+
+    # the cached clone is refreshed, its local master still points to the previous commit
+    push_files(remote, {"dbfs/databricks_dbfs_file_c.tf": dbfs_file("c", "databricks_dbfs_file_c")})
+    assert get_targets(remote, tmp_path, stage_cache=stage_cache) == ["--target", "databricks_dbfs_file.c"]
+
+
+def test_cached_clone_resolves_a_branch_without_local_branch(remote, tmp_path):
+    stage_cache = StageCache(str(tmp_path / "cache"))
+    push_files(remote, {"dbfs/databricks_dbfs_file_a.tf": dbfs_file("a", "databricks_dbfs_file_a")})
+    get_targets(remote, tmp_path, stage_cache=stage_cache)
+    push_files(remote, {"dbfs/databricks_dbfs_file_d.tf": dbfs_file("d", "databricks_dbfs_file_d")}, branch="feature")
+
+    with GitTFStage_V2(remote, ["dbfs"], "feature", str(tmp_path / "artifacts"), prev_ref="master", init=False,
+                       stage_cache=stage_cache) as stage:
+        assert stage._get_plan_targets() == ["--target", "databricks_dbfs_file.d"]
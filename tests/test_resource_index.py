@@ -0,0 +1,51 @@
+import json
+import os
+
+from databricks_terraformer.utils.resource_index import ResourceIndex
+
+
+def test_round_trip(tmp_path):
+    index = ResourceIndex()
+    index.set_file("databricks_job_a.tf", ["databricks_job.a"])
+    index.set_file_content("databricks_notebook_b.tf", 'resource "databricks_notebook" "b" {\n}\n'
+                                                       'resource "databricks_permissions" "b" {\n}\n')
+    index.save(str(tmp_path))
+
+    loaded = ResourceIndex.load(str(tmp_path))
+
+    assert loaded.resources == index.resources
+    assert loaded.get_file("databricks_job.a") == "databricks_job_a.tf"
+    assert sorted(loaded.get_addresses("databricks_notebook_b.tf")) == ["databricks_notebook.b",
+                                                                          "databricks_permissions.b"]
+    with open(os.path.join(str(tmp_path), ResourceIndex.FILE_NAME)) as f:
+        assert json.load(f)["version"] == ResourceIndex.VERSION
+
+
+def test_missing_index_is_empty(tmp_path):
+    assert ResourceIndex.load(str(tmp_path)).resources == {}
+
+
+def test_set_file_replaces_its_addresses_and_moves_addresses_between_files():
+    index = ResourceIndex({"databricks_job.a": "a.tf", "databricks_job.b": "a.tf"})
+
+    index.set_file("a.tf", ["databricks_job.a"])
+    assert index.get_file("databricks_job.b") is None
+
+    index.set_file("c.tf", ["databricks_job.a"])
+    assert index.get_file("databricks_job.a") == "c.tf"
+    assert index.get_addresses("a.tf") is None
+
+
+def test_remove_missing_files(tmp_path):
+    for name in ["kept.tf", "other.tf"]:
+        with open(os.path.join(str(tmp_path), name), "w") as f:
+            f.write("")
+    index = ResourceIndex({"databricks_job.kept": "kept.tf", "databricks_job.stale": "stale.tf",
+                           "databricks_job.stale_too": "stale.tf", "databricks_job.other": "other.tf"})
+
+    index.remove_missing_files(str(tmp_path))
+
+    assert index.resources == {"databricks_job.kept": "kept.tf", "databricks_job.other": "other.tf"}
+    assert index.get_addresses("stale.tf") is None
+    index.save(str(tmp_path))
+    assert ResourceIndex.load(str(tmp_path)).resources == index.resources
@@ -0,0 +1,76 @@
+import sys
+
+import pytest
+
+from databricks_terraformer.utils.terraform import Terraform, TerraformCommandError
+
+# prints the given number of filler lines followed by one line of every kind the monitor counts
+SCRIPT = """
+import sys
+for i in range(int(sys.argv[2])):
+    print(f"line {i}")
+print("databricks_job.a: Refreshing state... [id=1]")
+print("databricks_job.b: Refreshing state... [id=2]")
+print("  # databricks_job.a will be updated in-place")
+print("databricks_job.a: Modifications complete after 1s [id=1]")
+sys.stdout.flush()
+print("Error: status 429 Too Many Requests", file=sys.stderr)
+sys.exit(int(sys.argv[3]))
+"""
+
+
+class ScriptTerraform(Terraform):
+    BASE_COMMAND = [sys.executable, "-c", SCRIPT]
+
+    def run(self, lines, return_code=0, **kwargs):
+        return self.cmd(self.BASE_COMMAND + ["plan", str(lines), str(return_code)], **kwargs)
+
+
+def test_output_is_captured_and_progress_is_counted():
+    terraform = ScriptTerraform()
+
+    ret_code, out, err = terraform.run(2, return_code=2)
+
+    assert ret_code == 2
+    assert out.splitlines() == ["line 0", "line 1", "databricks_job.a: Refreshing state... [id=1]",
+                                "databricks_job.b: Refreshing state... [id=2]",
+                                "  # databricks_job.a will be updated in-place",
+                                "databricks_job.a: Modifications complete after 1s [id=1]"]
+    assert err == "Error: status 429 Too Many Requests\n"
+    monitor = terraform.last_monitor
+    assert (monitor.refreshed, monitor.planned, monitor.applied, monitor.throttled) == (2, 1, 1, 1)
+
+
+def test_only_the_tail_of_the_output_is_kept():
+    terraform = ScriptTerraform(output_tail_lines=5)
+
+    ret_code, out, _ = terraform.run(10000)
+
+    assert ret_code == 0
+    assert out.splitlines() == ["line 9999", "databricks_job.a: Refreshing state... [id=1]",
+                                "databricks_job.b: Refreshing state... [id=2]",
+                                "  # databricks_job.a will be updated in-place",
+                                "databricks_job.a: Modifications complete after 1s [id=1]"]
+    # progress is counted over the whole output, not only the tail
+    assert terraform.last_monitor.refreshed == 2
+
+
+def test_asynchronous_command_is_waited_for():
+    terraform = ScriptTerraform()
+
+    p, _, _ = terraform.run(1, synchronous=False)
+    ret_code, out, _ = terraform.wait(p)
+
+    assert ret_code == 0
+    assert out.startswith("line 0\n")
+
+
+def test_failure_is_raised_with_the_output_tail():
+    terraform = ScriptTerraform(output_tail_lines=1)
+
+    with pytest.raises(TerraformCommandError) as e:
+        terraform.run(3, return_code=1, raise_on_error=True)
+
+    assert e.value.returncode == 1
+    assert e.value.out == "databricks_job.a: Modifications complete after 1s [id=1]\n"
+    assert e.value.err == "Error: status 429 Too Many Requests\n"